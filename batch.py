@@ -0,0 +1,112 @@
+"""
+Runs many operations over a pool of worker processes, for CPU-heavy
+batches (closures, similarity, allSynsets projections) that one
+interpreter would run one at a time.
+"""
+import multiprocessing
+import os
+
+from typing import Iterable, Iterator, List, Optional, Union
+
+import wordnet_graphql
+
+# An operation is a query string or a dict with "query", or "queryHash"
+# for a persisted query, and optionally "variables" and "operationName",
+# as in a GraphQL HTTP request.
+Operation = Union[str, dict]
+
+_options = {}  # type: dict
+
+
+def preload(snapshot_path: Optional[str] = None):
+    """
+    Loads everything workers read, so that workers forked afterwards share
+    it with the parent instead of each building their own copy.
+    """
+    if snapshot_path is not None:
+        wordnet_graphql.load_snapshot(snapshot_path)
+    elif wordnet_graphql._graph is None:
+        wordnet_graphql.enable_graph_engine()
+    wordnet_graphql.wn.ensure_loaded()
+    wordnet_graphql._similarity_engine()
+    wordnet_graphql._interval_index()
+
+
+def _start_worker(snapshot_path: Optional[str], options: dict,
+                  forked: bool):
+    global _options
+    _options = options
+    if not forked:
+        preload(snapshot_path)
+
+
+def run_operation(operation: Operation, **options) -> dict:
+    if isinstance(operation, str):
+        operation = {"query": operation}
+    return wordnet_graphql.result_dict(wordnet_graphql.execute(
+        operation.get("query"),
+        variables=operation.get("variables"),
+        operation_name=operation.get("operationName"),
+        query_hash=operation.get("queryHash"),
+        **options))
+
+
+def _run(operation: Operation) -> dict:
+    try:
+        return run_operation(operation, **_options)
+    except Exception as e:
+        return {"errors": [{"message": str(e)}]}
+
+
+class BatchExecutor:
+    """
+    A pool of worker processes started once and reused for every batch.
+
+    With the fork start method, WordNet, the graph engine and the
+    similarity structures are loaded before the workers are forked, and
+    the workers share those pages copy-on-write. Loading a snapshot with
+    snapshot_path shares its arrays through the page cache with any start
+    method.
+
+    options are passed to wordnet_graphql.execute() for every operation,
+    e.g. cost_limits.
+    """
+
+    def __init__(self, processes: Optional[int] = None,
+                 snapshot_path: Optional[str] = None,
+                 start_method: Optional[str] = None, **options):
+        context = multiprocessing.get_context(start_method)
+        forked = context.get_start_method() == "fork"
+        if forked:
+            preload(snapshot_path)
+        self.processes = processes or os.cpu_count() or 1
+        self._pool = context.Pool(
+            self.processes, _start_worker,
+            (snapshot_path, options, forked))
+
+    def map(self, operations: Iterable[Operation],
+            chunksize: int = 1) -> Iterator[dict]:
+        """
+        The response of each operation, in input order, as soon as it and
+        every operation before it are done.
+        """
+        return self._pool.imap(_run, operations, chunksize)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def execute_batch(operations: Iterable[Operation],
+                  processes: Optional[int] = None, **kwargs) -> List[dict]:
+    """
+    Runs operations on a new BatchExecutor and returns every response.
+    """
+    with BatchExecutor(processes, **kwargs) as executor:
+        return list(executor.map(operations))
@@ -0,0 +1,80 @@
+"""
+Throughput of a batch of mixed operations on BatchExecutor, for an
+increasing number of worker processes.
+
+    python benchmarks/batch_throughput.py [--operations 400] [--snapshot PATH]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch  # noqa: E402
+import wordnet_graphql  # noqa: E402
+
+CLOSURE = """query Q($name: String) { synset(name: $name) {
+    closure(relationshipName: "hypernyms") { name definition }
+    hypernymPaths { name }
+} }"""
+SIMILARITY = """query Q($names: [String]!, $others: [String]!) {
+    similarityMatrix(names: $names, others: $others, metric: WUP)
+}"""
+NEAREST = """query Q($name: String!) {
+    nearestSynsets(name: $name, k: 10) { synset { name } similarity }
+}"""
+PROJECTION = """{ allSynsets(pos: "r") { name lemmaNames } }"""
+
+
+def operations(count: int, seed: int):
+    rng = random.Random(seed)
+    graph = wordnet_graphql._graph
+    names = [graph.synset_names[i] for i in graph.positions.select("n")]
+    result = []
+    for n in range(count):
+        kind = n % 4
+        if kind == 0:
+            result.append({"query": CLOSURE,
+                           "variables": {"name": rng.choice(names)}})
+        elif kind == 1:
+            result.append({"query": SIMILARITY, "variables": {
+                "names": rng.sample(names, 10),
+                "others": rng.sample(names, 50)}})
+        elif kind == 2:
+            result.append({"query": NEAREST,
+                           "variables": {"name": rng.choice(names)}})
+        else:
+            result.append(PROJECTION)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operations", type=int, default=400)
+    parser.add_argument("--snapshot")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    batch.preload(args.snapshot)
+    batch_operations = operations(args.operations, args.seed)
+    counts = sorted({1, 2, 4, 8, os.cpu_count() or 1})
+    print("%-10s %10s %10s %8s" % ("processes", "seconds", "ops/s", "speedup"))
+    baseline = None
+    for processes in counts:
+        with batch.BatchExecutor(processes, args.snapshot) as executor:
+            # Warm every worker before timing.
+            list(executor.map(batch_operations[:processes * 2]))
+            start = time.perf_counter()
+            for response in executor.map(batch_operations, chunksize=4):
+                assert "errors" not in response, response
+            elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print("%-10d %10.2f %10.1f %7.2fx" % (
+            processes, elapsed, len(batch_operations) / elapsed,
+            baseline / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Records and MB per second of the NDJSON export, per kind of record, and
+the most memory the export holds at once.
+
+    python benchmarks/export_throughput.py [--snapshot PATH]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export  # noqa: E402
+import wordnet_graphql  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshot")
+    args = parser.parse_args()
+    if args.snapshot:
+        wordnet_graphql.load_snapshot(args.snapshot)
+    lexicon = wordnet_graphql.enable_lexicon()
+
+    print("%-8s %9s %8s %10s %8s %9s" % (
+        "records", "count", "s", "records/s", "MB/s", "peak KB"))
+    for kind in export.RECORDS:
+        count = size = 0
+        start = time.perf_counter()
+        for chunk in export.export(lexicon, [kind]):
+            count += chunk.count(b"\n")
+            size += len(chunk)
+        seconds = time.perf_counter() - start
+        tracemalloc.start()
+        for chunk in export.export(lexicon, [kind]):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("%-8s %9d %8.2f %10.0f %8.1f %9.0f" % (
+            kind, count, seconds, count / seconds, size / seconds / 1e6,
+            peak / 1024))
+
+
+if __name__ == "__main__":
+    main()
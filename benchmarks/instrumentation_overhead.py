@@ -0,0 +1,63 @@
+"""
+Time per query with instrumentation off, with resolver and phase metrics,
+and with metrics and a per-request trace.
+
+    python benchmarks/instrumentation_overhead.py [--graph] [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wordnet_graphql  # noqa: E402
+from metrics import Metrics  # noqa: E402
+
+QUERIES = {
+    "name": '{ synset(name: "dog.n.01") { name definition } }',
+    "hyponyms": """{ synset(name: "dog.n.01") { hyponyms {
+        name definition hypernyms { name lemmaNames } } } }""",
+    "lemmas": """{ synset(name: "good.a.01") { lemmas {
+        name count antonyms { name synset { name definition } } } } }""",
+    "closure": """{ closure(names: ["dog.n.01"],
+        relationshipNames: ["hypernyms"]) { name distance } }""",
+}
+
+
+def measure(query, repeat, configurations) -> list:
+    # Best ms per execution out of repeat for each configuration, taking
+    # turns so that they all see the same machine noise.
+    best = [float("inf")] * len(configurations)
+    for _ in range(repeat):
+        for k, options in enumerate(configurations):
+            start = time.perf_counter()
+            result = wordnet_graphql.execute(query, **options)
+            best[k] = min(best[k], time.perf_counter() - start)
+            assert not result.errors, result.errors
+    return [1000 * seconds for seconds in best]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--graph", action="store_true",
+                        help="enable the graph engine")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    if args.graph:
+        wordnet_graphql.enable_graph_engine()
+    metrics = Metrics()
+
+    print("%-10s %8s %10s %10s %10s" % (
+        "query", "off ms", "metrics ms", "traced ms", "overhead"))
+    configurations = [{}, {"metrics": metrics},
+                      {"metrics": metrics, "trace": True}]
+    for name, query in QUERIES.items():
+        measure(query, 3, configurations)
+        off, on, traced = measure(query, args.repeat, configurations)
+        print("%-10s %8.3f %10.3f %10.3f %9.0f%%" % (
+            name, off, on, traced, 100 * (on - off) / off))
+
+
+if __name__ == "__main__":
+    main()
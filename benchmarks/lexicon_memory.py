@@ -0,0 +1,89 @@
+"""
+Per-worker memory with the whole lexicon loaded: every synset's scalar
+fields and lemmas resolved once, through NLTK objects and then through a
+snapshot's lexicon. Each mode runs in a fresh process.
+
+    python benchmarks/lexicon_memory.py [--snapshot wordnet.snapshot]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUERY = """
+query Page($after: String) {
+    allSynsetsConnection(first: 1000, after: $after) {
+        pageInfo { endCursor hasNextPage }
+        edges { node {
+            name pos offset definition examples lexname frameIds lemmaNames
+            lemmas { name key count frameIds frameStrings syntacticMarker }
+        } }
+    }
+}
+"""
+
+
+def memory():
+    # (RSS, of which private to this process) in MB.
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return (fields["Rss"],
+            fields["Private_Clean"] + fields["Private_Dirty"])
+
+
+def worker(mode, path):
+    import wordnet_graphql
+    if mode == "lexicon":
+        wordnet_graphql.load_snapshot(path)
+    before = memory()
+    start = time.perf_counter()
+    after, synsets = None, 0
+    while True:
+        result = wordnet_graphql.execute(QUERY, variables={"after": after})
+        assert not result.errors, result.errors
+        page = result.data["allSynsetsConnection"]
+        synsets += len(page["edges"])
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+        after = page["pageInfo"]["endCursor"]
+    elapsed = time.perf_counter() - start
+    rss, private = memory()
+    print("%-8s %8d %10.0f %10.0f %10.0f %8.1f" % (
+        mode, synsets, before[0], rss, private, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshot", help="built if not given")
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.snapshot
+        if path is None:
+            import snapshot
+            path = os.path.join(tmp, "wordnet.snapshot")
+            snapshot.build(path)
+        print("%-8s %8s %10s %10s %10s %8s" % (
+            "mode", "synsets", "start MB", "RSS MB", "private MB", "s"))
+        sys.stdout.flush()
+        for mode in ("nltk", "lexicon"):
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__),
+                 "--worker", mode, path], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Load generator for server.py: keep-alive connections sending a mix of
+queries as fast as the server answers, reporting requests/s and latency
+percentiles.
+
+    python server.py --workers 4 &
+    python benchmarks/load_generator.py [--concurrency 32] [--duration 10]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from urllib.parse import quote, urlsplit
+
+QUERIES = [
+    '{ synset(name: "%s") { name definition lemmaNames } }',
+    '{ synset(name: "%s") { hypernyms { name } hyponyms { name } } }',
+    '{ synset(name: "%s") { lemmas { name count antonyms { name } } } }',
+    '{ synset(name: "%s") { pathSimilarity(otherSynsetName: "cat.n.01") } }',
+]
+NAMES = ["dog.n.01", "cat.n.01", "run.v.01", "good.a.01", "tree.n.01",
+         "car.n.01", "walk.v.01", "quickly.r.01", "house.n.01", "eat.v.01"]
+
+
+def _request(args, rng) -> bytes:
+    queries = [rng.choice(QUERIES) % rng.choice(NAMES)
+               for _ in range(args.batch)]
+    headers = "Host: %s\r\n" % args.host
+    if args.compress:
+        headers += "Accept-Encoding: gzip\r\n"
+    if args.get:
+        return ("GET %s?query=%s HTTP/1.1\r\n%s\r\n" % (
+            args.path, quote(queries[0]), headers)).encode()
+    payload = [{"query": q} for q in queries]
+    body = json.dumps(payload if args.batch > 1 else payload[0]).encode()
+    return ("POST %s HTTP/1.1\r\n%sContent-Type: application/json\r\n"
+            "Content-Length: %d\r\n\r\n" % (args.path, headers, len(body))
+            ).encode() + body
+
+
+async def _connection(args, deadline, latencies, failures, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        while time.perf_counter() < deadline:
+            request = _request(args, rng)
+            start = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            length = 0
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if lines[0].split(" ")[1] not in ("200", "304"):
+                failures.append(lines[0])
+    finally:
+        writer.close()
+
+
+def _percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(args):
+    deadline = time.perf_counter() + args.duration
+    latencies, failures = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _connection(args, deadline, latencies, failures, seed)
+        for seed in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print("requests     %d (%d failed)" % (len(latencies), len(failures)))
+    print("requests/s   %.1f" % (len(latencies) / elapsed))
+    print("operations/s %.1f" % (len(latencies) * args.batch / elapsed))
+    for p in (50, 90, 99):
+        print("p%-11d %.2f ms" % (p, 1000 * _percentile(latencies, p)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000/graphql")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--batch", type=int, default=1,
+                        help="operations per request")
+    parser.add_argument("--get", action="store_true",
+                        help="send single operations as GET requests")
+    parser.add_argument("--compress", action="store_true",
+                        help="ask for gzip responses")
+    args = parser.parse_args()
+    url = urlsplit(args.url)
+    args.host, args.port, args.path = url.hostname, url.port or 80, url.path
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Times nearestSynsets' pruned search against scoring every candidate.
+
+    python benchmarks/nearest_synsets.py [--trials 20] [--k 10]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import information_content  # noqa: E402
+from nearest import NearestSynsets  # noqa: E402
+from similarity import SimilarityEngine  # noqa: E402
+from taxonomy import Taxonomy  # noqa: E402
+from wordnet_graph import WordNetGraph  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    graph = WordNetGraph.build()
+    nearest = NearestSynsets(SimilarityEngine(Taxonomy(graph)))
+    ic = information_content.load()
+    rng = random.Random(args.seed)
+    cases = [
+        ("path", None), ("lch", None), ("wup", None),
+        ("wup", "v"), ("res", "n"),
+    ]
+    print("%-6s %-4s %12s %12s %8s" % (
+        "metric", "pos", "pruned ms", "scan ms", "speedup"))
+    for metric, pos in cases:
+        ids = graph.positions.select(pos if metric != "res" else "n")
+        pruned = scan = 0.0
+        for _ in range(args.trials):
+            a = int(rng.choice(ids))
+            start = time.perf_counter()
+            fast = nearest.nearest(a, metric, args.k, pos, ic=ic)
+            pruned += time.perf_counter() - start
+            start = time.perf_counter()
+            slow = nearest.brute_force(a, metric, args.k, pos, ic=ic)
+            scan += time.perf_counter() - start
+            assert fast == slow, (graph.synset_names[a], metric, pos)
+        print("%-6s %-4s %12.2f %12.2f %7.0fx" % (
+            metric, pos or "-", 1000 * pruned / args.trials,
+            1000 * scan / args.trials, scan / pruned))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Memory allocated and nodes made while executing nested queries that reach
+the same synsets and lemmas many times, with a new node for every
+occurrence and with nodes interned across requests.
+
+    python benchmarks/node_allocations.py [--graph] [--snapshot PATH]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wordnet_graphql  # noqa: E402
+
+QUERIES = {
+    "hyponyms": """{ synset(name: "dog.n.01") { hyponyms {
+        name definition hypernyms { name definition lemmaNames
+            hyponyms { name lemmas { name count } } } } } }""",
+    "lemmas": """{ synset(name: "good.a.01") { lemmas {
+        name antonyms { name synset { name definition
+            lemmas { name antonyms { name synset { name } } } } } } } }""",
+    "page": """{ allSynsetsConnection(first: 200, after: "YXJyYXljb25uZWN0aW9uOjQwMDAw") {
+        edges { node { name hypernyms { name definition
+            hyponyms { name } } } } } }""",
+    "paths": """{ synset(name: "poodle.n.01") { hypernymPaths {
+        name lexname hyponyms { name } } } }""",
+}
+
+
+def measure(query):
+    # (peak KB, ms) for one execution.
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = wordnet_graphql.execute(query)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert not result.errors, result.errors
+    return peak / 1024, elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--graph", action="store_true",
+                        help="enable the graph engine")
+    parser.add_argument("--snapshot")
+    args = parser.parse_args()
+    if args.snapshot:
+        wordnet_graphql.load_snapshot(args.snapshot)
+    elif args.graph:
+        wordnet_graphql.enable_graph_engine()
+
+    print("%-10s %8s %8s %12s %12s %10s %10s" % (
+        "query", "nodes", "interned", "peak KB", "interned KB", "ms",
+        "interned ms"))
+    for name, query in QUERIES.items():
+        rows = []
+        for intern in (False, True):
+            wordnet_graphql.INTERN_NODES = intern
+            wordnet_graphql._node_cache.clear()
+            # Warms NLTK's caches and, when interning, the node cache.
+            result = wordnet_graphql.execute(query)
+            assert not result.errors, result.errors
+            rows.append((_count_nodes(query), measure(query)))
+        wordnet_graphql.INTERN_NODES = True
+        print("%-10s %8d %8d %12.0f %12.0f %10.1f %10.1f" % (
+            name, rows[0][0], rows[1][0], rows[0][1][0], rows[1][1][0],
+            rows[0][1][1], rows[1][1][1]))
+
+
+def _count_nodes(query) -> int:
+    # Nodes made by one execution.
+    count = 0
+    flyweights = [wordnet_graphql.SynsetNode.flyweight,
+                  wordnet_graphql.LemmaNode.flyweight]
+    originals = [flyweight.__init__ for flyweight in flyweights]
+
+    def counting(original):
+        def init(self, wordnet_obj, memoize=False):
+            nonlocal count
+            count += 1
+            original(self, wordnet_obj, memoize)
+        return init
+
+    for flyweight, original in zip(flyweights, originals):
+        flyweight.__init__ = counting(original)
+    try:
+        wordnet_graphql.execute(query)
+    finally:
+        for flyweight, original in zip(flyweights, originals):
+            flyweight.__init__ = original
+    return count
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Bytes of response per second from executing a query and serializing its
+result, through OrderedDicts and json.dumps() and with raw_json.
+
+    python benchmarks/serialization_throughput.py [--graph | --snapshot PATH]
+        [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wordnet_graphql  # noqa: E402
+
+QUERIES = {
+    "adverbs": '{ allSynsets(pos: "r") { name pos lemmaNames definition } }',
+    "verbs": '{ allSynsets(pos: "v") { name lexname lemmas { name count } } }',
+    "fanout": """{ synset(name: "entity.n.01") { hyponyms { name
+        hyponyms { name definition hyponyms { name lemmaNames
+            hyponyms { name } } } } } }""",
+    "lemmas": """{ synsets(word: "run") { name lemmas { name key count
+        antonyms { name } derivationallyRelatedForms { name
+            synset { name definition } } } } }""",
+}
+
+
+def dicts(query):
+    result = wordnet_graphql.execute(query)
+    return json.dumps(wordnet_graphql.result_dict(result),
+                      separators=(",", ":")).encode()
+
+
+def raw(query):
+    return wordnet_graphql.result_json(
+        wordnet_graphql.execute(query, raw_json=True))
+
+
+def measure(query, repeat, paths) -> list:
+    # Best seconds out of repeat for each path, taking turns so that they
+    # all see the same machine noise.
+    best = [float("inf")] * len(paths)
+    for _ in range(repeat):
+        for k, path in enumerate(paths):
+            start = time.perf_counter()
+            path(query)
+            best[k] = min(best[k], time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--graph", action="store_true",
+                        help="enable the graph engine")
+    parser.add_argument("--snapshot")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if args.snapshot:
+        wordnet_graphql.load_snapshot(args.snapshot)
+    elif args.graph:
+        wordnet_graphql.enable_graph_engine()
+
+    print("%-8s %8s %9s %9s %10s %10s %8s" % (
+        "query", "KB", "dicts ms", "raw ms", "dicts MB/s", "raw MB/s",
+        "speedup"))
+    for name, query in QUERIES.items():
+        body = dicts(query)
+        assert body == raw(query)
+        seconds = measure(query, args.repeat, [dicts, raw])
+        mb = len(body) / 1e6
+        print("%-8s %8.0f %9.1f %9.1f %10.2f %10.2f %7.2fx" % (
+            name, len(body) / 1024, 1000 * seconds[0], 1000 * seconds[1],
+            mb / seconds[0], mb / seconds[1], seconds[0] / seconds[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Latency, throughput and memory of representative workloads, with fixed
+seeds and query shapes so that runs are comparable. Results can be saved
+as a JSON baseline and later runs compared against it; any workload
+slower or larger than the baseline by more than the threshold is flagged
+and the exit status is 1.
+
+    python benchmarks/suite.py [--graph | --snapshot PATH] [--quick]
+        [--only single,nested] [--save baseline.json]
+        [--compare baseline.json] [--threshold 10]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wordnet_graphql  # noqa: E402
+from nltk.corpus import wordnet as wn  # noqa: E402
+
+SEED = 20190501
+
+SINGLE = """query Single($name: String) { synset(name: $name) {
+    name pos definition examples lemmaNames } }"""
+NESTED = """query Nested($name: String) { synset(name: $name) {
+    name hyponyms { name definition
+        hypernyms { name lemmas { name count } }
+        partMeronyms { name } } } }"""
+CLOSURE = """query Closure($name: String) { synset(name: $name) {
+    closure(relationshipName: "hyponyms") { name } } }"""
+SIMILARITY = """query Similarity($names: [String]!, $others: [String]!) {
+    similarityMatrix(names: $names, others: $others, metric: WUP) }"""
+ALL_SYNSETS = """query AllSynsets($pos: String) { allSynsets(pos: $pos) {
+    name pos } }"""
+LEMMAS = """query Lemmas($id: String) { lemma(id: $id) {
+    name key count syntacticMarker frameIds frameStrings lang
+    synset { name } antonyms { name } pertainyms { name }
+    derivationallyRelatedForms { name } } }"""
+
+# Synsets with the largest hyponym closures below the root.
+HUBS = ["physical_entity.n.01", "abstraction.n.06", "object.n.01",
+        "organism.n.01", "artifact.n.01", "person.n.01", "act.n.02",
+        "animal.n.01"]
+
+
+def _workloads(quick: bool):
+    """
+    name -> list of (query, variables), the operations of each workload.
+    """
+    rng = random.Random(SEED)
+    synsets = sorted(wn.all_synsets(), key=lambda s: s.name())
+    names = [s.name() for s in synsets]
+    nouns = [s.name() for s in synsets if s.pos() == "n"]
+    # Nested fan-outs start from synsets that have something to fan out to.
+    parents = [s.name() for s in synsets if s.pos() == "n" and s.hyponyms()]
+    lemmas = sorted("%s.%s" % (s.name(), l.name())
+                    for s in rng.sample(synsets, 1000) for l in s.lemmas())
+    scale = 1 if quick else 5
+    workloads = OrderedDict()
+    workloads["single"] = [(SINGLE, {"name": name})
+                           for name in rng.sample(names, 200 * scale)]
+    workloads["nested"] = [(NESTED, {"name": name})
+                           for name in rng.sample(parents, 40 * scale)]
+    workloads["closure"] = [(CLOSURE, {"name": name})
+                            for name in HUBS[:2 * scale]]
+    workloads["similarity"] = [
+        (SIMILARITY, {"names": rng.sample(nouns, 10),
+                      "others": rng.sample(nouns, 10)})
+        for _ in range(10 * scale)]
+    workloads["all_synsets"] = [
+        (ALL_SYNSETS, {"pos": "r" if quick else None})
+        for _ in range(3 if quick else 2)]
+    workloads["lemmas"] = [(LEMMAS, {"id": lemma})
+                           for lemma in rng.sample(lemmas, 200 * scale)]
+    return workloads
+
+
+def _execute(query, variables):
+    result = wordnet_graphql.execute(query, variables=variables)
+    assert not result.errors, result.errors
+
+
+def _percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(operations) -> dict:
+    """
+    Latency percentiles and throughput over operations, then the peak
+    memory of a single operation and the memory a pass over the first
+    operations leaves allocated, e.g. in caches.
+    """
+    for query, variables in operations[:3]:
+        _execute(query, variables)
+    gc.collect()
+    latencies = []
+    start = time.perf_counter()
+    for query, variables in operations:
+        begin = time.perf_counter()
+        _execute(query, variables)
+        latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    gc.collect()
+    peak = 0
+    tracemalloc.start()
+    for query, variables in operations[:10]:
+        tracemalloc.reset_peak()
+        _execute(query, variables)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return OrderedDict([
+        ("operations", len(operations)),
+        ("p50_ms", 1000 * _percentile(latencies, 50)),
+        ("p95_ms", 1000 * _percentile(latencies, 95)),
+        ("p99_ms", 1000 * _percentile(latencies, 99)),
+        ("ops_per_s", len(operations) / elapsed),
+        ("peak_kb", peak / 1024),
+        ("retained_kb", retained / 1024),
+    ])
+
+
+# Measures compared against a baseline, and whether larger is better.
+_COMPARED = [("p50_ms", False), ("p95_ms", False), ("p99_ms", False),
+             ("ops_per_s", True), ("peak_kb", False),
+             ("retained_kb", False)]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    (workload, measure, baseline, current, change %) for every measure at
+    least threshold percent worse than in baseline.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for measure, larger_is_better in _COMPARED:
+            before, after = previous[measure], current[measure]
+            if before <= 0:
+                continue
+            change = 100.0 * (after - before) / before
+            if (-change if larger_is_better else change) > threshold:
+                regressions.append((name, measure, before, after, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--graph", action="store_true",
+                        help="enable the graph engine")
+    parser.add_argument("--snapshot")
+    parser.add_argument("--quick", action="store_true",
+                        help="fewer operations, and adverbs only for "
+                             "allSynsets")
+    parser.add_argument("--only", help="comma separated workloads to run")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON baseline to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent worse than the baseline that counts "
+                             "as a regression")
+    args = parser.parse_args()
+    if args.snapshot:
+        wordnet_graphql.load_snapshot(args.snapshot)
+    elif args.graph:
+        wordnet_graphql.enable_graph_engine()
+
+    workloads = _workloads(args.quick)
+    if args.only:
+        workloads = OrderedDict((name, workloads[name])
+                                for name in args.only.split(","))
+    print("%-12s %6s %9s %9s %9s %10s %10s %10s" % (
+        "workload", "ops", "p50 ms", "p95 ms", "p99 ms", "ops/s",
+        "peak KB", "kept KB"))
+    results = OrderedDict()
+    for name, operations in workloads.items():
+        r = results[name] = run(operations)
+        print("%-12s %6d %9.2f %9.2f %9.2f %10.1f %10.0f %10.0f" % (
+            name, r["operations"], r["p50_ms"], r["p95_ms"], r["p99_ms"],
+            r["ops_per_s"], r["peak_kb"], r["retained_kb"]))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "engine": ("snapshot" if args.snapshot
+                           else "graph" if args.graph else "nltk"),
+                "quick": args.quick,
+                "python": platform.python_version(),
+                "results": results,
+            }, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, measure, before, after, change in regressions:
+            print("REGRESSION %-12s %-10s %10.2f -> %10.2f (%+.0f%%)" % (
+                name, measure, before, after, change))
+        if not regressions:
+            print("No regressions past %g%%" % args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+from collections import deque
+from typing import Callable, Dict, Hashable, Iterable, Iterator, Sequence, \
+    Tuple
+
+import numpy as np
+
+from wordnet_graph import Adjacency, SYNSET_RELATIONS, WordNetGraph
+
+# Relations whose closures are asked for often enough to precompute, see
+# ClosureEngine.precompute().
+PRECOMPUTED_RELATIONS = ("hypernyms", "hyponyms")
+
+# Frontiers at least this large are expanded with numpy rather than one
+# node at a time.
+_VECTOR_FRONTIER = 64
+
+
+def check_relations(relations: Sequence[str]) -> Tuple[str, ...]:
+    relations = tuple(relations)
+    if not relations:
+        raise ValueError("No relation given")
+    for relation in relations:
+        if relation not in SYNSET_RELATIONS:
+            raise ValueError("Unknown relation %r" % relation)
+    return relations
+
+
+def breadth_first(starts: Iterable[Hashable],
+                  children: Callable[[Hashable], Iterable[Hashable]],
+                  depth: int = -1) -> Iterator[Tuple[Hashable, int]]:
+    """
+    (node, distance) for every node reachable from starts, in the order
+    and at the distance nltk.util.acyclic_breadth_first() yields them, but
+    without the starts. depth -1 means no limit.
+    """
+    starts = list(dict.fromkeys(starts))
+    seen = set(starts)
+    queue = deque((s, 0) for s in starts)
+    while queue:
+        node, distance = queue.popleft()
+        if distance > 0:
+            yield node, distance
+        if distance != depth:
+            for child in children(node):
+                if child not in seen:
+                    seen.add(child)
+                    queue.append((child, distance + 1))
+
+
+class ClosureEngine:
+    """
+    Transitive closures of synset relations over a WordNetGraph's arrays,
+    from one or several synsets and along one or several relations at
+    once. Results are in the order Synset.closure() gives (breadth first,
+    each synset once, relations followed in the order given) and come
+    with their distance from the nearest start.
+
+    Closures of single relations can also be precomputed for every
+    synset, after which a closure from one synset is a slice.
+    """
+
+    def __init__(self, graph: WordNetGraph):
+        self.graph = graph
+        self._adjacencies = {}  # type: Dict[Tuple[str, ...], Adjacency]
+        # relation -> (indptr, ids, distances), in closure order.
+        self._closures = {}  # type: Dict[str, Tuple[np.ndarray, ...]]
+
+    def _adjacency(self, relations: Tuple[str, ...]) -> Adjacency:
+        adjacency = self._adjacencies.get(relations)
+        if adjacency is None:
+            if len(relations) == 1:
+                adjacency = self.graph.synset_relations[relations[0]]
+            else:
+                adjacency = Adjacency.union(
+                    [self.graph.synset_relations[r] for r in relations])
+            self._adjacencies[relations] = adjacency
+        return adjacency
+
+    def closure(self, starts: Sequence[int], relations: Sequence[str],
+                depth: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (ids, distances) of the synsets reachable from starts along
+        relations in at most depth steps (-1 for no limit), excluding the
+        starts themselves.
+        """
+        relations = check_relations(relations)
+        if len(starts) == 1 and len(relations) == 1 \
+                and relations[0] in self._closures:
+            return self._precomputed(relations[0], int(starts[0]), depth)
+        adjacency = self._adjacency(relations)
+        visited = np.zeros(len(self.graph), dtype=bool)
+        frontier = np.array(list(dict.fromkeys(int(i) for i in starts)),
+                            dtype=np.int32)
+        visited[frontier] = True
+        levels = []
+        while len(frontier) and depth != len(levels):
+            frontier = self._expand(adjacency, frontier, visited)
+            levels.append(frontier)
+        if not levels:
+            return (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32))
+        return (np.concatenate(levels),
+                np.repeat(np.arange(1, len(levels) + 1, dtype=np.int32),
+                          [len(level) for level in levels]))
+
+    @staticmethod
+    def _expand(adjacency: Adjacency, frontier: np.ndarray,
+                visited: np.ndarray) -> np.ndarray:
+        # The unvisited children of frontier, in order of first appearance,
+        # which is the order a FIFO queue would reach them in.
+        if len(frontier) < _VECTOR_FRONTIER:
+            level = []
+            for i in frontier.tolist():
+                for j in adjacency.neighbors(i):
+                    if not visited[j]:
+                        visited[j] = True
+                        level.append(j)
+            return np.array(level, dtype=np.int32)
+        starts = adjacency.indptr[frontier]
+        lengths = adjacency.indptr[frontier + 1] - starts
+        offsets = np.arange(int(lengths.sum())) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths)
+        children = adjacency.indices[np.repeat(starts, lengths) + offsets]
+        children = children[~visited[children]]
+        first = np.unique(children, return_index=True)[1]
+        level = children[np.sort(first)]
+        visited[level] = True
+        return level
+
+    def precompute(self, relations: Sequence[str] = PRECOMPUTED_RELATIONS):
+        """
+        Stores the full closure of every synset for each relation. For
+        hypernyms and hyponyms this takes a few seconds and about 5 MB
+        each.
+        """
+        for relation in check_relations(relations):
+            if relation in self._closures:
+                continue
+            adjacency = self._adjacency((relation,))
+            indptr = [0]
+            ids, distances = [], []
+            for i in range(len(self.graph)):
+                for j, d in breadth_first([i], adjacency.neighbors):
+                    ids.append(j)
+                    distances.append(d)
+                indptr.append(len(ids))
+            self._closures[relation] = (
+                np.array(indptr, dtype=np.int64),
+                np.array(ids, dtype=np.int32),
+                np.array(distances, dtype=np.uint8))
+
+    def _precomputed(self, relation: str, i: int,
+                     depth: int) -> Tuple[np.ndarray, np.ndarray]:
+        indptr, ids, distances = self._closures[relation]
+        start, end = int(indptr[i]), int(indptr[i + 1])
+        if depth >= 0:
+            # Distances are non-decreasing in breadth first order.
+            end = start + int(np.searchsorted(
+                distances[start:end], depth, side="right"))
+        return ids[start:end], distances[start:end].astype(np.int32)
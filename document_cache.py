@@ -0,0 +1,116 @@
+import hashlib
+import os
+import threading
+
+from collections import OrderedDict
+from graphql import GraphQLError, parse, validate
+from graphql.language import ast
+from typing import Dict, List, Optional, Tuple
+
+from metrics import RequestTimer, timed
+
+
+def query_hash(query: str) -> str:
+    """
+    The sha256 hex digest clients use to refer to a persisted query.
+    """
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class PersistedQueryNotFound(GraphQLError):
+    pass
+
+
+class DocumentCache:
+    """
+    LRU cache of parsed and validated documents keyed by query hash, so a
+    query shape that is executed repeatedly is only parsed and validated
+    once. Queries that fail to parse or validate are cached with their
+    errors.
+
+    Also holds the registry of persisted queries, which lets clients send
+    only a query's hash.
+    """
+
+    def __init__(self, schema, maxsize: int = 256):
+        self.schema = schema
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._documents = OrderedDict()
+        self._persisted = {}  # type: Dict[str, str]
+        self._lock = threading.Lock()
+
+    def get(self, query: str, timer: Optional[RequestTimer] = None
+            ) -> Tuple[Optional[ast.Document], List[GraphQLError]]:
+        """
+        Returns the parsed document for query and its validation errors.
+        A timer times parsing and validation, if they are not cached.
+        """
+        key = query_hash(query)
+        with self._lock:
+            entry = self._documents.get(key)
+            if entry is not None:
+                self._documents.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        try:
+            with timed(timer, "parse"):
+                document_ast = parse(query)
+            with timed(timer, "validate"):
+                entry = (document_ast, validate(self.schema, document_ast))
+        except GraphQLError as e:
+            entry = (None, [e])
+
+        with self._lock:
+            self._documents[key] = entry
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._documents),
+                "maxsize": self.maxsize,
+                "persisted": len(self._persisted),
+            }
+
+    def register(self, query: str) -> str:
+        """
+        Registers query as a persisted query and returns its hash.
+        """
+        key = query_hash(query)
+        with self._lock:
+            self._persisted[key] = query
+        return key
+
+    def load_directory(self, path: str, extension: str = ".graphql") -> int:
+        """
+        Registers every query file in path. Returns how many were loaded.
+        """
+        count = 0
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith(extension):
+                with open(os.path.join(path, filename)) as f:
+                    self.register(f.read())
+                count += 1
+        return count
+
+    def persisted_query(self, key: str) -> str:
+        with self._lock:
+            try:
+                return self._persisted[key]
+            except KeyError:
+                raise PersistedQueryNotFound(
+                    "PersistedQueryNotFound: %s" % key)
@@ -0,0 +1,166 @@
+"""
+Streams every synset, lemma and relation edge as newline delimited JSON,
+straight from the graph and lexicon arrays, without building any GraphQL
+results.
+
+    python export.py [--snapshot PATH] [--records synsets,lemmas,edges]
+        [--output FILE]
+"""
+import argparse
+import sys
+
+from json.encoder import encode_basestring as _string
+from typing import Callable, Iterable, Iterator, List
+
+import numpy as np
+
+import wordnet_graphql
+
+from lexicon import Lexicon
+
+RECORDS = ("synsets", "lemmas", "edges")
+
+# Records per chunk the export yields.
+CHUNK_RECORDS = 4096
+
+
+def _ranges(n: int, size: int) -> Iterator[range]:
+    for start in range(0, n, size):
+        yield range(start, min(n, start + size))
+
+
+def _spans(ends: np.ndarray, values: np.ndarray, ids: range,
+           convert: Callable[[np.ndarray], list] = np.ndarray.tolist
+           ) -> List[list]:
+    """
+    values[ends[i - 1]:ends[i]] for each i in ids, with the values of all
+    of them converted to a list at once.
+    """
+    stops = ends[ids.start:ids.stop].tolist()
+    first = int(ends[ids.start - 1]) if ids.start > 0 else 0
+    flat = convert(values[first:stops[-1]]) if stops else []
+    spans, start = [], 0
+    for stop in stops:
+        spans.append(flat[start:stop - first])
+        start = stop - first
+    return spans
+
+
+def _list(values: Iterable[str]) -> str:
+    return "[%s]" % ",".join(values)
+
+
+def synset_lines(lexicon: Lexicon, ids: range) -> List[str]:
+    graph = lexicon.graph
+    a, b = ids.start, ids.stop
+    examples = _spans(lexicon.example_ends, lexicon.examples, ids,
+                      lexicon.texts.take)
+    return [
+        '{"type":"synset","id":%d,"name":%s,"pos":"%s","offset":%d,'
+        '"lexname":"%s","definition":%s,"examples":%s}\n' % (
+            i, _string(name), pos.decode(), offset, lexicon.lexnames[lexname],
+            _string(definition), _list(map(_string, texts)))
+        for i, name, pos, offset, lexname, definition, texts in zip(
+            ids, graph.synset_names[a:b], graph.synset_pos[a:b].tolist(),
+            graph.synset_offsets[a:b].tolist(),
+            lexicon.lexname_ids[a:b].tolist(),
+            lexicon.texts.take(lexicon.definitions[a:b]), examples)]
+
+
+def lemma_lines(lexicon: Lexicon, ids: range) -> List[str]:
+    graph = lexicon.graph
+    a, b = ids.start, ids.stop
+    markers = lexicon.markers[a:b]
+    marker_texts = iter(lexicon.texts.take(markers[markers >= 0]))
+    frames = _spans(lexicon.lemma_frame_ends, lexicon.lemma_frames, ids)
+    return [
+        '{"type":"lemma","id":%d,"synset":%d,"name":%s,"key":%s,'
+        '"count":%d,"syntacticMarker":%s,"frameIds":%s}\n' % (
+            i, synset, _string(name), _string(key), count,
+            "null" if marker < 0 else _string(next(marker_texts)),
+            _list(map(str, frame_ids)))
+        for i, synset, name, key, count, marker, frame_ids in zip(
+            ids, graph.lemma_synsets[a:b].tolist(), graph.lemma_names[a:b],
+            lexicon.keys[a:b], lexicon.counts[a:b].tolist(),
+            markers.tolist(), frames)]
+
+
+def edge_lines(lexicon: Lexicon,
+               chunk_records: int = CHUNK_RECORDS) -> Iterator[List[str]]:
+    """
+    Lines of every synset relation edge, then every lemma relation edge,
+    relation by relation and in NLTK's order, about chunk_records at a
+    time.
+    """
+    graph = lexicon.graph
+    for kind, relations in (("synset", graph.synset_relations),
+                            ("lemma", graph.lemma_relations)):
+        for relation, adjacency in relations.items():
+            line = ('{"type":"%s_edge","relation":"%s",'
+                    '"source":%%d,"target":%%d}\n' % (kind, relation))
+            indptr, indices = adjacency.indptr, adjacency.indices
+            n = len(indptr) - 1
+            lo = 0
+            while lo < n:
+                # Whole sources, up to chunk_records edges between them.
+                hi = int(np.searchsorted(
+                    indptr, indptr[lo] + chunk_records, side="right")) - 1
+                hi = min(n, max(lo + 1, hi))
+                start, stop = int(indptr[lo]), int(indptr[hi])
+                if start < stop:
+                    sources = np.repeat(np.arange(lo, hi),
+                                        np.diff(indptr[lo:hi + 1]))
+                    yield [line % edge for edge in zip(
+                        sources.tolist(), indices[start:stop].tolist())]
+                lo = hi
+
+
+def export(lexicon: Lexicon, records: Iterable[str] = RECORDS,
+           chunk_records: int = CHUNK_RECORDS) -> Iterator[bytes]:
+    """
+    NDJSON of the given kinds of records, in RECORDS order, as chunks of
+    about chunk_records lines. Only one chunk is held at a time.
+    """
+    records = set(records)
+    unknown = records - set(RECORDS)
+    if unknown:
+        raise ValueError("Unknown records: %s" % ", ".join(sorted(unknown)))
+    return _export(lexicon, records, chunk_records)
+
+
+def _export(lexicon: Lexicon, records: set,
+            chunk_records: int) -> Iterator[bytes]:
+    graph = lexicon.graph
+    if "synsets" in records:
+        for ids in _ranges(len(graph), chunk_records):
+            yield "".join(synset_lines(lexicon, ids)).encode()
+    if "lemmas" in records:
+        for ids in _ranges(len(graph.lemma_names), chunk_records):
+            yield "".join(lemma_lines(lexicon, ids)).encode()
+    if "edges" in records:
+        for lines in edge_lines(lexicon, chunk_records):
+            yield "".join(lines).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--snapshot", help="WordNet snapshot to export")
+    parser.add_argument("--records", default=",".join(RECORDS),
+                        help="comma separated kinds of records to export")
+    parser.add_argument("--output", help="file to write instead of stdout")
+    args = parser.parse_args()
+    if args.snapshot:
+        wordnet_graphql.load_snapshot(args.snapshot)
+    chunks = export(wordnet_graphql.enable_lexicon(),
+                    args.records.split(","))
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
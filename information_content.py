@@ -0,0 +1,197 @@
+import math
+import os
+import tempfile
+import threading
+
+from nltk.corpus import wordnet_ic
+from nltk.corpus.reader.wordnet import Synset, WordNetError
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+DEFAULT_IC = "ic-brown.dat"
+
+# Compiled tables are written here, one .npy file per IC file.
+IC_CACHE_DIR = os.environ.get(
+    "WORDNET_IC_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "wordnet_graphql"))
+
+# NLTK's stand-in for the IC of a synset that was never counted.
+INFINITY = 1e300
+
+# Part of speech index packed into the low bits of each key.
+POS_CODES = {"n": 0, "v": 1, "a": 2, "r": 3}
+
+TABLE_DTYPE = np.dtype([("key", "<u4"), ("count", "<f8")])
+
+_tables = {}  # type: Dict[str, InformationContent]
+_lock = threading.Lock()
+
+
+def _key(pos: str, offset: int) -> int:
+    return offset * 4 + POS_CODES[pos]
+
+
+def table_from_dict(ic: dict) -> np.ndarray:
+    """
+    Packs an NLTK IC dict, from wordnet_ic.ic() or wn.ic(), into a table
+    sorted by key. Offset 0 holds the root count of each part of speech.
+    """
+    entries = [
+        (_key(pos, offset), count)
+        for pos, counts in ic.items()
+        for offset, count in counts.items()]
+    table = np.array(entries, dtype=TABLE_DTYPE)
+    table.sort(order="key")
+    return table
+
+
+def parse_ic_file(path: str) -> np.ndarray:
+    """
+    Reads an IC file as WordNetICCorpusReader.ic does.
+    """
+    counts = {"n": {}, "v": {}}
+    with open(path, encoding="utf8") as f:
+        next(f)
+        for line in f:
+            fields = line.split()
+            pos = fields[0][-1]
+            offset = int(fields[0][:-1])
+            value = float(fields[1])
+            if len(fields) == 3 and fields[2] == "ROOT":
+                counts[pos][0] = counts[pos].get(0, 0.0) + value
+            if value != 0:
+                counts[pos][offset] = value
+    return table_from_dict(counts)
+
+
+def compile_ic(name: str, cache_dir: str = IC_CACHE_DIR) -> str:
+    """
+    Compiles the wordnet_ic file name into cache_dir unless an up to date
+    copy is already there, and returns the compiled file's path.
+    """
+    if name not in wordnet_ic.fileids():
+        raise WordNetError("Unknown information content file: %s" % name)
+    source = wordnet_ic.abspath(name)
+    target = os.path.join(cache_dir, name + ".npy")
+    if (os.path.exists(target)
+            and os.path.getmtime(target) >= os.path.getmtime(source)):
+        return target
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written to a temporary file first so that concurrent workers never
+    # map a partially written table.
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, parse_ic_file(source))
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return target
+
+
+class InformationContent:
+    """
+    A read-only IC table, usually memory-mapped from a compiled file so
+    that every process on a host shares one copy. Scores are identical to
+    Synset.res_similarity, jcn_similarity and lin_similarity with the
+    corresponding NLTK IC dict.
+    """
+
+    def __init__(self, table: np.ndarray):
+        self.table = table
+        self.keys = table["key"]
+        self.counts = table["count"]
+        present = np.unique(self.keys % 4).tolist()
+        self.pos = {p for p, code in POS_CODES.items() if code in present}
+
+    @classmethod
+    def open(cls, path: str) -> "InformationContent":
+        return cls(np.load(path, mmap_mode="r"))
+
+    def count(self, pos: str, offset: int) -> float:
+        key = _key(pos, offset)
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return float(self.counts[i])
+        return 0.0
+
+    def _pos(self, synset: Synset) -> str:
+        pos = "a" if synset._pos == "s" else synset._pos
+        if pos not in self.pos:
+            raise WordNetError(
+                "Information content file has no entries for "
+                "part-of-speech: %s" % pos)
+        return pos
+
+    def information_content(self, synset: Synset) -> float:
+        pos = self._pos(synset)
+        counts = self.count(pos, synset._offset)
+        if counts == 0:
+            return INFINITY
+        return -math.log(counts / self.count(pos, 0))
+
+    def _max_information_content(self, pos: str,
+                                 synsets: List[Synset]) -> float:
+        # The subsumer with the smallest count, looked up in one pass.
+        keys = np.array([_key(pos, s._offset) for s in synsets],
+                        dtype=np.uint32)
+        i = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        counts = np.where(self.keys[i] == keys, self.counts[i], 0.0)
+        if (counts == 0).any():
+            return INFINITY
+        return -math.log(float(counts.min()) / self.count(pos, 0))
+
+    def lcs_ic(self, synset1: Synset,
+               synset2: Synset) -> Tuple[float, float, float]:
+        """
+        IC of both synsets and of their most informative common subsumer.
+        """
+        if synset1._pos != synset2._pos:
+            raise WordNetError(
+                "Computing the least common subsumer requires "
+                "%s and %s to have the same part of speech."
+                % (synset1, synset2))
+        ic1 = self.information_content(synset1)
+        ic2 = self.information_content(synset2)
+        subsumers = synset1.common_hypernyms(synset2)
+        if not subsumers:
+            return ic1, ic2, 0
+        return ic1, ic2, self._max_information_content(
+            self._pos(synset1), subsumers)
+
+    def res_similarity(self, synset1: Synset, synset2: Synset) -> float:
+        return self.lcs_ic(synset1, synset2)[2]
+
+    def jcn_similarity(self, synset1: Synset, synset2: Synset) -> float:
+        if synset1 == synset2:
+            return INFINITY
+        ic1, ic2, lcs_ic = self.lcs_ic(synset1, synset2)
+        if ic1 == 0 or ic2 == 0:
+            return 0
+        ic_difference = ic1 + ic2 - 2 * lcs_ic
+        if ic_difference == 0:
+            return INFINITY
+        return 1 / ic_difference
+
+    def lin_similarity(self, synset1: Synset, synset2: Synset) -> float:
+        ic1, ic2, lcs_ic = self.lcs_ic(synset1, synset2)
+        return (2.0 * lcs_ic) / (ic1 + ic2)
+
+
+def load(name: str = DEFAULT_IC,
+         cache_dir: str = IC_CACHE_DIR) -> InformationContent:
+    """
+    The table for the wordnet_ic file name, e.g. "ic-brown.dat", compiled
+    on first use and shared by the whole process.
+    """
+    if not name.endswith(".dat"):
+        name += ".dat"
+    with _lock:
+        table = _tables.get(name)
+        if table is None:
+            table = InformationContent.open(compile_ic(name, cache_dir))
+            _tables[name] = table
+        return table
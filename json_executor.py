@@ -0,0 +1,390 @@
+import json
+import logging
+import sys
+
+from collections.abc import Iterable
+from graphql import GraphQLError
+from graphql.error import GraphQLLocatedError
+from graphql.execution import ExecutionResult
+from graphql.execution.base import (
+    ResolveInfo, collect_fields, default_resolve_fn, get_field_def,
+    get_operation_root_type)
+from graphql.execution.executor import (
+    complete_leaf_value, get_default_resolve_type_fn)
+from graphql.execution.executors.sync import SyncExecutor
+from graphql.execution.middleware import MiddlewareManager
+from graphql.execution.utils import ExecutionContext
+from graphql.pyutils.default_ordered_dict import DefaultOrderedDict
+from graphql.type import (
+    GraphQLEnumType, GraphQLInterfaceType, GraphQLList, GraphQLNonNull,
+    GraphQLObjectType, GraphQLScalarType, GraphQLString, GraphQLUnionType)
+from json.encoder import encode_basestring_ascii as encode_string
+from promise import Promise, is_thenable
+from typing import Any, Callable, List
+
+# Resolver errors are logged as graphql-core logs them.
+logger = logging.getLogger("graphql.execution.executor")
+
+# Classes of values that are neither promises nor exceptions, which is
+# decided by class alone.
+_settled_classes = set()
+
+
+class RawJSON(str):
+    """
+    Text that is already JSON, the data of a result from execute_json(),
+    to be written out as is rather than as a string.
+    """
+
+    __slots__ = ()
+
+
+def _leaf(value) -> str:
+    kind = type(value)
+    if kind is str:
+        return encode_string(value)
+    if kind is bool:
+        return "true" if value else "false"
+    if kind is int:
+        return int.__repr__(value)
+    if kind is float and value - value == 0:
+        return float.__repr__(value)
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _object(keys: List[str], values: list) -> str:
+    return "{%s}" % ",".join([
+        key + ("null" if value is None else value)
+        for key, value in zip(keys, values)])
+
+
+def _list(values: list) -> str:
+    return "[%s]" % ",".join([
+        "null" if value is None else value for value in values])
+
+
+def _settled(value) -> bool:
+    cls = value.__class__
+    if cls in _settled_classes:
+        return True
+    if isinstance(value, Exception) or is_thenable(value):
+        return False
+    _settled_classes.add(cls)
+    return True
+
+
+def _deferred(complete, field_asts, info, path, result):
+    # complete() of what the promise result resolves to, or the error
+    # result is.
+    if isinstance(result, Exception):
+        raise GraphQLLocatedError(field_asts, original_error=result,
+                                  path=path)
+    return Promise.resolve(result).then(
+        lambda resolved: complete(field_asts, info, path, resolved),
+        lambda error: Promise.rejected(GraphQLLocatedError(
+            field_asts, original_error=error, path=path)))
+
+
+class _Field:
+    """
+    What resolving a field needs besides its source and path, the same
+    for every object the field is resolved on within a request.
+    """
+
+    __slots__ = ("name", "field_asts", "return_type", "resolver", "args",
+                 "complete")
+
+    def __init__(self, name, field_asts, return_type, resolver, args,
+                 complete):
+        self.name = name
+        self.field_asts = field_asts
+        self.return_type = return_type
+        self.resolver = resolver
+        self.args = args
+        self.complete = complete
+
+
+# complete(field_asts, info, path, result): the JSON of result, None for
+# null, or a promise of either.
+Completer = Callable[[list, ResolveInfo, list, Any], Any]
+
+
+class JSONExecutionContext(ExecutionContext):
+    """
+    An ExecutionContext that also keeps, per selection set, the fields to
+    resolve with their resolvers, arguments and JSON keys, and per type a
+    function completing values of that type, so that neither is worked
+    out again for every object.
+    """
+
+    __slots__ = ("_plans", "_completers", "_sync")
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._plans = {}
+        self._completers = {}
+        self._sync = type(self.executor) is SyncExecutor
+
+    def plan(self, parent_type, fields):
+        key = (parent_type, id(fields))
+        plan = self._plans.get(key)
+        if plan is None:
+            keys, plan_fields = [], []
+            for response_name, field_asts in fields.items():
+                field_def = get_field_def(
+                    self.schema, parent_type, field_asts[0].name.value)
+                if not field_def:
+                    continue
+                keys.append(encode_string(response_name) + ":")
+                plan_fields.append(_Field(
+                    response_name, field_asts, field_def.type,
+                    self.get_field_resolver(
+                        field_def.resolver or default_resolve_fn),
+                    self.get_argument_values(field_def, field_asts[0]),
+                    self.catching(field_def.type)))
+            # fields is kept alive so that its id is not reused.
+            plan = self._plans[key] = (keys, plan_fields, fields)
+        return plan
+
+    def resolve(self, field: _Field, source, info: ResolveInfo):
+        # graphql-core's resolve_or_error(), calling the resolver directly
+        # when the executor would only do that.
+        try:
+            if self._sync:
+                return field.resolver(source, info, **field.args)
+            return self.executor.execute(
+                field.resolver, source, info, **field.args)
+        except Exception as e:
+            logger.exception(
+                "An error occurred while resolving field {}.{}".format(
+                    info.parent_type.name, info.field_name))
+            e.stack = sys.exc_info()[2]
+            return e
+
+    def catching(self, return_type) -> Completer:
+        """
+        The completer of return_type, reporting errors and completing to
+        null instead of raising them unless the type is non-null.
+        """
+        complete = self.completer(return_type)
+        if isinstance(return_type, GraphQLNonNull):
+            return complete
+
+        def catching(field_asts, info, path, result):
+            try:
+                completed = complete(field_asts, info, path, result)
+            except Exception as e:
+                self.report_error(e, e.__traceback__)
+                return None
+            if completed is None or completed.__class__ is str \
+                    or not is_thenable(completed):
+                return completed
+
+            def handle_error(error):
+                self.report_error(error, completed._traceback)
+                return None
+
+            return completed.catch(handle_error)
+
+        return catching
+
+    def completer(self, return_type) -> Completer:
+        """
+        graphql-core's complete_value() for values of return_type, writing
+        JSON instead of building values.
+        """
+        complete = self._completers.get(return_type)
+        if complete is None:
+            if isinstance(return_type, GraphQLNonNull):
+                complete = self._non_null(return_type)
+            elif isinstance(return_type, GraphQLList):
+                complete = self._list(return_type)
+            elif isinstance(return_type, (GraphQLScalarType,
+                                          GraphQLEnumType)):
+                complete = self._leaf(return_type)
+            elif isinstance(return_type, (GraphQLInterfaceType,
+                                          GraphQLUnionType)):
+                complete = self._abstract(return_type)
+            elif isinstance(return_type, GraphQLObjectType):
+                complete = self._object(return_type)
+            else:
+                raise AssertionError(
+                    'Cannot complete value of unexpected type "{}".'.format(
+                        return_type))
+            self._completers[return_type] = complete
+        return complete
+
+    def _non_null(self, return_type) -> Completer:
+        inner = self.completer(return_type.of_type)
+
+        def complete(field_asts, info, path, result):
+            if result is not None and not _settled(result):
+                return _deferred(complete, field_asts, info, path, result)
+            completed = inner(field_asts, info, path, result)
+            if completed is None:
+                raise GraphQLError(
+                    "Cannot return null for non-nullable field {}.{}."
+                    .format(info.parent_type, info.field_name),
+                    field_asts, path=path)
+            return completed
+
+        return complete
+
+    def _list(self, return_type) -> Completer:
+        item = self.catching(return_type.of_type)
+
+        def complete(field_asts, info, path, result):
+            if result is None:
+                return None
+            if not _settled(result):
+                return _deferred(complete, field_asts, info, path, result)
+            assert isinstance(result, Iterable), (
+                "User Error: expected iterable, but did not find one for "
+                "field {}.{}.").format(info.parent_type, info.field_name)
+            values = []
+            contains_promise = False
+            for index, value in enumerate(result):
+                value = item(field_asts, info, path + [index], value)
+                if value is not None and value.__class__ is not str:
+                    contains_promise = True
+                values.append(value)
+            if not contains_promise:
+                return _list(values)
+            return Promise.all(values).then(_list)
+
+        return complete
+
+    def _leaf(self, return_type) -> Completer:
+        string = return_type is GraphQLString
+
+        def complete(field_asts, info, path, result):
+            if string and result.__class__ is str:
+                return encode_string(result)
+            if result is None:
+                return None
+            if not _settled(result):
+                return _deferred(complete, field_asts, info, path, result)
+            return _leaf(complete_leaf_value(return_type, path, result))
+
+        return complete
+
+    def _object(self, return_type) -> Completer:
+        is_type_of = return_type.is_type_of
+
+        def complete(field_asts, info, path, result):
+            if result is None:
+                return None
+            if not _settled(result):
+                return _deferred(complete, field_asts, info, path, result)
+            if is_type_of and not is_type_of(result, info):
+                raise GraphQLError(
+                    'Expected value of type "{}" but got: {}.'.format(
+                        return_type, type(result).__name__), field_asts)
+            return execute_fields(
+                self, return_type, result,
+                self.get_sub_fields(return_type, field_asts), path)
+
+        return complete
+
+    def _abstract(self, return_type) -> Completer:
+
+        def complete(field_asts, info, path, result):
+            if result is None:
+                return None
+            if not _settled(result):
+                return _deferred(complete, field_asts, info, path, result)
+            if return_type.resolve_type:
+                runtime_type = return_type.resolve_type(result, info)
+            else:
+                runtime_type = get_default_resolve_type_fn(
+                    result, info, return_type)
+            if isinstance(runtime_type, str):
+                runtime_type = info.schema.get_type(runtime_type)
+            if not isinstance(runtime_type, GraphQLObjectType):
+                raise GraphQLError(
+                    "Abstract type {} must resolve to an Object type at "
+                    'runtime for field {}.{} with value "{}", received '
+                    '"{}".'.format(return_type, info.parent_type,
+                                   info.field_name, result, runtime_type),
+                    field_asts)
+            if not self.schema.is_possible_type(return_type, runtime_type):
+                raise GraphQLError(
+                    'Runtime Object type "{}" is not a possible type for '
+                    '"{}".'.format(runtime_type, return_type), field_asts)
+            return self.completer(runtime_type)(
+                field_asts, info, path, result)
+
+        return complete
+
+
+def execute_json(schema, document_ast, root_value=None, context=None,
+                 variables=None, operation_name=None, executor=None,
+                 return_promise=False, middleware=None):
+    """
+    graphql-core's execute(), except that the data of the result is the
+    RawJSON of the response's data. Each object's JSON is written as soon
+    as its fields are resolved, in the order the query selected them,
+    without building a dict of it first.
+    """
+    if middleware and not isinstance(middleware, MiddlewareManager):
+        middleware = MiddlewareManager(*middleware)
+    if executor is None:
+        executor = SyncExecutor()
+    exe_context = JSONExecutionContext(
+        schema, document_ast, root_value, context, variables or {},
+        operation_name, executor, middleware, False)
+
+    def execute_operation(_):
+        operation = exe_context.operation
+        root_type = get_operation_root_type(schema, operation)
+        fields = collect_fields(exe_context, root_type,
+                                operation.selection_set,
+                                DefaultOrderedDict(list), set())
+        return execute_fields(exe_context, root_type, root_value, fields, [])
+
+    def on_rejected(error):
+        exe_context.errors.append(error)
+        return None
+
+    def on_resolve(data):
+        return ExecutionResult(
+            data=None if data is None else RawJSON(data),
+            errors=exe_context.errors or None)
+
+    promise = Promise.resolve(None).then(execute_operation).catch(
+        on_rejected).then(on_resolve)
+    if not return_promise:
+        exe_context.executor.wait_until_finished()
+        return promise.get()
+    clean = getattr(exe_context.executor, "clean", None)
+    if callable(clean):
+        clean()
+    return promise
+
+
+def execute_fields(exe_context: JSONExecutionContext, parent_type, source,
+                   fields, path: List):
+    """
+    The JSON object of the fields of source, or a promise of it.
+    """
+    keys, plan_fields, _ = exe_context.plan(parent_type, fields)
+    values = []
+    contains_promise = False
+    for field in plan_fields:
+        field_path = path + [field.name]
+        info = ResolveInfo(
+            field.field_asts[0].name.value, field.field_asts,
+            field.return_type, parent_type, schema=exe_context.schema,
+            fragments=exe_context.fragments,
+            root_value=exe_context.root_value,
+            operation=exe_context.operation,
+            variable_values=exe_context.variable_values,
+            context=exe_context.context_value, path=field_path)
+        value = field.complete(field.field_asts, info, field_path,
+                               exe_context.resolve(field, source, info))
+        if value is not None and value.__class__ is not str:
+            contains_promise = True
+        values.append(value)
+    if not contains_promise:
+        return _object(keys, values)
+    return Promise.all(values).then(lambda values: _object(keys, values))
@@ -0,0 +1,172 @@
+import bisect
+import heapq
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from wordnet_graph import WordNetGraph
+
+MAX_EDITS = 2
+
+# Sorts after every character in lemma names, so that all keys starting
+# with a prefix p sort before p + _LAST.
+_LAST = "\U0010ffff"
+
+
+def normalize(name: str) -> str:
+    """
+    The form lemma names are searched by: lower case, with spaces written
+    as underscores as in WordNet.
+    """
+    return name.strip().lower().replace(" ", "_")
+
+
+class _PrefixIndex:
+    """
+    The lemmas of one part of speech sorted by normalized name, then by
+    decreasing count, with a sparse table over counts, so that the most
+    frequent lemmas in any range of names are found without scanning it.
+    """
+
+    def __init__(self, names: List[str], counts: np.ndarray,
+                 ids: np.ndarray):
+        order = sorted(ids.tolist(),
+                       key=lambda i: (names[i], -int(counts[i]), i))
+        self.ids = np.array(order, dtype=np.int32)
+        self.keys = [names[i] for i in order]
+        self.counts = counts[self.ids]
+        # levels[j][i] is the position of the largest count in
+        # [i, i + 2 ** j), the first one on ties.
+        self.levels = [np.arange(len(order), dtype=np.int32)]
+        width = 1
+        while 2 * width <= len(order):
+            previous = self.levels[-1]
+            a, b = previous[:-width], previous[width:]
+            self.levels.append(
+                np.where(self.counts[b] > self.counts[a], b, a))
+            width *= 2
+
+    def range(self, prefix: str) -> Tuple[int, int]:
+        return (bisect.bisect_left(self.keys, prefix),
+                bisect.bisect_left(self.keys, prefix + _LAST))
+
+    def _argmax(self, lo: int, hi: int) -> int:
+        level = (hi - lo).bit_length() - 1
+        a = int(self.levels[level][lo])
+        b = int(self.levels[level][hi - (1 << level)])
+        return b if self.counts[b] > self.counts[a] else a
+
+    def top(self, lo: int, hi: int, limit: int) -> List[int]:
+        """
+        Positions of the limit largest counts in [lo, hi), largest first
+        and ties in position order.
+        """
+        result, heap = [], []
+
+        def push(lo, hi):
+            if lo < hi:
+                m = self._argmax(lo, hi)
+                heapq.heappush(heap, (-int(self.counts[m]), m, lo, hi))
+
+        push(lo, hi)
+        while heap and len(result) < limit:
+            _, m, lo, hi = heapq.heappop(heap)
+            result.append(m)
+            push(lo, m)
+            push(m + 1, hi)
+        return result
+
+
+class LemmaSearch:
+    """
+    Prefix and fuzzy search over the names of every lemma in a graph,
+    ranked by Lemma.count().
+
+    Names are kept sorted, so the lemmas starting with a prefix are one
+    range found by binary search, and a sparse table over counts yields
+    the most frequent of them in O(limit log limit). Fuzzy search walks
+    the same sorted names as a trie, carrying a row of the Levenshtein
+    table down each branch and leaving it once every entry exceeds the
+    allowed edits, so only names near the term are visited.
+    """
+
+    def __init__(self, graph: WordNetGraph, counts: np.ndarray):
+        self.graph = graph
+        self.counts = np.asarray(counts)
+        self.names = [normalize(name) for name in graph.lemma_names]
+        self._indexes = {}  # type: Dict[Optional[str], _PrefixIndex]
+
+    def _index(self, pos: Optional[str]) -> _PrefixIndex:
+        if pos not in self._indexes:
+            ids = np.arange(len(self.names), dtype=np.int32)
+            if pos is not None:
+                ids = ids[np.isin(self.graph.lemma_synsets,
+                                  self.graph.positions.select(pos))]
+            self._indexes[pos] = _PrefixIndex(self.names, self.counts, ids)
+        return self._indexes[pos]
+
+    def prefix(self, prefix: str, pos: Optional[str] = None,
+               limit: int = 10) -> List[int]:
+        """
+        Ids of the limit most frequent lemmas whose names start with
+        prefix, of part of speech pos if given ("a" includes satellites).
+        Ties go to the alphabetically first name, then to WordNet order.
+        """
+        index = self._index(pos)
+        lo, hi = index.range(normalize(prefix))
+        return [int(index.ids[m]) for m in index.top(lo, hi, limit)]
+
+    def fuzzy(self, term: str, max_edits: int = 1,
+              limit: int = 10) -> List[int]:
+        """
+        Ids of lemmas whose names are within max_edits insertions,
+        deletions or substitutions of term: closest first, then most
+        frequent, with ties as in prefix().
+        """
+        if not 0 <= max_edits <= MAX_EDITS:
+            raise ValueError(
+                "max_edits must be between 0 and %d" % MAX_EDITS)
+        index = self._index(None)
+        keys = index.keys
+        term = normalize(term)
+        n, worst = len(term), max_edits + 1
+        matches = []
+        stack = [("", 0, len(keys),
+                  [min(j, worst) for j in range(n + 1)])]
+        while stack:
+            prefix, lo, hi, row = stack.pop()
+            depth = len(prefix)
+            if lo < hi and keys[lo] == prefix:
+                end = bisect.bisect_right(keys, prefix, lo, hi)
+                if row[-1] <= max_edits:
+                    matches.extend(
+                        (row[-1], -int(index.counts[m]), m)
+                        for m in range(lo, end))
+                lo = end
+            while lo < hi:
+                c = keys[lo][depth]
+                end = bisect.bisect_left(
+                    keys, prefix + chr(ord(c) + 1), lo, hi)
+                # Cells more than max_edits off the diagonal can only
+                # exceed max_edits, so they stay capped at worst.
+                next_row = [worst] * (n + 1)
+                if depth < max_edits:
+                    next_row[0] = depth + 1
+                best = next_row[0]
+                for j in range(max(1, depth + 1 - max_edits),
+                               min(n, depth + 1 + max_edits) + 1):
+                    cell = row[j - 1] + (term[j - 1] != c)
+                    if row[j] < cell:
+                        cell = row[j] + 1
+                    if next_row[j - 1] < cell:
+                        cell = next_row[j - 1] + 1
+                    if cell < worst:
+                        next_row[j] = cell
+                        if cell < best:
+                            best = cell
+                if best <= max_edits:
+                    stack.append((prefix + c, lo, end, next_row))
+                lo = end
+        return [int(index.ids[m]) for _, _, m in heapq.nsmallest(
+            limit, matches)]
@@ -0,0 +1,373 @@
+from collections.abc import Sequence
+from nltk.corpus import wordnet as wn
+from nltk.corpus.reader.wordnet import VERB_FRAME_STRINGS, Lemma, Synset
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from wordnet_graph import WordNetGraph
+
+
+class StringTable(Sequence):
+    """
+    Strings stored as one UTF-8 blob and their end offsets, plus the ids
+    in sorted order for lookups by value.
+    """
+
+    def __init__(self, blob: np.ndarray, ends: np.ndarray,
+                 order: np.ndarray):
+        self._blob = memoryview(blob)
+        self._ends = ends
+        self._order = order
+
+    @classmethod
+    def arrays(cls, strings: List[str]) -> Dict[str, np.ndarray]:
+        encoded = [s.encode("utf-8") for s in strings]
+        order = sorted(range(len(encoded)), key=encoded.__getitem__)
+        return {
+            "blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            "ends": np.cumsum([len(s) for s in encoded], dtype=np.int64),
+            "order": np.array(order, dtype=np.int32),
+        }
+
+    @classmethod
+    def load(cls, array: Callable[[str], np.ndarray],
+             name: str) -> "StringTable":
+        return cls(array(name + ".blob"), array(name + ".ends"),
+                   array(name + ".order"))
+
+    def __len__(self):
+        return len(self._ends)
+
+    def _bytes(self, i: int) -> bytes:
+        start = int(self._ends[i - 1]) if i > 0 else 0
+        return bytes(self._blob[start:int(self._ends[i])])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step == 1:
+                return self._run(start, stop)
+            return self.take(range(start, stop, step))
+        if i < 0:
+            i += len(self)
+        return self._bytes(i).decode("utf-8")
+
+    def _run(self, start: int, stop: int) -> List[str]:
+        # Consecutive strings are one span of the blob, decoded at once
+        # and split at character offsets when it is all ASCII.
+        if start >= stop:
+            return []
+        ends = self._ends[start:stop].tolist()
+        first = int(self._ends[start - 1]) if start > 0 else 0
+        data = bytes(self._blob[first:ends[-1]])
+        text = data.decode("utf-8")
+        if len(text) != len(data):
+            text = data
+        strings, offset = [], 0
+        for end in ends:
+            strings.append(text[offset:end - first])
+            offset = end - first
+        if text is data:
+            return [s.decode("utf-8") for s in strings]
+        return strings
+
+    def take(self, ids: Sequence) -> List[str]:
+        """
+        The strings of ids, with their offsets looked up all at once.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        stops = self._ends[ids]
+        starts = np.where(ids > 0, self._ends[ids - 1], 0)
+        blob = self._blob
+        return [bytes(blob[start:stop]).decode("utf-8")
+                for start, stop in zip(starts.tolist(), stops.tolist())]
+
+    def find(self, s: str) -> int:
+        """
+        The id of s, or -1.
+        """
+        key = s.encode("utf-8")
+        order = self._order
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(int(order[mid])) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order) and self._bytes(int(order[lo])) == key:
+            return int(order[lo])
+        return -1
+
+
+def _ragged(lists: List[List[int]], dtype) -> Dict[str, np.ndarray]:
+    return {
+        "ends": np.cumsum([len(l) for l in lists], dtype=np.int64),
+        "values": np.array([x for l in lists for x in l], dtype=dtype),
+    }
+
+
+class Lexicon:
+    """
+    The text of every synset and lemma (definitions, examples, frames,
+    sense keys and counts) in shared arenas. Each distinct string is stored
+    once, and synsets and lemmas refer to strings by id, so the whole
+    lexicon takes a few tens of MB and can be mapped from a snapshot
+    instead of being held as NLTK objects.
+    """
+
+    def __init__(self, graph: WordNetGraph,
+                 array: Callable[[str], np.ndarray]):
+        self.graph = graph
+        self.texts = StringTable.load(array, "texts")
+        self.lexnames = list(StringTable.load(array, "lexnames"))
+        self.keys = StringTable.load(array, "lemma_keys")
+        self.definitions = array("synset_definitions")
+        self.lexname_ids = array("synset_lexnames")
+        self.example_ends = array("synset_examples.ends")
+        self.examples = array("synset_examples.values")
+        self.synset_frame_ends = array("synset_frames.ends")
+        self.synset_frames = array("synset_frames.values")
+        self.lemma_frame_ends = array("lemma_frames.ends")
+        self.lemma_frames = array("lemma_frames.values")
+        self.markers = array("lemma_markers")
+        self.counts = array("lemma_counts")
+
+    @staticmethod
+    def arrays(graph: WordNetGraph, wordnet=wn) -> Dict[str, np.ndarray]:
+        """
+        Reads the text of every synset in graph, as the arrays __init__
+        takes.
+        """
+        texts = {}
+
+        def intern(s):
+            return texts.setdefault(s, len(texts))
+
+        lexnames = {}
+        counts = {}
+        with wordnet.open("cntlist.rev") as f:
+            for line in f:
+                fields = line.split()
+                counts[fields[0]] = int(fields[-1])
+        definitions, examples, lexname_ids, synset_frames = [], [], [], []
+        keys, markers, lemma_counts, lemma_frames = [], [], [], []
+        for i in range(len(graph)):
+            synset = graph.positions.synset(i)
+            definitions.append(intern(synset.definition()))
+            examples.append([intern(e) for e in synset.examples()])
+            lexname_ids.append(
+                lexnames.setdefault(synset.lexname(), len(lexnames)))
+            synset_frames.append(synset.frame_ids())
+            for lemma in synset.lemmas():
+                keys.append(lemma.key())
+                marker = lemma.syntactic_marker()
+                markers.append(-1 if marker is None else intern(marker))
+                lemma_counts.append(counts.get(lemma.key(), 0))
+                lemma_frames.append(lemma.frame_ids())
+
+        arrays = {}
+        for name, strings in (("texts", list(texts)),
+                              ("lexnames", list(lexnames)),
+                              ("lemma_keys", keys)):
+            for key, array in StringTable.arrays(strings).items():
+                arrays["%s.%s" % (name, key)] = array
+        for name, lists, dtype in (
+                ("synset_examples", examples, np.int32),
+                ("synset_frames", synset_frames, np.uint8),
+                ("lemma_frames", lemma_frames, np.uint8)):
+            for key, array in _ragged(lists, dtype).items():
+                arrays["%s.%s" % (name, key)] = array
+        arrays["synset_definitions"] = np.array(definitions, dtype=np.int32)
+        arrays["synset_lexnames"] = np.array(lexname_ids, dtype=np.uint8)
+        arrays["lemma_markers"] = np.array(markers, dtype=np.int32)
+        arrays["lemma_counts"] = np.array(lemma_counts, dtype=np.int32)
+        return arrays
+
+    @classmethod
+    def build(cls, graph: WordNetGraph, wordnet=wn) -> "Lexicon":
+        return cls(graph, cls.arrays(graph, wordnet).__getitem__)
+
+    def synset(self, i: int) -> "SynsetHandle":
+        return SynsetHandle(self, i)
+
+    def lemma(self, i: int) -> "LemmaHandle":
+        return LemmaHandle(self, i)
+
+
+def _span(ends: np.ndarray, i: int) -> slice:
+    return slice(int(ends[i - 1]) if i > 0 else 0, int(ends[i]))
+
+
+class SynsetHandle:
+    """
+    A synset by id, with the scalar accessors of Synset served from the
+    lexicon. load() gets the NLTK object for anything else.
+    """
+
+    __slots__ = ("lexicon", "id")
+
+    def __init__(self, lexicon: Lexicon, i: int):
+        self.lexicon = lexicon
+        self.id = i
+
+    def load(self) -> Synset:
+        return self.lexicon.graph.synset(self.id)
+
+    def name(self) -> str:
+        return self.lexicon.graph.synset_names[self.id]
+
+    def pos(self) -> str:
+        return self.lexicon.graph.synset_pos[self.id].decode()
+
+    def offset(self) -> int:
+        return int(self.lexicon.graph.synset_offsets[self.id])
+
+    def definition(self) -> str:
+        return self.lexicon.texts[int(self.lexicon.definitions[self.id])]
+
+    def examples(self) -> List[str]:
+        lexicon = self.lexicon
+        ids = lexicon.examples[_span(lexicon.example_ends, self.id)]
+        return [lexicon.texts[i] for i in ids.tolist()]
+
+    def lexname(self) -> str:
+        return self.lexicon.lexnames[int(self.lexicon.lexname_ids[self.id])]
+
+    def frame_ids(self) -> List[int]:
+        lexicon = self.lexicon
+        return lexicon.synset_frames[
+            _span(lexicon.synset_frame_ends, self.id)].tolist()
+
+    def lemma_ids(self) -> List[int]:
+        return self.lexicon.graph.synset_lemmas.neighbors(self.id)
+
+    def lemma_names(self) -> List[str]:
+        names = self.lexicon.graph.lemma_names
+        return [names[j] for j in self.lemma_ids()]
+
+    def lemmas(self) -> List["LemmaHandle"]:
+        return [LemmaHandle(self.lexicon, j) for j in self.lemma_ids()]
+
+    def related(self, relation: str) -> List["SynsetHandle"]:
+        adjacency = self.lexicon.graph.synset_relations[relation]
+        return [type(self)(self.lexicon, j)
+                for j in adjacency.neighbors(self.id)]
+
+
+class LemmaHandle:
+    """
+    A lemma by id, with the scalar accessors of Lemma served from the
+    lexicon. load() gets the NLTK object for anything else.
+    """
+
+    __slots__ = ("lexicon", "id")
+
+    def __init__(self, lexicon: Lexicon, i: int):
+        self.lexicon = lexicon
+        self.id = i
+
+    def load(self) -> Lemma:
+        return self.lexicon.graph.lemma(self.id)
+
+    def name(self) -> str:
+        return self.lexicon.graph.lemma_names[self.id]
+
+    def synset(self) -> SynsetHandle:
+        return SynsetHandle(
+            self.lexicon, int(self.lexicon.graph.lemma_synsets[self.id]))
+
+    def key(self) -> str:
+        return self.lexicon.keys[self.id]
+
+    def count(self) -> int:
+        return int(self.lexicon.counts[self.id])
+
+    def syntactic_marker(self) -> str:
+        marker = int(self.lexicon.markers[self.id])
+        return None if marker < 0 else self.lexicon.texts[marker]
+
+    def lang(self) -> str:
+        return "eng"
+
+    def frame_ids(self) -> List[int]:
+        lexicon = self.lexicon
+        return lexicon.lemma_frames[
+            _span(lexicon.lemma_frame_ends, self.id)].tolist()
+
+    def frame_strings(self) -> List[str]:
+        name = self.name()
+        return [VERB_FRAME_STRINGS[i] % name for i in self.frame_ids()]
+
+    def related(self, relation: str) -> List["LemmaHandle"]:
+        adjacency = self.lexicon.graph.lemma_relations[relation]
+        return [type(self)(self.lexicon, j)
+                for j in adjacency.neighbors(self.id)]
+
+
+class GraphColumns:
+    """
+    Stands in for a Lexicon when a graph has none: index handles on it
+    only use the graph's arrays.
+    """
+
+    __slots__ = ("graph",)
+
+    def __init__(self, graph: WordNetGraph):
+        self.graph = graph
+
+    def synset(self, i: int) -> "IndexSynsetHandle":
+        return IndexSynsetHandle(self, i)
+
+    def lemma(self, i: int) -> "IndexLemmaHandle":
+        return IndexLemmaHandle(self, i)
+
+
+class IndexSynsetHandle(SynsetHandle):
+    """
+    A synset by id on GraphColumns. The name, pos, offset, lemmas and
+    relations come from the graph's arrays, without reading the data
+    files; the accessors for text load the NLTK synset.
+    """
+
+    __slots__ = ()
+
+    def definition(self) -> str:
+        return self.load().definition()
+
+    def examples(self) -> List[str]:
+        return self.load().examples()
+
+    def lexname(self) -> str:
+        return self.load().lexname()
+
+    def frame_ids(self) -> List[int]:
+        return self.load().frame_ids()
+
+    def lemmas(self) -> List["IndexLemmaHandle"]:
+        return [IndexLemmaHandle(self.lexicon, j) for j in self.lemma_ids()]
+
+
+class IndexLemmaHandle(LemmaHandle):
+    """
+    A lemma by id on GraphColumns, as IndexSynsetHandle is for synsets.
+    """
+
+    __slots__ = ()
+
+    def synset(self) -> IndexSynsetHandle:
+        return IndexSynsetHandle(
+            self.lexicon, int(self.lexicon.graph.lemma_synsets[self.id]))
+
+    def key(self) -> str:
+        return self.load().key()
+
+    def count(self) -> int:
+        return self.load().count()
+
+    def syntactic_marker(self) -> str:
+        return self.load().syntactic_marker()
+
+    def frame_ids(self) -> List[int]:
+        return self.load().frame_ids()
@@ -0,0 +1,88 @@
+from nltk.corpus import wordnet as wn
+from nltk.corpus.reader.wordnet import Synset, Lemma
+from promise import Promise
+from promise.dataloader import DataLoader
+from typing import List, Optional
+
+from wordnet_graph import WordNetGraph
+
+
+def _settle(load, key):
+    # DataLoader rejects the promise for a key whose batch value is an
+    # exception, so a bad name fails only the fields that asked for it.
+    try:
+        return load(key)
+    except Exception as e:
+        return e
+
+
+class SynsetLoader(DataLoader):
+    """
+    Loads synsets by name, e.g. every otherSynsetName argument of a query.
+    Each distinct name is parsed and looked up once per request.
+    """
+
+    def __init__(self, graph: Optional[WordNetGraph] = None, **kwargs):
+        DataLoader.__init__(self, **kwargs)
+        self.graph = graph
+
+    def _load(self, name: str) -> Synset:
+        if self.graph is not None:
+            try:
+                return self.graph.synset(self.graph.synset_id_by_name(name))
+            except KeyError:
+                pass
+        return wn.synset(name)
+
+    def batch_load_fn(self, names: List[str]) -> Promise:
+        return Promise.resolve([_settle(self._load, n) for n in names])
+
+
+class LemmaLoader(DataLoader):
+    """
+    Loads lemmas by "<synset name>.<lemma name>" id.
+    """
+
+    def batch_load_fn(self, ids: List[str]) -> Promise:
+        return Promise.resolve([_settle(wn.lemma, i) for i in ids])
+
+
+def _relation_key(key):
+    wordnet_obj, relation = key
+    if isinstance(wordnet_obj, Lemma):
+        return (wordnet_obj._synset._name, wordnet_obj._name, relation)
+    return (wordnet_obj._name, relation)
+
+
+class RelationLoader(DataLoader):
+    """
+    Expands (synset or lemma, relation name) pairs. All expansions requested
+    at one level of a query are resolved together, and a node that appears
+    many times in the result is only expanded once.
+    """
+
+    def __init__(self, graph: Optional[WordNetGraph] = None, **kwargs):
+        kwargs.setdefault("get_cache_key", _relation_key)
+        DataLoader.__init__(self, **kwargs)
+        self.graph = graph
+
+    def _expand(self, key) -> list:
+        wordnet_obj, relation = key
+        if self.graph is not None:
+            return self.graph.related(wordnet_obj, relation)
+        return getattr(wordnet_obj, relation)()
+
+    def batch_load_fn(self, keys) -> Promise:
+        return Promise.resolve([_settle(self._expand, k) for k in keys])
+
+
+class Loaders:
+    """
+    The DataLoaders for a single request. Loaders cache everything they load,
+    so a new set must be created per request.
+    """
+
+    def __init__(self, graph: Optional[WordNetGraph] = None):
+        self.synsets = SynsetLoader(graph)
+        self.lemmas = LemmaLoader()
+        self.relations = RelationLoader(graph)
@@ -0,0 +1,224 @@
+import bisect
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from promise import Promise, is_thenable
+
+# Upper bounds, in seconds, of the buckets time histograms count into.
+TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the buckets list sizes are counted into.
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 10000)
+
+# kind -> (metric name, label, help, buckets)
+_KINDS = OrderedDict([
+    ("phase", ("wordnet_graphql_phase_seconds", "phase",
+               "Time spent parsing, validating, executing and serializing "
+               "requests.", TIME_BUCKETS)),
+    ("resolver", ("wordnet_graphql_resolver_seconds", "field",
+                  "Time until each field's resolver produced its value.",
+                  TIME_BUCKETS)),
+    ("size", ("wordnet_graphql_resolver_list_size", "field",
+              "Lengths of the lists resolvers returned.", SIZE_BUCKETS)),
+    ("reader", ("wordnet_graphql_reader_seconds", "method",
+                "Time spent in NLTK reader methods that read the data "
+                "files.", TIME_BUCKETS)),
+])
+
+
+class Histogram:
+    """
+    Counts of observed values per bucket, with their sum, as a Prometheus
+    histogram.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """
+        (le, count of values <= le) per bucket, ending with "+Inf".
+        """
+        result, total = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            result.append((bound if isinstance(bound, str)
+                           else "%g" % bound, total))
+        return result
+
+
+class Metrics:
+    """
+    Aggregate histograms of request phases, resolver times and list sizes
+    per field, and NLTK reader calls, safe to update from several threads.
+    render() gives them in Prometheus' text exposition format.
+    """
+
+    def __init__(self):
+        self._histograms = {
+            kind: {} for kind in _KINDS
+        }  # type: Dict[str, Dict[str, Histogram]]
+        self._lock = threading.Lock()
+
+    def _observe(self, kind: str, label: str, value: float):
+        histograms = self._histograms[kind]
+        histogram = histograms.get(label)
+        if histogram is None:
+            histogram = histograms[label] = Histogram(_KINDS[kind][3])
+        histogram.observe(value)
+
+    def observe(self, kind: str, label: str, value: float):
+        """
+        Adds value to the histogram of kind ("phase", "resolver", "size"
+        or "reader") labelled label.
+        """
+        with self._lock:
+            self._observe(kind, label, value)
+
+    def record(self, timer: "RequestTimer"):
+        """
+        Adds what timer measured during its request.
+        """
+        with self._lock:
+            for phase, seconds in timer.phases.items():
+                self._observe("phase", phase, seconds)
+            for info, start, end, size in timer.resolvers:
+                field = _field(info)
+                self._observe("resolver", field, end - start)
+                if size is not None:
+                    self._observe("size", field, size)
+
+    def histogram(self, kind: str, label: str) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms[kind].get(label)
+
+    def clear(self):
+        with self._lock:
+            for histograms in self._histograms.values():
+                histograms.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for kind, (name, label, help, _) in _KINDS.items():
+                lines.append("# HELP %s %s" % (name, help))
+                lines.append("# TYPE %s histogram" % name)
+                for value, histogram in sorted(
+                        self._histograms[kind].items()):
+                    labels = '%s="%s"' % (label, _escape(value))
+                    for le, count in histogram.cumulative():
+                        lines.append('%s_bucket{%s,le="%s"} %d' % (
+                            name, labels, le, count))
+                    lines.append("%s_sum{%s} %r" % (
+                        name, labels, histogram.sum))
+                    lines.append("%s_count{%s} %d" % (
+                        name, labels, histogram.count))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace(
+        "\n", "\\n")
+
+
+class RequestTimer:
+    """
+    Middleware timing every resolver of one request, along with the
+    phases the request goes through. A resolver that returns a promise or
+    future is timed until it resolves.
+
+    When the request finishes, what was measured is added to metrics and,
+    with trace, listed in the response's extensions.
+    """
+
+    def __init__(self, metrics: Optional[Metrics] = None,
+                 trace: bool = False):
+        self.metrics = metrics
+        self.trace = trace
+        self.start = perf_counter()
+        self.phases = OrderedDict()  # type: Dict[str, float]
+        # (info, start, end, list size or None) per resolver call.
+        self.resolvers = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = (self.phases.get(name, 0.0)
+                                 + perf_counter() - start)
+
+    def resolve(self, next, root, info, **args):
+        start = perf_counter()
+        try:
+            result = next(root, info, **args)
+        except Exception:
+            self._done(info, start, None)
+            raise
+        if is_thenable(result):
+            Promise.resolve(result).then(
+                lambda value: self._done(info, start, value),
+                lambda error: self._done(info, start, None))
+        else:
+            self._done(info, start, result)
+        return result
+
+    def _done(self, info, start: float, value):
+        self.resolvers.append((
+            info, start, perf_counter(),
+            len(value) if type(value) is list else None))
+
+    def finish(self, result):
+        """
+        Reports the request that produced result, an ExecutionResult.
+        """
+        if self.metrics is not None:
+            self.metrics.record(self)
+        if self.trace:
+            result.extensions["tracing"] = self.report()
+
+    def report(self) -> dict:
+        """
+        Phase and resolver times in milliseconds, resolvers with their
+        offset from the start of the request, in the order they finished.
+        """
+        return {
+            "durationMs": _ms(perf_counter() - self.start),
+            "phases": {name: _ms(s) for name, s in self.phases.items()},
+            "resolvers": [
+                {"path": info.path, "field": _field(info),
+                 "startMs": _ms(start - self.start),
+                 "durationMs": _ms(end - start), "size": size}
+                for info, start, end, size in self.resolvers],
+        }
+
+
+def _field(info) -> str:
+    return "%s.%s" % (info.parent_type.name, info.field_name)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def timed(timer: Optional[RequestTimer], name: str):
+    """
+    timer.phase(name), or a context doing nothing when there is no timer.
+    """
+    if timer is None:
+        return nullcontext()
+    return timer.phase(name)
@@ -0,0 +1,74 @@
+import functools
+
+from typing import Dict, List, Optional, Tuple
+
+from nltk.corpus import wordnet as wn
+from nltk.corpus.reader.wordnet import ADJ, ADJ_SAT, POS_LIST
+
+# Distinct (word, pos) lookups remembered; a few MB at most.
+MORPHY_CACHE_SIZE = 65536
+
+# The (pos, offset) of a synset, pos being the data file's ("a" for
+# satellites too), as in WordNet's lemma index.
+Position = Tuple[str, int]
+
+
+class Morphology:
+    """
+    Word to synset lookups with the same results and order as
+    wn.synsets(word, pos).
+
+    wn.synsets() runs morphy on every call: it checks the exception lists,
+    applies each suffix rule and looks every candidate up in the lemma
+    index. Here the exception lists are resolved against the lemma index
+    once, into a table from each irregular inflection to the base forms
+    WordNet has, and regular words go through the suffix rules once per
+    distinct (word, pos), with results kept in an LRU cache.
+    """
+
+    def __init__(self, wordnet=wn, cache_size: int = MORPHY_CACHE_SIZE):
+        self._index = wordnet._lemma_pos_offset_map
+        self._substitutions = wordnet.MORPHOLOGICAL_SUBSTITUTIONS
+        self._inflections = {
+            pos: {form: self._in_index([form] + bases, pos)
+                  for form, bases in exceptions.items()}
+            for pos, exceptions in wordnet._exception_map.items()
+        }  # type: Dict[str, Dict[str, List[str]]]
+        self.positions = functools.lru_cache(cache_size)(self._positions)
+
+    def _in_index(self, forms: List[str], pos: str) -> List[str]:
+        result = []
+        for form in forms:
+            if pos in self._index.get(form, ()) and form not in result:
+                result.append(form)
+        return result
+
+    def base_forms(self, form: str, pos: str) -> List[str]:
+        """
+        The forms morphy gives for form, as in wn._morphy(form, pos).
+        """
+        try:
+            return self._inflections[pos][form]
+        except KeyError:
+            pass
+        return self._in_index(
+            [form] + [form[:-len(old)] + new
+                      for old, new in self._substitutions[pos]
+                      if form.endswith(old)], pos)
+
+    def _positions(self, word: str,
+                   pos: Optional[str] = None) -> Tuple[Position, ...]:
+        """
+        The position of each synset wn.synsets(word, pos) returns, in the
+        same order. pos may name several parts of speech, e.g. "nv".
+        """
+        word = word.lower()
+        result = []
+        for p in POS_LIST if pos is None else pos:
+            if p not in self._inflections:
+                raise ValueError("Unknown part of speech %r" % p)
+            data_pos = ADJ if p == ADJ_SAT else p
+            for form in self.base_forms(word, p):
+                result.extend((data_pos, offset)
+                              for offset in self._index[form].get(p, ()))
+        return tuple(result)
@@ -0,0 +1,305 @@
+import heapq
+import math
+
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from information_content import InformationContent
+from similarity import SimilarityEngine
+
+
+NEAREST_METRICS = ("path", "wup", "lch", "res")
+
+# A candidate source: (upper bound on score, synset id) pairs in order of
+# decreasing bound, then increasing id.
+Candidates = Iterator[Tuple[float, int]]
+
+
+class _TopK:
+    """
+    The k best (score, id) pairs seen, higher scores first and ties going
+    to the lower id, as in wn.all_synsets() order.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap = []
+
+    def admits(self, score: float, i: int) -> bool:
+        return len(self._heap) < self.k or (score, -i) > self._heap[0]
+
+    def push(self, score: float, i: int):
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (score, -i))
+        else:
+            heapq.heappushpop(self._heap, (score, -i))
+
+    def result(self) -> List[Tuple[int, float]]:
+        return [(-i, score) for score, i in sorted(self._heap, reverse=True)]
+
+
+def best_first(sources: List[Candidates], score: Callable[[int], float],
+               k: int, exclude: int) -> List[Tuple[int, float]]:
+    """
+    Merges candidate sources by bound and scores candidates exactly until
+    no remaining bound can beat the k-th best score. Every synset must be
+    yielded by some source with a bound at least its score. Id -1 is a
+    placeholder that is never scored.
+    """
+    top = _TopK(k)
+    heap = []
+    for n, source in enumerate(sources):
+        for bound, i in source:
+            heap.append((-bound, i, n, source))
+            break
+    heapq.heapify(heap)
+    seen = {exclude, -1}
+    while heap:
+        bound, i, n, source = heapq.heappop(heap)
+        if not top.admits(-bound, i):
+            break
+        if i not in seen:
+            seen.add(i)
+            value = score(i)
+            if value is not None and top.admits(value, i):
+                top.push(value, i)
+        for bound, i in source:
+            heapq.heappush(heap, (-bound, i, n, source))
+            break
+    return top.result()
+
+
+class NearestSynsets:
+    """
+    Top-k most similar synsets to a synset, without scoring every synset.
+
+    Candidates are generated near the synset first, from the hypernym DAG,
+    each with an upper bound on its score taken from depths or IC, and the
+    search stops as soon as no unscored candidate can make the top k.
+    """
+
+    def __init__(self, engine: SimilarityEngine):
+        self.engine = engine
+        self.taxonomy = engine.taxonomy
+        self.graph = engine.taxonomy.graph
+
+    def candidates(self, a: int, metric: str,
+                   pos: Optional[str]) -> np.ndarray:
+        """
+        A mask of the synsets a can be compared to.
+        """
+        if metric in ("lch", "res"):
+            mask = self.engine.pos == self.engine.pos[a]
+        else:
+            mask = np.ones(len(self.graph), dtype=bool)
+        if pos is not None:
+            selected = np.zeros(len(self.graph), dtype=bool)
+            selected[self.graph.positions.select(pos)] = True
+            mask &= selected
+        return mask
+
+    def _root_mask(self, a: int, simulate_root: bool) -> np.ndarray:
+        # Synsets that a is compared to through the simulated root.
+        engine = self.engine
+        needs = np.zeros(len(self.graph), dtype=bool)
+        if not simulate_root:
+            return needs
+        if engine.needs_root[engine.pos[a]]:
+            needs[:] = True
+        elif engine.pairwise_root:
+            for pos, need in engine.needs_root.items():
+                if need:
+                    needs |= engine.pos == pos
+        return needs
+
+    def _by_depth(self, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Masked ids ordered by min depth, then id.
+        ids = np.flatnonzero(mask)
+        depths = self.taxonomy.min_depth[ids]
+        order = np.lexsort((ids, depths))
+        return ids[order].tolist(), depths[order].tolist()
+
+    def _descendants(self, s: int) -> np.ndarray:
+        seen = {s}
+        level = [s]
+        while level:
+            following = []
+            for i in level:
+                for j in self.taxonomy.children.neighbors(i):
+                    if j not in seen:
+                        seen.add(j)
+                        following.append(j)
+            level = following
+        return np.fromiter(seen, dtype=np.int32, count=len(seen))
+
+    def _group(self, s: int, mask: np.ndarray, bound: float,
+               bounds: Callable[[np.ndarray], np.ndarray] = None
+               ) -> Candidates:
+        # The descendants of s, with bounds that hold for every synset
+        # whose subsumer is s; at most bound. The placeholder first item
+        # defers listing them until the search gets this far.
+        yield bound, -1
+        ids = self._descendants(s)
+        ids = ids[mask[ids]]
+        if bounds is None:
+            for i in np.sort(ids).tolist():
+                yield bound, i
+            return
+        values = bounds(ids)
+        order = np.lexsort((ids, -values))
+        for value, i in zip(values[order].tolist(), ids[order].tolist()):
+            yield value, i
+
+    def _valley(self, a: int, mask: np.ndarray,
+                to_score: Callable[[int], float]) -> Candidates:
+        # Synsets in order of their distance from a through a common
+        # hypernym: a breadth-first search down from each hypernym of a,
+        # started at that hypernym's distance from a.
+        ids, distances = self.taxonomy.ancestors(a)
+        levels = {}
+        for i, d in zip(ids.tolist(), distances.tolist()):
+            levels.setdefault(d, []).append(i)
+        settled = set()
+        distance = 0
+        while levels:
+            level = [i for i in levels.pop(distance, []) if i not in settled]
+            settled.update(level)
+            following = levels.setdefault(distance + 1, [])
+            for i in level:
+                following.extend(self.taxonomy.children.neighbors(i))
+            if not following:
+                del levels[distance + 1]
+            bound = to_score(distance)
+            for i in sorted(level):
+                if mask[i]:
+                    yield bound, i
+            distance += 1
+
+    def _ordered(self, mask: np.ndarray, bound: float) -> Candidates:
+        for i in np.flatnonzero(mask).tolist():
+            yield bound, i
+
+    def _rooted(self, mask: np.ndarray, offset: int,
+                to_score: Callable[[int], float]) -> Candidates:
+        # Synsets compared through the simulated root, at least offset +
+        # their min depth away.
+        ids, depths = self._by_depth(mask)
+        for i, depth in zip(ids, depths):
+            yield to_score(offset + depth), i
+
+    def _distance_sources(self, a, mask, simulate_root, to_score):
+        root_distance = self.engine._root_distance(a)
+        return [
+            self._valley(a, mask, to_score),
+            self._rooted(mask & self._root_mask(a, simulate_root),
+                         root_distance + 1, to_score)]
+
+    def nearest(self, a: int, metric: str = "path", k: int = 10,
+                pos: Optional[str] = None, simulate_root: bool = True,
+                ic: Optional[InformationContent] = None
+                ) -> List[Tuple[int, float]]:
+        """
+        (synset id, similarity) of the k synsets most similar to a, best
+        first, ties broken by wn.all_synsets() order. a itself and synsets
+        the metric is undefined for are left out.
+        """
+        if metric not in NEAREST_METRICS:
+            raise ValueError("unknown similarity metric %r" % metric)
+        if k <= 0:
+            return []
+        engine = self.engine
+        mask = self.candidates(a, metric, pos)
+
+        if metric == "path":
+            def to_score(d):
+                return 1.0 / (d + 1)
+
+            def score(b):
+                d = engine.shortest_path_distance(
+                    a, b, engine._simulate_root(a, b, simulate_root))
+                return None if d is None else 1.0 / (d + 1)
+
+            sources = self._distance_sources(
+                a, mask, simulate_root, to_score)
+
+        elif metric == "lch":
+            flag = simulate_root and engine.needs_root[engine.pos[a]]
+            depth = engine._lch_depth(
+                engine.pos[a], engine.needs_root[engine.pos[a]])
+            if depth == 0:
+                return []
+
+            def to_score(d):
+                return -math.log((d + 1) / (2.0 * depth))
+
+            def score(b):
+                return engine._lch(
+                    a, b, engine.shortest_path_distance(a, b, flag))
+
+            sources = self._distance_sources(a, mask, flag, to_score)
+
+        elif metric == "wup":
+            def score(b):
+                return engine._wup(a, b, simulate_root)
+
+            def subsumed(s, depth, distance):
+                # Where s is the subsumer of b, every common hypernym is
+                # at most as deep as s, so b is at least
+                # min_depth(b) - min_depth(s) from s.
+                def bounds(ids):
+                    below = np.maximum(
+                        self.taxonomy.min_depth[ids]
+                        - self.taxonomy.min_depth[s], ids != s)
+                    return 2.0 * depth / (2 * depth + distance + below)
+                return self._group(
+                    s, mask, 2.0 * depth / (2 * depth + distance), bounds)
+
+            sources = []
+            for s in self.taxonomy.ancestors(a)[0].tolist():
+                sources.append(subsumed(
+                    s, int(self.taxonomy.max_depth[s]) + 1,
+                    engine.shortest_path_distance(a, s, simulate_root)))
+            root_distance = engine._root_distance(a)
+            sources.append(self._rooted(
+                mask & self._root_mask(a, simulate_root), root_distance + 3,
+                lambda d: 2.0 / d))
+
+        else:
+            if ic is None:
+                raise ValueError("res similarity needs an IC table")
+            synset = self.graph.synset(a)
+            ic._pos(synset)
+
+            def score(b):
+                return ic.res_similarity(synset, self.graph.synset(b))
+
+            sources = [
+                self._group(s, mask, ic.information_content(
+                    self.graph.synset(s)))
+                for s in self.taxonomy.ancestors(a)[0].tolist()]
+            # Synsets with no common hypernym score 0.
+            sources.append(self._ordered(mask, 0.0))
+
+        return best_first(sources, score, k, a)
+
+    def brute_force(self, a: int, metric: str = "path", k: int = 10,
+                    pos: Optional[str] = None, simulate_root: bool = True,
+                    ic: Optional[InformationContent] = None
+                    ) -> List[Tuple[int, float]]:
+        """
+        nearest() by scoring every candidate, for testing and benchmarks.
+        """
+        ids = [i for i in np.flatnonzero(self.candidates(a, metric, pos))
+               .tolist() if i != a]
+        if metric == "res":
+            synset = self.graph.synset(a)
+            scores = [ic.res_similarity(synset, self.graph.synset(b))
+                      for b in ids]
+        else:
+            scores = self.engine.matrix([a], ids, metric, simulate_root)[0]
+        top = _TopK(k)
+        for i, value in zip(ids, scores):
+            if value is not None and top.admits(value, i):
+                top.push(value, i)
+        return top.result()
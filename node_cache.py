@@ -0,0 +1,58 @@
+import threading
+
+from collections import OrderedDict
+from typing import Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class NodeCache:
+    """
+    Bounded LRU identity map from a synset or lemma to its GraphQL node, so
+    that every field and request reaching the same synset shares one node,
+    along with the scalar fields already resolved on it.
+
+    Nodes only hold read-only data, so they are safe to share between
+    requests and threads. The cache must be cleared when the objects keys
+    refer to change, e.g. when another graph is enabled.
+    """
+
+    def __init__(self, maxsize: int = 65536):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._nodes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, make: Callable[[], T]) -> T:
+        """
+        The node cached for key, or a new one from make().
+        """
+        with self._lock:
+            node = self._nodes.get(key)
+            if node is not None:
+                self._nodes.move_to_end(key)
+                self.hits += 1
+                return node
+            self.misses += 1
+        node = make()
+        with self._lock:
+            node = self._nodes.setdefault(key, node)
+            while len(self._nodes) > self.maxsize:
+                self._nodes.popitem(last=False)
+        return node
+
+    def clear(self):
+        with self._lock:
+            self._nodes.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._nodes),
+                "maxsize": self.maxsize,
+            }
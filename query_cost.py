@@ -0,0 +1,375 @@
+import threading
+import time
+
+from graphene.utils.str_converters import to_snake_case
+from graphql import GraphQLError
+from graphql.language import ast
+from graphql.type.definition import GraphQLList, GraphQLNonNull
+from graphql.utils.type_from_ast import type_from_ast
+from graphql.utils.value_from_ast import value_from_ast
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from result_cache import select_operation
+from wordnet_graph import WordNetGraph
+
+
+# Longest hypernym chain in WordNet 3.0 is 19 edges; bounds unlimited
+# closures of relations whose fan-out would otherwise grow without limit.
+MAX_CLOSURE_DEPTH = 20
+
+# Fan-out assumed for list fields with no better statistic.
+DEFAULT_FANOUT = 10.0
+
+
+class FanoutWeights:
+    """
+    Expected fan-out of each list field. Relation weights are
+    (mean degree over nodes that have the relation, number of distinct
+    targets) so that a closure estimate can be capped at the number of
+    nodes it could possibly reach.
+    """
+
+    def __init__(self,
+                 synset_relations: Dict[str, Tuple[float, int]],
+                 lemma_relations: Dict[str, Tuple[float, int]],
+                 lemmas_per_synset: float,
+                 synset_counts: Dict[Optional[str], int]):
+        self.synset_relations = synset_relations
+        self.lemma_relations = lemma_relations
+        self.lemmas_per_synset = lemmas_per_synset
+        self.synset_counts = synset_counts
+
+    @classmethod
+    def from_graph(cls, graph: WordNetGraph) -> "FanoutWeights":
+        def relation_stats(adjacency):
+            degrees = adjacency.degrees()
+            degrees = degrees[degrees > 0]
+            mean = float(degrees.mean()) if len(degrees) else 0.0
+            return (mean, len(np.unique(adjacency.indices)))
+
+        return cls(
+            synset_relations={
+                rel: relation_stats(a)
+                for rel, a in graph.synset_relations.items()},
+            lemma_relations={
+                rel: relation_stats(a)
+                for rel, a in graph.lemma_relations.items()},
+            lemmas_per_synset=float(graph.synset_lemmas.degrees().mean()),
+            synset_counts={
+                pos: len(graph.positions.select(pos))
+                for pos in (None, "a", "s", "r", "n", "v")})
+
+    def relation(self, type_name: str, relation: str) -> Tuple[float, int]:
+        if type_name == "LemmaNode":
+            return self.lemma_relations.get(relation, (DEFAULT_FANOUT, 0))
+        return self.synset_relations.get(relation, (DEFAULT_FANOUT, 0))
+
+    def closure(self, relation: str, depth: int) -> float:
+        mean, reachable = self.synset_relations.get(
+            relation, (DEFAULT_FANOUT, 0))
+        if depth is None or depth < 0:
+            depth = MAX_CLOSURE_DEPTH
+        size, level = 0.0, 1.0
+        for _ in range(min(depth, MAX_CLOSURE_DEPTH)):
+            level *= mean
+            size += level
+            if size >= reachable:
+                return float(reachable)
+        return size
+
+
+# Measured on WordNet 3.0 with FanoutWeights.from_graph.
+WORDNET_WEIGHTS = FanoutWeights(
+    synset_relations={
+        "hypernyms": (1.02, 20008),
+        "instance_hypernyms": (1.11, 945),
+        "hyponyms": (4.45, 87597),
+        "instance_hyponyms": (9.08, 7730),
+        "member_holonyms": (1.01, 5553),
+        "substance_holonyms": (1.45, 666),
+        "part_holonyms": (1.16, 3699),
+        "member_meronyms": (2.21, 12201),
+        "substance_meronyms": (1.20, 551),
+        "part_meronyms": (2.46, 7859),
+        "topic_domains": (1.03, 438),
+        "in_topic_domains": (15.17, 6428),
+        "region_domains": (1.05, 166),
+        "in_region_domains": (8.10, 1282),
+        "usage_domains": (1.04, 29),
+        "in_usage_domains": (33.34, 933),
+        "attributes": (1.36, 940),
+        "entailments": (1.05, 288),
+        "causes": (1.01, 199),
+        "also_sees": (2.02, 1333),
+        "verb_groups": (1.17, 1498),
+        "similar_tos": (1.62, 13205),
+    },
+    lemma_relations={
+        "hypernyms": (0.00, 0),
+        "instance_hypernyms": (0.00, 0),
+        "hyponyms": (0.00, 0),
+        "instance_hyponyms": (0.00, 0),
+        "member_holonyms": (0.00, 0),
+        "substance_holonyms": (0.00, 0),
+        "part_holonyms": (0.00, 0),
+        "member_meronyms": (0.00, 0),
+        "substance_meronyms": (0.00, 0),
+        "part_meronyms": (0.00, 0),
+        "topic_domains": (1.10, 8),
+        "in_topic_domains": (1.38, 10),
+        "region_domains": (1.00, 4),
+        "in_region_domains": (3.75, 15),
+        "usage_domains": (1.03, 9),
+        "in_usage_domains": (45.44, 398),
+        "attributes": (0.00, 0),
+        "entailments": (0.00, 0),
+        "causes": (0.00, 0),
+        "also_sees": (1.79, 576),
+        "verb_groups": (1.00, 2),
+        "similar_tos": (0.00, 0),
+        "antonyms": (1.03, 7768),
+        "derivationally_related_forms": (1.48, 50376),
+        "pertainyms": (1.02, 6636),
+    },
+    lemmas_per_synset=1.76,
+    synset_counts={
+        None: 117659, "a": 18156, "s": 10693,
+        "r": 3621, "n": 82115, "v": 13767,
+    })
+
+
+class QueryCostError(GraphQLError):
+    pass
+
+
+class CostEstimate:
+
+    def __init__(self, cost: float, depth: int):
+        self.cost = cost
+        self.depth = depth
+
+
+class CostLimits:
+    """
+    Budgets checked against a query's estimate before it is executed.
+    None disables a limit.
+    """
+
+    def __init__(self, max_depth: Optional[int] = None,
+                 max_cost: Optional[float] = None):
+        self.max_depth = max_depth
+        self.max_cost = max_cost
+
+    def check(self, estimate: CostEstimate):
+        if self.max_depth is not None and estimate.depth > self.max_depth:
+            raise QueryCostError(
+                "Query depth %d exceeds the limit of %d"
+                % (estimate.depth, self.max_depth))
+        if self.max_cost is not None and estimate.cost > self.max_cost:
+            raise QueryCostError(
+                "Estimated query cost %d exceeds the limit of %d"
+                % (estimate.cost, self.max_cost))
+
+
+class CostThrottle:
+    """
+    Token bucket over estimated cost: a client may spend up to capacity at
+    once, refilled at rate per second. Share one instance per client.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def admit(self, cost: float) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if cost > self._tokens:
+                return False
+            self._tokens -= cost
+            return True
+
+
+class CostCounter:
+    """
+    Middleware counting resolved fields, the unit the estimate is in.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def resolve(self, next, root, info, **args):
+        self.count += 1
+        return next(root, info, **args)
+
+
+def _named_type(graphql_type):
+    is_list = False
+    while isinstance(graphql_type, (GraphQLList, GraphQLNonNull)):
+        if isinstance(graphql_type, GraphQLList):
+            is_list = True
+        graphql_type = graphql_type.of_type
+    return graphql_type, is_list
+
+
+def _variable_values(schema, operation: ast.OperationDefinition,
+                     variables: dict) -> dict:
+    # Omitted or null variables take their declared defaults, as they do
+    # when the operation runs.
+    values = dict(variables)
+    for definition in operation.variable_definitions or []:
+        name = definition.variable.name.value
+        if values.get(name) is None and definition.default_value is not None:
+            values[name] = value_from_ast(
+                definition.default_value,
+                type_from_ast(schema, definition.type))
+    return values
+
+
+def _argument(args: dict, name: str, default):
+    # A variable without a value leaves the field's default in place.
+    value = args.get(name)
+    return default if value is None else value
+
+
+def _argument_values(field: ast.Field, variables: dict) -> dict:
+    values = {}
+    for argument in field.arguments or []:
+        value = argument.value
+        if isinstance(value, ast.Variable):
+            values[argument.name.value] = variables.get(value.name.value)
+        elif isinstance(value, ast.IntValue):
+            values[argument.name.value] = int(value.value)
+        elif isinstance(value, (ast.StringValue, ast.BooleanValue,
+                                ast.EnumValue)):
+            values[argument.name.value] = value.value
+        elif isinstance(value, ast.ListValue):
+            values[argument.name.value] = [
+                getattr(v, "value", None) for v in value.values]
+    return values
+
+
+class CostEstimator:
+    """
+    Estimates the number of fields a query will resolve from its document
+    alone: each field costs one per expected instance of its parent, and
+    list fields multiply the cost of their selections by their fan-out.
+    """
+
+    def __init__(self, schema, weights: FanoutWeights = WORDNET_WEIGHTS,
+                 default_page_size: int = 100):
+        self.schema = schema
+        self.weights = weights
+        self.default_page_size = default_page_size
+
+    def estimate(self, document: ast.Document, operation_name=None,
+                 variables=None) -> CostEstimate:
+        self._fragments = {
+            d.name.value: d for d in document.definitions
+            if isinstance(d, ast.FragmentDefinition)}
+        operation = select_operation(document, operation_name)
+        if operation is None:
+            # Left to execution to report.
+            return CostEstimate(0.0, 0)
+        self._variables = _variable_values(
+            self.schema, operation, variables or {})
+        cost, depth = self._selection_cost(
+            operation.selection_set,
+            self.schema.get_query_type(),
+            1.0, 0, {})
+        return CostEstimate(cost, depth)
+
+    def _closure_fanout(self, args) -> float:
+        # A closure along several relations is bounded by the sum of the
+        # closures along each.
+        relations = [args.get("relationshipName")] \
+            + list(args.get("relationshipNames") or ())
+        relations = [to_snake_case(r) for r in relations if r] or [""]
+        return sum(self.weights.closure(r, _argument(args, "depth", -1))
+                   for r in relations)
+
+    def _fanout(self, parent_type, field_name, args, parent_args) -> float:
+        type_name = parent_type.name
+        if type_name == "Query":
+            if field_name == "all_synsets":
+                return float(self.weights.synset_counts.get(
+                    args.get("pos"), 0))
+            if field_name == "nearest_synsets":
+                return float(_argument(args, "k", 10))
+            if field_name in ("search_lemmas", "fuzzy_lemmas"):
+                return float(_argument(args, "limit", 10))
+            if field_name == "synsets":
+                return DEFAULT_FANOUT
+            if field_name == "closure":
+                return (len(args.get("names") or ()) or 1) \
+                    * self._closure_fanout(args)
+            if field_name == "synsets_for_words":
+                return len(args.get("words") or ()) * DEFAULT_FANOUT
+            return 1.0
+        if type_name == "SynsetConnection" and field_name == "edges":
+            return float(parent_args.get("first")
+                         or parent_args.get("last")
+                         or self.default_page_size)
+        if field_name in ("closure", "closure_distances"):
+            return self._closure_fanout(args)
+        if field_name == "lemmas":
+            return self.weights.lemmas_per_synset
+        if field_name in ("root_hypernyms", "lowest_common_hypernyms"):
+            return 1.0
+        if field_name in ("common_hypernyms", "hypernym_paths",
+                          "hypernym_distances"):
+            return float(MAX_CLOSURE_DEPTH)
+        if type_name == "HypernymPathIndex":
+            return float(MAX_CLOSURE_DEPTH)
+        return self.weights.relation(type_name, field_name)[0]
+
+    def _selection_cost(self, selection_set, parent_type, multiplier,
+                        depth, parent_args):
+        cost, max_depth = 0.0, depth
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.FragmentSpread):
+                fragment = self._fragments.get(selection.name.value)
+                if fragment is None:
+                    continue
+                c, d = self._selection_cost(
+                    fragment.selection_set,
+                    self.schema.get_type(fragment.type_condition.name.value),
+                    multiplier, depth, parent_args)
+            elif isinstance(selection, ast.InlineFragment):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(
+                        selection.type_condition.name.value)
+                c, d = self._selection_cost(
+                    selection.selection_set, fragment_type,
+                    multiplier, depth, parent_args)
+            else:
+                name = selection.name.value
+                fields = getattr(parent_type, "fields", {})
+                if name.startswith("__") or name not in fields:
+                    continue
+                c, d = multiplier, depth
+                if selection.selection_set is not None:
+                    field_type, is_list = _named_type(fields[name].type)
+                    args = _argument_values(selection, self._variables)
+                    fanout = 1.0
+                    if is_list:
+                        fanout = self._fanout(
+                            parent_type, to_snake_case(name),
+                            args, parent_args)
+                    child_cost, d = self._selection_cost(
+                        selection.selection_set, field_type,
+                        multiplier * fanout, depth + 1, args)
+                    c += child_cost
+            cost += c
+            max_depth = max(max_depth, d)
+        return cost, max_depth
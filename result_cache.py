@@ -0,0 +1,209 @@
+import json
+import threading
+
+from collections import OrderedDict
+from graphql.language import ast
+from graphql.language.printer import print_ast
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+class ResultCache:
+    """
+    Byte-budgeted LRU cache of operation results. WordNet is read-only, so
+    the result of an operation only depends on its document and variables.
+
+    Entries are sized by their JSON encoding and the least recently used
+    ones are evicted once the total exceeds max_bytes. Cached values are
+    shared between responses and must not be mutated.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any):
+        size = len(key) + len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _memoized(self, document_ast: ast.Document, name, compute):
+        # Documents come from the DocumentCache, so values derived from a
+        # document only need computing once per document.
+        key = (id(document_ast), name)
+        with self._lock:
+            entry = self._documents.get(key)
+            if entry is not None and entry[0] is document_ast:
+                return entry[1]
+        value = compute()
+        with self._lock:
+            self._documents[key] = (document_ast, value)
+            while len(self._documents) > 1024:
+                self._documents.popitem(last=False)
+        return value
+
+    def operation_key(self, document_ast: ast.Document,
+                      operation_name: Optional[str],
+                      variables: Optional[dict]) -> str:
+        normalized = self._memoized(
+            document_ast, None, lambda: print_ast(document_ast))
+        return json.dumps(
+            [normalized, operation_name, variables or {}], sort_keys=True)
+
+    def root_field_keys(self, document_ast: ast.Document,
+                        operation_name: Optional[str],
+                        variables: Optional[dict]
+                        ) -> Optional[List[Tuple[str, ast.Field, str]]]:
+        """
+        (response key, field, cache key) for each root field of the
+        operation, so that e.g. synset(name: "dog.n.01") { hypernyms { name } }
+        can be reused by any operation that selects it. Returns None when
+        the root selections are not all plain fields, or when two of them
+        share a response key and would be merged.
+        """
+        templates = self._memoized(
+            document_ast, ("root", operation_name),
+            lambda: _root_field_templates(document_ast, operation_name))
+        if templates is None:
+            return None
+        variables = variables or {}
+        # Omitted variables take their defaults, which are part of text.
+        return [
+            (response_key, selection, json.dumps(
+                [text, {n: variables[n] for n in names if n in variables}],
+                sort_keys=True))
+            for response_key, selection, text, names in templates]
+
+
+def _variable_names(node, names: Set[str]) -> Set[str]:
+    if isinstance(node, ast.Variable):
+        names.add(node.name.value)
+    elif isinstance(node, list):
+        for child in node:
+            _variable_names(child, names)
+    elif isinstance(node, ast.Node):
+        for field in node._fields:
+            _variable_names(getattr(node, field), names)
+    return names
+
+
+def _fragment_names(node, fragments: Dict[str, ast.FragmentDefinition],
+                    names: Set[str]) -> Set[str]:
+    if isinstance(node, ast.FragmentSpread):
+        name = node.name.value
+        if name not in names and name in fragments:
+            names.add(name)
+            _fragment_names(fragments[name], fragments, names)
+    elif isinstance(node, list):
+        for child in node:
+            _fragment_names(child, fragments, names)
+    elif isinstance(node, ast.Node):
+        for field in node._fields:
+            _fragment_names(getattr(node, field), fragments, names)
+    return names
+
+
+def select_operation(document_ast: ast.Document,
+                     operation_name: Optional[str]):
+    for definition in document_ast.definitions:
+        if isinstance(definition, ast.OperationDefinition) and (
+                operation_name is None
+                or definition.name is not None
+                and definition.name.value == operation_name):
+            return definition
+    return None
+
+
+def _root_field_templates(document_ast: ast.Document,
+                          operation_name: Optional[str]):
+    operation = select_operation(document_ast, operation_name)
+    if operation is None or operation.operation != "query":
+        return None
+    fragments = {
+        d.name.value: d for d in document_ast.definitions
+        if isinstance(d, ast.FragmentDefinition)}
+    definitions = {
+        d.variable.name.value: d
+        for d in operation.variable_definitions or []}
+    templates = []
+    response_keys = set()
+    for selection in operation.selection_set.selections:
+        if not isinstance(selection, ast.Field) or selection.directives:
+            return None
+        # The subtree's key must not depend on its alias.
+        text = print_ast(ast.Field(
+            name=selection.name,
+            arguments=selection.arguments,
+            selection_set=selection.selection_set))
+        used = sorted(_fragment_names(selection, fragments, set()))
+        text = "\n".join([text] + [print_ast(fragments[n]) for n in used])
+        scope = [selection] + [fragments[n] for n in used]
+        names = sorted(_variable_names(scope, set()))
+        text = "\n".join([text] + [
+            print_ast(definitions[n]) for n in names if n in definitions])
+        response_key = (selection.alias or selection.name).value
+        if response_key in response_keys:
+            return None
+        response_keys.add(response_key)
+        templates.append((response_key, selection, text, names))
+    return templates
+
+
+def partial_document(document_ast: ast.Document,
+                     operation_name: Optional[str],
+                     selections: List[ast.Field]) -> ast.Document:
+    """
+    A copy of the document whose operation only selects selections.
+    """
+    operation = select_operation(document_ast, operation_name)
+    definitions = [
+        d for d in document_ast.definitions
+        if isinstance(d, ast.FragmentDefinition)]
+    definitions.insert(0, ast.OperationDefinition(
+        operation=operation.operation,
+        name=operation.name,
+        variable_definitions=operation.variable_definitions,
+        directives=operation.directives,
+        selection_set=ast.SelectionSet(selections=selections)))
+    return ast.Document(definitions=definitions)
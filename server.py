@@ -0,0 +1,576 @@
+"""
+HTTP server for the schema, on asyncio with no dependencies beyond the
+standard library, and an ASGI application for running it under any ASGI
+server instead.
+
+    python server.py [--port 8000] [--workers 4] [--snapshot PATH] [--metrics]
+        [--export] [--persisted-queries DIR]
+    uvicorn server:app
+"""
+import argparse
+import asyncio
+import email.utils
+import gzip
+import hashlib
+import json
+import logging
+import os
+import signal
+import socket
+import time
+import zlib
+
+import nltk
+
+from graphql import GraphQLError
+from graphql.execution import ExecutionResult
+from http import HTTPStatus
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+import batch
+import export
+import snapshot
+import wordnet_graphql
+
+from metrics import Metrics
+
+
+MAX_BODY_SIZE = 1 << 20
+MAX_HEADER_SIZE = 1 << 16
+MAX_BATCH_SIZE = 100
+
+# Responses smaller than this are sent uncompressed.
+MIN_COMPRESS_SIZE = 1024
+
+# Seconds an idle keep-alive connection is held open.
+KEEP_ALIVE_TIMEOUT = 15.0
+
+# GET responses only change with the corpus or the schema, which are both
+# fixed for the life of a server, and are identified by an ETag.
+GET_MAX_AGE = 86400
+
+Headers = List[Tuple[str, str]]
+
+logger = logging.getLogger(__name__)
+
+
+def corpus_version() -> str:
+    """
+    A digest of the WordNet data files, the NLTK version and the schema.
+    """
+    fingerprint = snapshot.fingerprint(nltk.data.find("corpora/wordnet"))
+    digest = hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode())
+    digest.update(str(wordnet_graphql.schema).encode())
+    return digest.hexdigest()[:16]
+
+
+class Response:
+    """
+    A response with its whole body, or with an iterator of chunks of it
+    that is streamed with chunked transfer encoding.
+    """
+
+    def __init__(self, status: int,
+                 body: Union[bytes, Iterator[bytes]] = b"",
+                 headers: Optional[Headers] = None):
+        self.status = status
+        self.body = body
+        self.headers = headers or []
+
+    @property
+    def streamed(self) -> bool:
+        return not isinstance(self.body, bytes)
+
+    @classmethod
+    def json(cls, status: int, value, headers: Optional[Headers] = None):
+        body = json.dumps(value, separators=(",", ":")).encode()
+        return cls(status, body,
+                   [("Content-Type", "application/json")] + (headers or []))
+
+    @classmethod
+    def error(cls, status: int, message: str):
+        return cls.json(status, {"errors": [{"message": message}]})
+
+    def encode(self, keep_alive: bool, chunked: bool = True) -> bytes:
+        """
+        The status line and headers, followed by the body unless it is
+        streamed. A streamed body is sent chunked or, when the client
+        cannot take that, until the connection closes.
+        """
+        status = HTTPStatus(self.status)
+        lines = ["HTTP/1.1 %d %s" % (status, status.phrase),
+                 "Date: " + email.utils.formatdate(usegmt=True)]
+        if not self.streamed:
+            lines.append("Content-Length: %d" % len(self.body))
+        elif chunked:
+            lines.append("Transfer-Encoding: chunked")
+        lines.append(
+            "Connection: " + ("keep-alive" if keep_alive else "close"))
+        lines += ["%s: %s" % header for header in self.headers]
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return head if self.streamed else head + self.body
+
+
+def _invalid(message: str) -> ExecutionResult:
+    return ExecutionResult(errors=[GraphQLError(message)], invalid=True)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison, as If-None-Match calls for.
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            encodings[name.lower()] = quality
+    return encodings
+
+
+def _compress_chunks(chunks: Iterator[bytes],
+                     encoding: str) -> Iterator[bytes]:
+    compressor = zlib.compressobj(
+        6, zlib.DEFLATED, 31 if encoding == "gzip" else zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def compress(response: Response, accept_encoding: str) -> Response:
+    """
+    Compresses the body with gzip or deflate if the client accepts either.
+    Streamed bodies are compressed chunk by chunk as they are sent.
+    """
+    if not response.streamed and len(response.body) < MIN_COMPRESS_SIZE:
+        return response
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("gzip", "deflate"):
+        if accepted.get(encoding, wildcard) > 0:
+            if response.streamed:
+                body = _compress_chunks(response.body, encoding)
+            elif encoding == "gzip":
+                body = gzip.compress(response.body, compresslevel=6)
+            else:
+                body = zlib.compress(response.body, 6)
+            response.body = body
+            response.headers.append(("Content-Encoding", encoding))
+            break
+    response.headers.append(("Vary", "Accept-Encoding"))
+    return response
+
+
+class GraphQLServer:
+    """
+    Serves GraphQL over HTTP at path: POST with a JSON operation or an
+    array of them, which are run concurrently and answered in order, or
+    GET with query or queryHash, variables and operationName parameters.
+    GET responses carry an ETag and can be revalidated with If-None-Match.
+
+    options are passed to wordnet_graphql.execute_async() for every
+    operation, e.g. cost_limits or result_cache. Operations are executed
+    straight to JSON, with raw_json.
+
+    With metrics, every operation is timed into it, as are the NLTK reader
+    and JSON serialization, and GET metrics_path answers with metrics in
+    Prometheus' text format. An operation with {"trace": true} in its
+    "extensions" gets its own timings in the response's extensions.
+
+    With export_path, GET export_path streams export.export() of the
+    lexicon as NDJSON, optionally limited to records=synsets,lemmas,edges.
+    The lexicon is built on the first export unless it came with a
+    snapshot.
+    """
+
+    def __init__(self, path: str = "/graphql",
+                 timeout: Optional[float] = None,
+                 max_batch_size: int = MAX_BATCH_SIZE,
+                 metrics: Optional[Metrics] = None,
+                 metrics_path: str = "/metrics",
+                 export_path: Optional[str] = None, **options):
+        self.path = path
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size
+        self.metrics = metrics
+        self.metrics_path = metrics_path
+        self.export_path = export_path
+        self.options = options
+        self._version = None
+        if metrics is not None:
+            wordnet_graphql.time_reader(metrics)
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            self._version = corpus_version()
+        return self._version
+
+    async def _run(self, operation) -> Tuple[int, ExecutionResult]:
+        """
+        The status and result of one operation. Errors running it are
+        its result, so that the other operations of a batch still run.
+        """
+        if not isinstance(operation, dict) or not isinstance(
+                operation.get("query") or "", str):
+            return 400, _invalid("Invalid operation")
+        if not isinstance(operation.get("variables") or {}, dict):
+            return 400, _invalid("variables must be an object")
+        extensions = operation.get("extensions")
+        trace = isinstance(extensions, dict) and \
+            extensions.get("trace") is True
+        try:
+            result = await wordnet_graphql.execute_async(
+                operation.get("query"),
+                variables=operation.get("variables"),
+                operation_name=operation.get("operationName"),
+                query_hash=operation.get("queryHash"),
+                timeout=self.timeout,
+                metrics=self.metrics,
+                trace=trace,
+                raw_json=True,
+                **self.options)
+        except Exception:
+            logger.exception("Error executing operation")
+            return 500, _invalid("Internal server error")
+        return 400 if result.invalid else 200, result
+
+    def _json(self, status: int, results,
+              headers: Optional[Headers] = None) -> Response:
+        # results is one ExecutionResult or a list of them, for a batch.
+        start = time.perf_counter()
+        if isinstance(results, list):
+            body = b"[%s]" % b",".join(
+                map(wordnet_graphql.result_json, results))
+        else:
+            body = wordnet_graphql.result_json(results)
+        if self.metrics is not None:
+            self.metrics.observe(
+                "phase", "serialize", time.perf_counter() - start)
+        return Response(status, body, [
+            ("Content-Type", "application/json")] + (headers or []))
+
+    def _etag(self, operation: dict) -> str:
+        key = json.dumps(operation, sort_keys=True).encode()
+        return '"%s-%s"' % (self.version, hashlib.sha1(key).hexdigest()[:16])
+
+    async def _get(self, query_string: str,
+                   headers: Dict[str, str]) -> Response:
+        params = {k: v[-1] for k, v in parse_qs(query_string).items()}
+        operation = {"query": params.get("query"),
+                     "operationName": params.get("operationName"),
+                     "queryHash": params.get("queryHash")}
+        try:
+            operation["variables"] = json.loads(
+                params.get("variables") or "null")
+        except ValueError:
+            return Response.error(400, "variables must be JSON")
+        etag = self._etag(operation)
+        if _etag_matches(headers.get("if-none-match", ""), etag):
+            return Response(304, headers=[("ETag", etag)])
+        status, result = await self._run(operation)
+        cache_headers = []
+        if not result.errors:
+            cache_headers = [
+                ("ETag", etag),
+                ("Cache-Control", "public, max-age=%d" % GET_MAX_AGE)]
+        return self._json(status, result, cache_headers)
+
+    async def _post(self, body: bytes) -> Response:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return Response.error(400, "Request body must be JSON")
+        if isinstance(payload, list):
+            if len(payload) > self.max_batch_size:
+                return Response.error(
+                    413, "At most %d operations per batch"
+                    % self.max_batch_size)
+            results = await asyncio.gather(
+                *[self._run(operation) for operation in payload])
+            return self._json(200, [result for _, result in results])
+        return self._json(*await self._run(payload))
+
+    def _export(self, query_string: str) -> Response:
+        params = {k: v[-1] for k, v in parse_qs(query_string).items()}
+        records = params.get("records")
+        try:
+            chunks = export.export(
+                wordnet_graphql.enable_lexicon(),
+                records.split(",") if records else export.RECORDS)
+        except ValueError as e:
+            return Response.error(400, str(e))
+        return Response(200, chunks,
+                        [("Content-Type", "application/x-ndjson")])
+
+    async def handle(self, method: str, target: str,
+                     headers: Dict[str, str], body: bytes) -> Response:
+        """
+        The response to one request. Header names are lower case.
+        """
+        try:
+            response = await self._route(method, target, headers, body)
+        except Exception:
+            logger.exception("Error handling %s %s", method, target)
+            response = Response.error(500, "Internal server error")
+        return compress(response, headers.get("accept-encoding", ""))
+
+    async def _route(self, method: str, target: str,
+                     headers: Dict[str, str], body: bytes) -> Response:
+        url = urlsplit(target)
+        if url.path == self.metrics_path and self.metrics is not None \
+                and method == "GET":
+            response = Response(200, self.metrics.render().encode(), [
+                ("Content-Type", "text/plain; version=0.0.4")])
+        elif url.path == self.export_path and method == "GET":
+            response = self._export(url.query)
+        elif url.path != self.path:
+            response = Response.error(404, "Not found")
+        elif method == "GET":
+            response = await self._get(url.query, headers)
+        elif method == "POST":
+            response = await self._post(body)
+        else:
+            response = Response.error(405, "Use GET or POST")
+            response.headers.append(("Allow", "GET, POST"))
+        return response
+
+    async def serve_connection(self, reader: asyncio.StreamReader,
+                               writer: asyncio.StreamWriter):
+        """
+        HTTP/1.1 on one connection, kept alive until the client closes it,
+        asks to, or is idle for KEEP_ALIVE_TIMEOUT.
+        """
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    writer.write(Response.error(
+                        431, "Headers too large").encode(False))
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError,
+                        ConnectionError):
+                    break
+                request = self._parse_head(head)
+                if isinstance(request, Response):
+                    writer.write(request.encode(False))
+                    break
+                method, target, version, headers = request
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if "transfer-encoding" in headers or length < 0:
+                    writer.write(Response.error(
+                        411, "Content-Length required").encode(False))
+                    break
+                if length > MAX_BODY_SIZE:
+                    writer.write(Response.error(
+                        413, "Request body too large").encode(False))
+                    break
+                try:
+                    body = await reader.readexactly(length)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                connection = headers.get("connection", "").lower()
+                keep_alive = (connection != "close" if version == "HTTP/1.1"
+                              else connection == "keep-alive")
+                response = await self.handle(method, target, headers, body)
+                if response.streamed:
+                    # Without chunked encoding the end of the body is
+                    # marked by closing the connection.
+                    chunked = version == "HTTP/1.1"
+                    keep_alive = keep_alive and chunked
+                    writer.write(response.encode(keep_alive, chunked))
+                    await self._send_chunks(writer, response.body, chunked)
+                else:
+                    writer.write(response.encode(keep_alive))
+                    await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _send_chunks(writer: asyncio.StreamWriter,
+                           chunks: Iterator[bytes], chunked: bool):
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if chunked:
+                chunk = b"%x\r\n%s\r\n" % (len(chunk), chunk)
+            writer.write(chunk)
+            await writer.drain()
+            # Lets other connections in between chunks.
+            await asyncio.sleep(0)
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _parse_head(head: bytes):
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+            return Response.error(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        return parts[0], parts[1], parts[2], headers
+
+    async def __call__(self, scope, receive, send):
+        # ASGI entry point.
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        chunks, size, more = [], 0, True
+        while more:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more = message.get("more_body", False)
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1")
+                   for name, value in scope["headers"]}
+        if size > MAX_BODY_SIZE:
+            response = Response.error(413, "Request body too large")
+        else:
+            target = scope["path"]
+            if scope.get("query_string"):
+                target += "?" + scope["query_string"].decode("latin-1")
+            response = await self.handle(
+                scope["method"], target, headers, b"".join(chunks))
+        response_headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in response.headers]
+        if not response.streamed:
+            response_headers.insert(0, (
+                b"content-length", str(len(response.body)).encode()))
+        await send({
+            "type": "http.response.start",
+            "status": response.status,
+            "headers": response_headers})
+        if not response.streamed:
+            await send({"type": "http.response.body", "body": response.body})
+            return
+        for chunk in response.body:
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk,
+                            "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def serve(self, sock: socket.socket):
+        server = await asyncio.start_server(
+            self.serve_connection, sock=sock, limit=MAX_HEADER_SIZE)
+        async with server:
+            await server.serve_forever()
+
+
+app = GraphQLServer()
+
+
+def _run_worker(server: GraphQLServer, sock: socket.socket):
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(server.serve(sock))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, workers: int = 1,
+          snapshot_path: Optional[str] = None,
+          persisted_queries: Optional[str] = None, **kwargs):
+    """
+    Serves on host:port from workers processes forked after WordNet is
+    loaded, all accepting from one listening socket. The .graphql files in
+    the persisted_queries directory are registered as persisted queries
+    before forking. kwargs are passed to GraphQLServer.
+    """
+    server = GraphQLServer(**kwargs)
+    batch.preload(snapshot_path)
+    if persisted_queries is not None:
+        wordnet_graphql.documents.load_directory(persisted_queries)
+    # Computed once, before forking.
+    server.version
+    sock = socket.create_server((host, port), backlog=1024)
+    if workers <= 1:
+        _run_worker(server, sock)
+        return
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(server, sock)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--snapshot", help="WordNet snapshot to serve from")
+    parser.add_argument("--timeout", type=float,
+                        help="seconds before a query is cancelled")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--metrics", action="store_true",
+                        help="time requests and serve them at /metrics")
+    parser.add_argument("--export", action="store_true",
+                        help="stream the lexicon as NDJSON at /export")
+    parser.add_argument("--persisted-queries", metavar="DIR",
+                        help="directory of .graphql files to register as "
+                             "persisted queries")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.snapshot,
+          args.persisted_queries,
+          timeout=args.timeout, max_batch_size=args.max_batch_size,
+          metrics=Metrics() if args.metrics else None,
+          export_path="/export" if args.export else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import math
+import threading
+
+from nltk.corpus import wordnet as wn
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from taxonomy import Taxonomy
+
+
+METRICS = ("path", "wup", "lch")
+
+# Stands for NLTK's fake root synset in subsumer ids.
+ROOT = -1
+ROOT_NAME = "*ROOT*"
+
+_UNREACHABLE = np.iinfo(np.int32).max // 4
+
+
+def _pairwise_root() -> bool:
+    # Newer NLTK simulates a root if either synset needs one, older
+    # versions only look at the first.
+    noun = wn.synset("entity.n.01")
+    verb = wn.synset("breathe.v.01")
+    return noun.path_similarity(verb, simulate_root=True) is not None
+
+
+class SimilarityEngine:
+    """
+    NLTK's path, Wu-Palmer and Leacock-Chodorow similarities computed from
+    a Taxonomy. Results are identical to Synset.path_similarity,
+    wup_similarity and lch_similarity, including where they simulate a root
+    for parts of speech with several hypernym roots.
+    """
+
+    def __init__(self, taxonomy: Taxonomy):
+        self.taxonomy = taxonomy
+        graph = taxonomy.graph
+        self.pos = graph.synset_pos
+        self.names = graph.synset_names
+        self.pairwise_root = _pairwise_root()
+        self.needs_root = {}
+        for pos in ("a", "s", "r", "n", "v"):
+            ids = graph.positions.select(pos)
+            self.needs_root[pos.encode()] = bool(
+                len(ids) and graph.synset(int(ids[0]))._needs_root())
+        self._lch_depths = {}
+        self._local = threading.local()
+
+    def _row(self) -> np.ndarray:
+        # A scratch row per thread, so that rows can be computed
+        # concurrently.
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = np.full(len(self.pos), _UNREACHABLE, dtype=np.int32)
+            self._local.row = row
+        return row
+
+    def _simulate_root(self, a: int, b: int, simulate_root: bool) -> bool:
+        if not simulate_root:
+            return False
+        if self.pairwise_root:
+            return self.needs_root[self.pos[a]] or self.needs_root[self.pos[b]]
+        return self.needs_root[self.pos[a]]
+
+    def _root_distance(self, i: int) -> int:
+        return int(self.taxonomy.ancestors(i)[1].max()) + 1
+
+    def shortest_path_distance(self, a: int, b: int,
+                               simulate_root: bool = False) -> Optional[int]:
+        if a == b:
+            return 0
+        ids_a, dist_a = self.taxonomy.ancestors(a)
+        ids_b, dist_b = self.taxonomy.ancestors(b)
+        _, ia, ib = np.intersect1d(
+            ids_a, ids_b, assume_unique=True, return_indices=True)
+        best = int((dist_a[ia] + dist_b[ib]).min()) if len(ia) else None
+        if simulate_root:
+            via_root = self._root_distance(a) + self._root_distance(b)
+            if best is None or via_root < best:
+                best = via_root
+        return best
+
+    def _distances(self, a: int, others: Sequence[int],
+                   simulate_root: bool) -> List[Optional[int]]:
+        # One row of shortest path distances: a's ancestor distances are
+        # scattered into a dense vector, then the minimum over each other
+        # synset's ancestors is taken in a single reduceat.
+        if not len(others):
+            return []
+        row = self._row()
+        ids_a, dist_a = self.taxonomy.ancestors(a)
+        row[ids_a] = dist_a
+        try:
+            ancestors = [self.taxonomy.ancestors(b) for b in others]
+            ids = np.concatenate([x[0] for x in ancestors])
+            dists = np.concatenate([x[1] for x in ancestors])
+            starts = np.zeros(len(ancestors), dtype=np.int64)
+            np.cumsum([len(x[0]) for x in ancestors[:-1]], out=starts[1:])
+            best = np.minimum.reduceat(row[ids] + dists, starts).tolist()
+        finally:
+            row[ids_a] = _UNREACHABLE
+        root_a = int(dist_a.max()) + 1
+        result = []
+        for b, d, (_, dist_b) in zip(others, best, ancestors):
+            if b == a:
+                d = 0
+            elif self._simulate_root(a, b, simulate_root):
+                d = min(d, root_a + int(dist_b.max()) + 1)
+            result.append(d if d < _UNREACHABLE else None)
+        return result
+
+    def _lch_depth(self, pos: bytes, need_root: bool) -> int:
+        key = (pos, need_root)
+        if key not in self._lch_depths:
+            ids = self.taxonomy.graph.positions.select(pos.decode())
+            depth = int(self.taxonomy.max_depth[ids].max()) if len(ids) else 0
+            self._lch_depths[key] = depth + int(need_root)
+        return self._lch_depths[key]
+
+    def _lch(self, a: int, b: int,
+             distance: Optional[int]) -> Optional[float]:
+        # NLTK raises for synsets of different parts of speech.
+        if self.pos[a] != self.pos[b] or distance is None:
+            return None
+        depth = self._lch_depth(self.pos[a], self.needs_root[self.pos[a]])
+        if depth == 0:
+            return None
+        return -math.log((distance + 1) / (2.0 * depth))
+
+    def subsumer(self, a: int, b: int, simulate_root: bool = True):
+        """
+        The lowest common hypernym wup_similarity measures depth from:
+        a synset id, ROOT or None.
+        """
+        ids_a, _ = self.taxonomy.ancestors(a)
+        ids_b, _ = self.taxonomy.ancestors(b)
+        common = np.intersect1d(ids_a, ids_b, assume_unique=True)
+        candidates, depth = [], None
+        if len(common):
+            depths = self.taxonomy.min_depth[common]
+            depth = int(depths.max())
+            candidates = common[depths == depth].tolist()
+        if self._simulate_root(a, b, simulate_root) and not depth:
+            candidates.append(ROOT)
+        if not candidates:
+            return None
+        if a in candidates:
+            return a
+        return min(candidates,
+                   key=lambda i: ROOT_NAME if i == ROOT else self.names[i])
+
+    def _wup(self, a: int, b: int, simulate_root: bool) -> Optional[float]:
+        subsumer = self.subsumer(a, b, simulate_root)
+        if subsumer is None:
+            return None
+        flag = self._simulate_root(a, b, simulate_root)
+        if subsumer == ROOT:
+            depth = 1
+            len1 = self._root_distance(a)
+            len2 = self._root_distance(b)
+        else:
+            depth = int(self.taxonomy.max_depth[subsumer]) + 1
+            len1 = self.shortest_path_distance(subsumer, a, flag)
+            len2 = self.shortest_path_distance(subsumer, b, flag)
+        if len1 is None or len2 is None:
+            return None
+        len1 += depth
+        len2 += depth
+        return (2.0 * depth) / (len1 + len2)
+
+    def matrix(self, rows: Sequence[int], columns: Sequence[int],
+               metric: str = "path",
+               simulate_root: bool = True) -> List[List[Optional[float]]]:
+        """
+        metric similarity of every row synset to every column synset, None
+        where NLTK returns None or raises.
+        """
+        if metric not in METRICS:
+            raise ValueError("unknown similarity metric %r" % metric)
+        result = []
+        for a in rows:
+            if metric == "wup":
+                result.append([self._wup(a, b, simulate_root)
+                               for b in columns])
+                continue
+            distances = self._distances(a, columns, simulate_root)
+            if metric == "path":
+                result.append([
+                    None if d is None else 1.0 / (d + 1) for d in distances])
+            else:
+                result.append([
+                    self._lch(a, b, d)
+                    for b, d in zip(columns, distances)])
+        return result
@@ -0,0 +1,336 @@
+"""
+Compiles WordNet into one memory-mapped file, so a worker can start
+serving queries without NLTK's index parsing or a WordNetGraph build.
+
+    python snapshot.py build wordnet.snapshot
+"""
+import argparse
+import json
+import mmap
+import os
+
+import nltk
+from collections.abc import Mapping
+from nltk.corpus import wordnet as wn
+from nltk.corpus.reader.wordnet import WordNetCorpusReader
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from lexicon import Lexicon, StringTable
+from wordnet_graph import (
+    Adjacency, DATA_FILES, LEMMA_RELATIONS, SYNSET_RELATIONS, WordNetGraph)
+
+
+MAGIC = b"WNSNAP\x00\x01"
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class StringIndex(Mapping):
+    """
+    A read-only {string: id} view of a StringTable.
+    """
+
+    def __init__(self, table: StringTable):
+        self.table = table
+
+    def __getitem__(self, s: str) -> int:
+        i = self.table.find(s) if isinstance(s, str) else -1
+        if i < 0:
+            raise KeyError(s)
+        return i
+
+    def __len__(self):
+        return len(self.table)
+
+    def __iter__(self):
+        return iter(self.table)
+
+
+class LemmaIndex(Mapping):
+    """
+    WordNetCorpusReader._lemma_pos_offset_map served from the snapshot:
+    {lemma: {pos: [offsets]}}, in the order NLTK built it. Entries are
+    only decoded for lemmas that are looked up.
+    """
+
+    def __init__(self, lemmas: StringTable, entry_ends: np.ndarray,
+                 entry_pos: np.ndarray, offset_ends: np.ndarray,
+                 offsets: np.ndarray):
+        self.lemmas = lemmas
+        self._entry_ends = entry_ends
+        self._entry_pos = entry_pos
+        self._offset_ends = offset_ends
+        self._offsets = offsets
+        self._cache = {}
+
+    def _entries(self, i: int) -> Dict[str, List[int]]:
+        entries = {}
+        start = int(self._entry_ends[i - 1]) if i > 0 else 0
+        for e in range(start, int(self._entry_ends[i])):
+            begin = int(self._offset_ends[e - 1]) if e > 0 else 0
+            entries[self._entry_pos[e].decode()] = \
+                self._offsets[begin:int(self._offset_ends[e])].tolist()
+        return entries
+
+    def __getitem__(self, lemma: str) -> Dict[str, List[int]]:
+        # Missing lemmas map to an empty dict, as with NLTK's defaultdict.
+        try:
+            return self._cache[lemma]
+        except KeyError:
+            pass
+        i = self.lemmas.find(lemma) if isinstance(lemma, str) else -1
+        entries = self._entries(i) if i >= 0 else {}
+        if i >= 0:
+            self._cache[lemma] = entries
+        return entries
+
+    def __contains__(self, lemma) -> bool:
+        return isinstance(lemma, str) and self.lemmas.find(lemma) >= 0
+
+    def __len__(self):
+        return len(self.lemmas)
+
+    def __iter__(self):
+        return iter(self.lemmas)
+
+
+_LAZY = object()
+
+
+class SnapshotCorpusReader(WordNetCorpusReader):
+    """
+    A WordNetCorpusReader whose lemma index, satellite offsets and
+    version mapping come from a snapshot instead of being parsed at
+    startup. Synsets are still read from the data files by NLTK.
+    """
+
+    def __init__(self, root, omw_reader, snapshot: "Snapshot"):
+        self.snapshot = snapshot
+        WordNetCorpusReader.__init__(self, root, omw_reader)
+
+    def _scan_satellites(self):
+        self.satellite_offsets = set(
+            self.snapshot.array("satellite_offsets").tolist())
+
+    def _load_lemma_pos_offset_map(self):
+        self._lemma_pos_offset_map = self.snapshot.lemma_index()
+
+    def map_wn(self, version="wordnet"):
+        # Only used for multilingual lookups; computed on first use.
+        if version == "wordnet":
+            return _LAZY
+        return WordNetCorpusReader.map_wn(self, version)
+
+    @property
+    def map30(self):
+        if self.__dict__.get("_map30", _LAZY) is _LAZY:
+            self._map30 = WordNetCorpusReader.map_wn(self)
+        return self._map30
+
+    @map30.setter
+    def map30(self, value):
+        self._map30 = value
+
+
+def fingerprint(root) -> Dict[str, object]:
+    """
+    Identifies the NLTK version and WordNet data files under root. Taken
+    from the corpus files rather than the reader, which would load
+    WordNet.
+    """
+    return {
+        "format": FORMAT_VERSION,
+        "nltk": nltk.__version__,
+        "data_files": {
+            fileid: root.join(fileid).file_size()
+            for _, fileid in DATA_FILES},
+    }
+
+
+def build(path: str, graph: Optional[WordNetGraph] = None, wordnet=wn):
+    """
+    Writes the snapshot of wordnet, and of graph if it was already built.
+    """
+    if graph is None:
+        graph = WordNetGraph.build(wordnet)
+    lexicon = Lexicon.arrays(graph, wordnet)
+    wordnet.ensure_loaded()
+    arrays = {}
+
+    def strings(name, values):
+        for key, array in StringTable.arrays(values).items():
+            arrays["%s.%s" % (name, key)] = array
+
+    def adjacency(name, a):
+        arrays[name + ".indptr"] = a.indptr
+        arrays[name + ".indices"] = a.indices
+
+    strings("synset_names", list(graph.synset_names))
+    arrays["synset_pos"] = graph.synset_pos
+    arrays["synset_offsets"] = graph.synset_offsets
+    for rel in SYNSET_RELATIONS:
+        adjacency("synset." + rel, graph.synset_relations[rel])
+    strings("lemma_names", list(graph.lemma_names))
+    arrays["lemma_synsets"] = graph.lemma_synsets
+    for rel in LEMMA_RELATIONS:
+        adjacency("lemma." + rel, graph.lemma_relations[rel])
+
+    index = wordnet._lemma_pos_offset_map
+    lemmas = list(index)
+    entry_pos, offset_ends, offsets, entry_ends = [], [], [], []
+    for lemma in lemmas:
+        for pos, pos_offsets in index[lemma].items():
+            entry_pos.append(pos)
+            offsets.extend(pos_offsets)
+            offset_ends.append(len(offsets))
+        entry_ends.append(len(entry_pos))
+    strings("lemma_index.lemmas", lemmas)
+    arrays["lemma_index.entry_ends"] = np.array(entry_ends, dtype=np.int64)
+    arrays["lemma_index.entry_pos"] = np.array(entry_pos, dtype="S1")
+    arrays["lemma_index.offset_ends"] = np.array(offset_ends, dtype=np.int64)
+    arrays["lemma_index.offsets"] = np.array(offsets, dtype=np.uint32)
+    arrays["satellite_offsets"] = graph.synset_offsets[
+        graph.synset_pos == b"s"]
+    for name, array in lexicon.items():
+        arrays["lexicon." + name] = array
+
+    header = fingerprint(wordnet.root)
+    header["arrays"] = {}
+    position = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        header["arrays"][name] = [array.dtype.str, list(array.shape),
+                                  position]
+        position += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    encoded = json.dumps(header, sort_keys=True).encode("utf-8")
+    start = -(-(len(MAGIC) + 8 + len(encoded)) // ALIGNMENT) * ALIGNMENT
+
+    # Written next to the target and renamed, so that running workers
+    # keep mapping the old file.
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(8, "little"))
+        f.write(encoded)
+        for name, array in arrays.items():
+            f.seek(start + header["arrays"][name][2])
+            f.write(array.tobytes())
+        f.truncate(start + position)
+    os.replace(tmp, path)
+
+
+class Snapshot:
+    """
+    A snapshot mapped read-only into memory. Every process that opens the
+    same file shares its pages.
+    """
+
+    def __init__(self, path: str, root=None, check: bool = True):
+        self.path = path
+        self.root = root or nltk.data.find("corpora/wordnet")
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise SnapshotError("%s is not a WordNet snapshot" % path)
+        length = int.from_bytes(self._map[len(MAGIC):len(MAGIC) + 8],
+                                "little")
+        end = len(MAGIC) + 8 + length
+        self.header = json.loads(self._map[len(MAGIC) + 8:end].decode())
+        self._start = -(-end // ALIGNMENT) * ALIGNMENT
+        if check:
+            expected = fingerprint(self.root)
+            found = {k: self.header.get(k) for k in expected}
+            if found != expected:
+                raise SnapshotError(
+                    "%s was built for %s, not %s" % (path, found, expected))
+        self._graph = None
+        self._lemma_index = None
+
+    @classmethod
+    def open(cls, path: str, **kwargs) -> "Snapshot":
+        return cls(path, **kwargs)
+
+    def array(self, name: str) -> np.ndarray:
+        dtype, shape, position = self.header["arrays"][name]
+        count = int(np.prod(shape))
+        return np.frombuffer(
+            self._map, dtype=np.dtype(dtype), count=count,
+            offset=self._start + position).reshape(shape)
+
+    def strings(self, name: str) -> StringTable:
+        return StringTable.load(self.array, name)
+
+    def _adjacency(self, name: str) -> Adjacency:
+        return Adjacency(self.array(name + ".indptr"),
+                         self.array(name + ".indices"))
+
+    @property
+    def graph(self) -> WordNetGraph:
+        if self._graph is None:
+            synset_names = self.strings("synset_names")
+            self._graph = WordNetGraph(
+                synset_names=synset_names,
+                synset_pos=self.array("synset_pos"),
+                synset_offsets=self.array("synset_offsets"),
+                synset_relations={
+                    rel: self._adjacency("synset." + rel)
+                    for rel in SYNSET_RELATIONS},
+                lemma_names=self.strings("lemma_names"),
+                lemma_synsets=self.array("lemma_synsets"),
+                lemma_relations={
+                    rel: self._adjacency("lemma." + rel)
+                    for rel in LEMMA_RELATIONS},
+                synset_ids=StringIndex(synset_names))
+            self._graph.lexicon = Lexicon(
+                self._graph, lambda name: self.array("lexicon." + name))
+        return self._graph
+
+    def lemma_index(self) -> LemmaIndex:
+        if self._lemma_index is None:
+            self._lemma_index = LemmaIndex(
+                self.strings("lemma_index.lemmas"),
+                self.array("lemma_index.entry_ends"),
+                self.array("lemma_index.entry_pos"),
+                self.array("lemma_index.offset_ends"),
+                self.array("lemma_index.offsets"))
+        return self._lemma_index
+
+    def reader(self, omw_reader=None) -> SnapshotCorpusReader:
+        return SnapshotCorpusReader(self.root, omw_reader, self)
+
+    def install(self, loader=wn) -> bool:
+        """
+        Makes the not yet loaded nltk.corpus.wordnet use this snapshot,
+        the same way LazyCorpusLoader loads itself. Returns False if
+        WordNet was already loaded.
+        """
+        if not isinstance(loader, nltk.corpus.util.LazyCorpusLoader):
+            return False
+        args = getattr(loader, "_LazyCorpusLoader__args", ())
+        reader = self.reader(omw_reader=args[0] if args else None)
+        loader.__dict__.update(reader.__dict__)
+        loader.__class__ = reader.__class__
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    commands = parser.add_subparsers(dest="command")
+    build_command = commands.add_parser("build")
+    build_command.add_argument("path")
+    args = parser.parse_args()
+    if args.command == "build":
+        build(args.path)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
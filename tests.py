@@ -1,8 +1,42 @@
+import asyncio
+import gzip
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tempfile
+import zlib
 import unittest
 import wordnet_graphql
+import wordnet_graph
+import query_cost
+import document_cache
+import result_cache
+import taxonomy
+import information_content
+import nearest
+import metrics
+import json_executor
+import node_cache
+import closure
+import lemma_search
+import batch
+import server
+import snapshot
+import export
+import lexicon
 from numpy.random import permutation
 from graphene.test import Client
-from nltk.corpus import wordnet as wn
+from graphql import parse
+from urllib.parse import quote
+from nltk.corpus import wordnet as wn, wordnet_ic
+from nltk.corpus.reader.wordnet import WordNetError
+from nltk.metrics import edit_distance
+from nltk.util import acyclic_breadth_first
 import random
 
 NUM_RANDOM_TRIALS = 10
@@ -11,6 +45,59 @@ all_synsets = list(wn.all_synsets())
 
 client = Client(wordnet_graphql.schema)
 
+_graph = None
+
+
+def get_graph():
+    global _graph
+    if _graph is None:
+        _graph = wordnet_graph.WordNetGraph.build()
+    return _graph
+
+
+_snapshot_dir = tempfile.TemporaryDirectory()
+_snapshot = None
+
+
+def get_snapshot():
+    global _snapshot
+    if _snapshot is None:
+        path = os.path.join(_snapshot_dir.name, 'wordnet.snapshot')
+        snapshot.build(path, get_graph())
+        _snapshot = snapshot.Snapshot.open(path)
+    return _snapshot
+
+
+def start_server(graphql_server):
+    """
+    Serves graphql_server on a loop in a thread. Returns the listening
+    socket and a function that stops serving and closes the loop.
+    """
+    sock = socket.create_server(('127.0.0.1', 0))
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    serving = asyncio.run_coroutine_threadsafe(graphql_server.serve(sock), loop)
+
+    async def close_connections():
+        # Connections end once their clients close them.
+        pending = asyncio.all_tasks() - {asyncio.current_task()}
+        if pending:
+            _, pending = await asyncio.wait(pending, timeout=5)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await loop.shutdown_asyncgens()
+
+    def stop():
+        serving.cancel()
+        asyncio.run_coroutine_threadsafe(close_connections(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    return sock, stop
+
 
 class LemmaTest(unittest.TestCase):
     """
@@ -300,6 +387,60 @@ class SynsetTest(unittest.TestCase):
         for i, synset in enumerate(data['allSynsets']):
             self.assertEqual(just_noun_synsets[i].name(), synset['name'])
 
+    def test_all_synsets_connection(self, pos='r', page_size=1000):
+        synsets = list(wn.all_synsets(pos=pos))
+        names = []
+        after = ''
+        while True:
+            data = client.execute('''
+                query TestQuery {{
+                    allSynsetsConnection(pos: "{0}", first: {1}, after: "{2}") {{
+                        totalCount
+                        pageInfo {{
+                            hasNextPage
+                            endCursor
+                        }}
+                        edges {{
+                            node {{
+                                name
+                            }}
+                        }}
+                    }}
+                }}
+            '''.format(pos, page_size, after))['data']['allSynsetsConnection']
+            self.assertEqual(len(synsets), data['totalCount'])
+            names.extend(edge['node']['name'] for edge in data['edges'])
+            if not data['pageInfo']['hasNextPage']:
+                break
+            after = data['pageInfo']['endCursor']
+        self.assertListEqual([s.name() for s in synsets], names)
+
+        data = client.execute('''
+            query TestQuery {
+                allSynsetsConnection(first: 2) {
+                    edges {
+                        cursor
+                    }
+                }
+            }
+        ''')['data']['allSynsetsConnection']
+        data = client.execute('''
+            query TestQuery {{
+                allSynsetsConnection(first: 1, after: "{0}") {{
+                    pageInfo {{
+                        hasPreviousPage
+                    }}
+                    edges {{
+                        node {{
+                            name
+                        }}
+                    }}
+                }}
+            }}
+        '''.format(data['edges'][0]['cursor']))['data']['allSynsetsConnection']
+        self.assertTrue(data['pageInfo']['hasPreviousPage'])
+        self.assertEqual(all_synsets[1].name(), data['edges'][0]['node']['name'])
+
     def test_closure(self, synset_name='dog.n.01'):
         synset = wn.synset(synset_name)
         relations = [
@@ -340,6 +481,46 @@ class SynsetTest(unittest.TestCase):
                 [x.name() for x in synset.closure(rel[1], 5)],
                 [x['name'] for x in query_results['synset']['closure']])
 
+    def test_closure_distances(self, synset_name='dog.n.01'):
+        synset = wn.synset(synset_name)
+        for names in [['hypernyms', 'instance_hypernyms'],
+                      ['part_meronyms', 'hyponyms', 'member_meronyms']]:
+            result = client.execute('''
+                query TestQuery($name: String, $relations: [String!]) {
+                    synset(name: $name) {
+                        closureDistances(relationshipNames: $relations,
+                                         depth: 3) {
+                            name
+                            distance
+                        }
+                    }
+                }
+            ''', variables={'name': synset_name, 'relations': names})
+            self.assertNotIn('errors', result)
+            rel = lambda s: [t for n in names for t in getattr(s, n)()]
+            expected = []
+            for depth in range(1, 4):
+                within = list(synset.closure(rel, depth))
+                expected += [(s.name(), depth)
+                             for s in within[len(expected):]]
+            self.assertListEqual(
+                expected,
+                [(s['name'], s['distance'])
+                 for s in result['data']['synset']['closureDistances']])
+
+    def test_closure_unknown_relation(self):
+        for relations in ['relationshipName: "cousins"', '']:
+            result = client.execute('''
+                query TestQuery {
+                    synset(name: "dog.n.01") {
+                        closure(%s) {
+                            name
+                        }
+                    }
+                }
+            ''' % relations)
+            self.assertIn('errors', result)
+
     def test_synset(self, synset_name='entity.n.01', synset_name2='entity.n.01'):
         synset = wn.synset(synset_name)
         randomSynsetOfSamePos = random.choice([s for s in all_synsets if s.pos() == synset.pos()])
@@ -507,9 +688,11 @@ class SynsetTest(unittest.TestCase):
         self.assertEqual(synset.max_depth(), data['maxDepth'])
         self.assertEqual(synset.min_depth(), data['minDepth'])
 
+        # NLTK returns common hypernyms in set order.
         commonHypernyms = synset.common_hypernyms(synset2)
-        for i, s in enumerate(commonHypernyms):
-            self.assertEqual(s.name(), data['commonHypernyms'][i]['name'])
+        self.assertListEqual(
+            sorted(s.name() for s in commonHypernyms),
+            sorted(s['name'] for s in data['commonHypernyms']))
 
         lowestCommonHypernyms = synset.lowest_common_hypernyms(synset2)
         for i, s in enumerate(lowestCommonHypernyms):
@@ -531,5 +714,1596 @@ class SynsetTest(unittest.TestCase):
             self.test_closure(synset.name())
 
 
+class LoaderTest(unittest.TestCase):
+
+    def test_other_synset_loaded_once(self):
+        context = wordnet_graphql.RequestContext()
+        batches = []
+        batch_load_fn = context.loaders.synsets.batch_load_fn
+
+        def counting_batch_load_fn(names):
+            batches.append(list(names))
+            return batch_load_fn(names)
+        context.loaders.synsets.batch_load_fn = counting_batch_load_fn
+
+        result = wordnet_graphql.execute('''
+            query TestQuery {
+                allSynsets(pos: "r") {
+                    name
+                    pathSimilarity(otherSynsetName: "quickly.r.01")
+                }
+            }
+        ''', context=context)
+        self.assertIsNone(result.errors)
+        self.assertListEqual([["quickly.r.01"]], batches)
+        other = wn.synset("quickly.r.01")
+        for synset, data in zip(wn.all_synsets(pos="r"), result.data["allSynsets"]):
+            self.assertEqual(synset.path_similarity(other), data["pathSimilarity"])
+
+    def test_nested_relations(self, synset_name="dog.n.01"):
+        query = '''
+            query TestQuery {{
+                synset(name: "{0}") {{
+                    hyponyms {{
+                        name
+                        hyponyms {{
+                            name
+                            hypernyms {{
+                                name
+                                lemmas {{
+                                    antonyms {{
+                                        name
+                                    }}
+                                }}
+                            }}
+                        }}
+                    }}
+                    wupSimilarity(otherSynsetName: "cat.n.01")
+                }}
+            }}
+        '''.format(synset_name)
+        expected = client.execute(query)
+        self.assertEqual(expected, client.execute(
+            query, context=wordnet_graphql.RequestContext()))
+
+    def test_unknown_other_synset(self):
+        result = wordnet_graphql.execute('''
+            query TestQuery {
+                synset(name: "dog.n.01") {
+                    name
+                    pathSimilarity(otherSynsetName: "not_a_word.n.01")
+                }
+            }
+        ''')
+        self.assertEqual("dog.n.01", result.data["synset"]["name"])
+        self.assertIsNone(result.data["synset"]["pathSimilarity"])
+        self.assertEqual(1, len(result.errors))
+
+
+class QueryCostTest(unittest.TestCase):
+
+    def test_cost_reported(self):
+        result = wordnet_graphql.execute('''
+            query TestQuery {
+                synset(name: "dog.n.01") {
+                    name
+                    hypernyms {
+                        name
+                    }
+                }
+            }
+        ''', cost_limits=query_cost.CostLimits())
+        self.assertIsNone(result.errors)
+        cost = result.extensions['cost']
+        self.assertEqual(2, cost['depth'])
+        self.assertEqual(3 + len(wn.synset('dog.n.01').hypernyms()), cost['actual'])
+        self.assertAlmostEqual(cost['actual'], cost['estimated'], delta=2)
+
+    def test_closure_rejected(self):
+        result = wordnet_graphql.execute('''
+            query TestQuery {
+                synset(name: "entity.n.01") {
+                    closure(relationshipName: "hyponyms", depth: -1) {
+                        name
+                    }
+                }
+            }
+        ''', cost_limits=query_cost.CostLimits(max_cost=10000))
+        self.assertIsNone(result.data)
+        self.assertIsInstance(result.errors[0], query_cost.QueryCostError)
+        self.assertGreater(result.extensions['cost']['estimated'], 10000)
+        self.assertNotIn('actual', result.extensions['cost'])
+
+    def test_depth_rejected(self):
+        query = '''
+            query TestQuery {
+                synset(name: "entity.n.01") {
+                    ...Hyponyms
+                }
+            }
+            fragment Hyponyms on SynsetNode {
+                hyponyms {
+                    hyponyms {
+                        name
+                    }
+                }
+            }
+        '''
+        result = wordnet_graphql.execute(
+            query, cost_limits=query_cost.CostLimits(max_depth=2))
+        self.assertIsInstance(result.errors[0], query_cost.QueryCostError)
+        result = wordnet_graphql.execute(
+            query, cost_limits=query_cost.CostLimits(max_depth=3))
+        self.assertIsNone(result.errors)
+
+    def test_word_list_cost(self):
+        query = '{ synsetsForWords(words: [%s]) { name } }'
+        estimator = query_cost.CostEstimator(wordnet_graphql.schema)
+        costs = [
+            estimator.estimate(parse(query % ', '.join(['"dog"'] * n))).cost
+            for n in (1, 10)]
+        self.assertAlmostEqual(costs[0] * 10, costs[1], delta=10)
+
+    def test_throttle(self):
+        query = '{ synset(name: "dog.n.01") { name } }'
+        throttle = query_cost.CostThrottle(rate=0, capacity=3)
+        self.assertIsNone(wordnet_graphql.execute(query, throttle=throttle).errors)
+        result = wordnet_graphql.execute(query, throttle=throttle)
+        self.assertIsInstance(result.errors[0], query_cost.QueryCostError)
+
+    def test_invalid_variables(self):
+        query = 'query TestQuery($name: String!) { synset(name: $name) { name } }'
+        for options in [{}, {'raw_json': True},
+                        {'result_cache': result_cache.ResultCache()},
+                        {'cost_limits': query_cost.CostLimits()}]:
+            results = [
+                wordnet_graphql.execute(query, **options),
+                asyncio.run(wordnet_graphql.execute_async(query, **options))]
+            for result in results:
+                self.assertTrue(result.invalid)
+                self.assertIn('"$name"', result.errors[0].message)
+        result = wordnet_graphql.execute(query, operation_name='Other')
+        self.assertTrue(result.invalid)
+
+    def test_variable_defaults(self):
+        limits = query_cost.CostLimits()
+        for query in [
+                'query Q($k: Int) { nearestSynsets(name: "dog.n.01", k: $k) { similarity } }',
+                'query Q($l: Int) { searchLemmas(prefix: "dog", limit: $l) { name } }']:
+            result = wordnet_graphql.execute(query, cost_limits=limits)
+            self.assertIsNone(result.errors)
+            self.assertEqual(11, result.extensions['cost']['estimated'])
+        result = wordnet_graphql.execute(
+            'query Q($p: String = "r") { allSynsets(pos: $p) { name } }',
+            cost_limits=limits)
+        cost = result.extensions['cost']
+        self.assertEqual(cost['actual'], cost['estimated'])
+        result = wordnet_graphql.execute(
+            'query Q($n: Int = 5) { allSynsetsConnection(first: $n) { edges { node { name } } } }',
+            cost_limits=limits)
+        self.assertIsNone(result.errors)
+        self.assertLess(result.extensions['cost']['estimated'], 20)
+
+    def test_unknown_operation(self):
+        result = wordnet_graphql.execute(
+            '{ synset(name: "dog.n.01") { name } }', operation_name='Foo',
+            cost_limits=query_cost.CostLimits())
+        self.assertTrue(result.invalid)
+        self.assertEqual('Unknown operation named "Foo".',
+                         result.errors[0].message)
+
+
+class DocumentCacheTest(unittest.TestCase):
+
+    def test_cache_hits(self):
+        documents = document_cache.DocumentCache(wordnet_graphql.schema, maxsize=2)
+        queries = ['{ synset(name: "dog.n.0%d") { name } }' % i for i in range(1, 4)]
+        first, errors = documents.get(queries[0])
+        self.assertListEqual([], errors)
+        self.assertIs(first, documents.get(queries[0])[0])
+        documents.get(queries[1])
+        documents.get(queries[2])
+        self.assertIsNot(first, documents.get(queries[0])[0])
+        stats = documents.stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(4, stats['misses'])
+        self.assertEqual(2, stats['size'])
+
+    def test_invalid_documents_cached(self):
+        documents = document_cache.DocumentCache(wordnet_graphql.schema)
+        for query in ['{ synset(name: "dog.n.01") { nope } }', '{ synset(']:
+            self.assertEqual(1, len(documents.get(query)[1]))
+            self.assertEqual(1, len(documents.get(query)[1]))
+        self.assertEqual(2, documents.stats()['hits'])
+
+    def test_persisted_queries(self):
+        query = 'query TestQuery { synset(name: "dog.n.01") { name } }'
+        with tempfile.TemporaryDirectory() as path:
+            with open(os.path.join(path, 'dog.graphql'), 'w') as f:
+                f.write(query)
+            self.assertEqual(1, wordnet_graphql.documents.load_directory(path))
+        result = wordnet_graphql.execute(
+            query_hash=document_cache.query_hash(query))
+        self.assertEqual('dog.n.01', result.data['synset']['name'])
+        result = wordnet_graphql.execute(query_hash='0' * 64)
+        self.assertIsInstance(
+            result.errors[0], document_cache.PersistedQueryNotFound)
+
+
+class NodeCacheTest(unittest.TestCase):
+
+    QUERY = '''{ synset(name: "dog.n.01") {
+        name hypernyms { name hyponyms { name definition } }
+        lemmas { name count synset { name lemmas { name } } } } }'''
+
+    def setUp(self):
+        wordnet_graphql._node_cache.clear()
+
+    def tearDown(self):
+        wordnet_graphql.INTERN_NODES = True
+
+    def test_lru(self):
+        nodes = node_cache.NodeCache(maxsize=2)
+        first = nodes.get('a', object)
+        self.assertIs(first, nodes.get('a', object))
+        nodes.get('b', object)
+        nodes.get('a', object)
+        nodes.get('c', object)
+        self.assertIs(first, nodes.get('a', object))
+        self.assertEqual(
+            {'hits': 3, 'misses': 3, 'size': 2, 'maxsize': 2}, nodes.stats())
+
+    def test_nodes_shared(self):
+        expected = client.execute(self.QUERY)
+        stats = wordnet_graphql._node_cache.stats()
+        # dog.n.01 is reached again through its lemmas.
+        self.assertGreater(stats['hits'], 0)
+        self.assertEqual(expected, client.execute(self.QUERY))
+        again = wordnet_graphql._node_cache.stats()
+        self.assertEqual(stats['misses'], again['misses'])
+        self.assertEqual(stats['size'], again['size'])
+        wordnet_graphql.INTERN_NODES = False
+        self.assertEqual(expected, client.execute(self.QUERY))
+
+    def test_nodes_slotted(self):
+        for node in [
+                wordnet_graphql._node(
+                    wordnet_graphql.SynsetNode, wn.synset('dog.n.01')),
+                wordnet_graphql._node(
+                    wordnet_graphql.LemmaNode, wn.lemma('dog.n.01.dog'))]:
+            self.assertFalse(hasattr(node, '__dict__'))
+        self.assertIs(node, wordnet_graphql._node(
+            wordnet_graphql.LemmaNode, wn.lemma('dog.n.01.dog')))
+        self.assertEqual('dog', node.resolve_name(None))
+
+    def test_same_lemma_name_in_other_synsets(self):
+        result = client.execute('''{
+            a: synset(name: "dog.n.01") { lemmas { name synset { name } } }
+            b: synset(name: "frank.n.02") { lemmas { name synset { name } } }
+        }''')
+        for alias, name in [('a', 'dog.n.01'), ('b', 'frank.n.02')]:
+            for lemma in result['data'][alias]['lemmas']:
+                self.assertEqual(name, lemma['synset']['name'])
+
+    def test_cleared_with_engine(self):
+        client.execute(self.QUERY)
+        self.assertGreater(wordnet_graphql._node_cache.stats()['size'], 0)
+        wordnet_graphql.enable_graph_engine(get_graph())
+        try:
+            self.assertEqual(0, wordnet_graphql._node_cache.stats()['size'])
+            client.execute(self.QUERY)
+        finally:
+            wordnet_graphql.disable_graph_engine()
+        self.assertEqual(0, wordnet_graphql._node_cache.stats()['size'])
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def test_hit_skips_resolvers(self):
+        cache = result_cache.ResultCache()
+        query = '''
+            query TestQuery($name: String) {
+                synset(name: $name) {
+                    name
+                    hypernyms {
+                        name
+                    }
+                }
+            }
+        '''
+        expected = client.execute(query, variables={'name': 'dog.n.01'})['data']
+        for _ in range(2):
+            counter = query_cost.CostCounter()
+            result = wordnet_graphql.execute(
+                query, variables={'name': 'dog.n.01'},
+                result_cache=cache, middleware=[counter])
+            self.assertEqual(expected, result.data)
+        self.assertEqual(0, counter.count)
+        result = wordnet_graphql.execute(
+            query, variables={'name': 'cat.n.01'}, result_cache=cache)
+        self.assertEqual('cat.n.01', result.data['synset']['name'])
+
+    def test_subtrees_shared(self):
+        cache = result_cache.ResultCache()
+        wordnet_graphql.execute('''
+            query TestQuery {
+                synset(name: "dog.n.01") {
+                    hypernyms {
+                        name
+                    }
+                }
+            }
+        ''', result_cache=cache)
+        counter = query_cost.CostCounter()
+        result = wordnet_graphql.execute('''
+            query TestQuery {
+                lemma(id: "dog.n.01.dog") {
+                    name
+                }
+                dog: synset(name: "dog.n.01") {
+                    hypernyms {
+                        name
+                    }
+                }
+            }
+        ''', result_cache=cache, middleware=[counter])
+        self.assertIsNone(result.errors)
+        self.assertListEqual(['lemma', 'dog'], list(result.data))
+        self.assertListEqual(
+            [s.name() for s in wn.synset('dog.n.01').hypernyms()],
+            [s['name'] for s in result.data['dog']['hypernyms']])
+        self.assertEqual(2, counter.count)
+
+    def test_variable_defaults(self):
+        cache = result_cache.ResultCache()
+        query = '''
+            query TestQuery($name: String = "%s") {
+                synset(name: $name) {
+                    name
+                }
+            }
+        '''
+        for name in ['dog.n.01', 'cat.n.01']:
+            result = wordnet_graphql.execute(query % name, result_cache=cache)
+            self.assertEqual(name, result.data['synset']['name'])
+        result = wordnet_graphql.execute(
+            query % 'dog.n.01', variables={'name': 'cat.n.01'},
+            result_cache=cache)
+        self.assertEqual('cat.n.01', result.data['synset']['name'])
+        result = wordnet_graphql.execute(
+            query % 'cat.n.01', variables={'name': None}, result_cache=cache)
+        self.assertEqual(
+            wordnet_graphql.execute(query % 'cat.n.01',
+                                    variables={'name': None}).data,
+            result.data)
+
+    def test_merged_fields_not_cached(self):
+        cache = result_cache.ResultCache()
+        result = wordnet_graphql.execute('''
+            query TestQuery {
+                synset(name: "dog.n.01") {
+                    name
+                }
+                synset(name: "dog.n.01") {
+                    definition
+                }
+            }
+        ''', result_cache=cache)
+        self.assertListEqual(['name', 'definition'],
+                             list(result.data['synset']))
+        result = wordnet_graphql.execute(
+            '{ synset(name: "dog.n.01") { name } }', result_cache=cache)
+        self.assertListEqual(['name'], list(result.data['synset']))
+
+    def test_byte_budget(self):
+        cache = result_cache.ResultCache(max_bytes=2000)
+        for i in range(1, 8):
+            cache.put('key%d' % i, {'definition': 'x' * 500})
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 2000)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertIsNotNone(cache.get('key7'))
+
+    def test_errors_not_cached(self):
+        cache = result_cache.ResultCache()
+        query = '{ synset(name: "not_a_word.n.01") { name } }'
+        for _ in range(2):
+            result = wordnet_graphql.execute(query, result_cache=cache)
+            self.assertEqual(1, len(result.errors))
+        self.assertEqual(0, cache.stats()['entries'])
+
+
+class AsyncExecutionTest(unittest.TestCase):
+
+    heavy = '''
+        query { synset(name: "entity.n.01") {
+            closure(relationshipName: "hyponyms") { name }
+        } }
+    '''
+    light = '''
+        query { synset(name: "dog.n.01") {
+            name hypernyms { name } lemmas { name count }
+        } }
+    '''
+
+    def test_matches_execute(self):
+        query = '''
+            query TestQuery($name: String!) {
+                synset(name: $name) {
+                    definition
+                    closure(relationshipName: "hypernyms", depth: 3) { name }
+                    hyponyms { name lemmas { name } }
+                    pathSimilarity(otherSynsetName: "cat.n.01")
+                }
+                allSynsets(pos: "r") { name }
+                similarityMatrix(names: [$name], others: ["cat.n.01"])
+                nearestSynsets(name: $name, k: 3) { synset { name } }
+            }
+        '''
+        for synset in random.sample(all_synsets, 3):
+            variables = {'name': synset.name()}
+            expected = wordnet_graphql.execute(query, variables=variables)
+            result = asyncio.run(wordnet_graphql.execute_async(
+                query, variables=variables))
+            self.assertFalse(result.errors)
+            self.assertEqual(expected.data, result.data)
+
+    def test_light_queries_not_blocked(self):
+        async def run():
+            heavy = asyncio.ensure_future(
+                wordnet_graphql.execute_async(self.heavy))
+            await asyncio.sleep(0)
+            light = await wordnet_graphql.execute_async(self.light)
+            self.assertFalse(heavy.done())
+            self.assertFalse(light.errors)
+            self.assertFalse((await heavy).errors)
+        asyncio.run(run())
+
+    def test_timeout(self):
+        async def run():
+            context = wordnet_graphql.AsyncRequestContext(
+                asyncio.get_running_loop())
+            result = await wordnet_graphql.execute_async(
+                self.heavy, context=context, timeout=0.01)
+            self.assertIsNone(result.data)
+            self.assertIsInstance(result.errors[0],
+                                  wordnet_graphql.QueryCancelledError)
+            self.assertTrue(context.cancelled.is_set())
+        asyncio.run(run())
+
+    def test_cancel(self):
+        async def run():
+            context = wordnet_graphql.AsyncRequestContext(
+                asyncio.get_running_loop())
+            task = asyncio.ensure_future(wordnet_graphql.execute_async(
+                self.heavy, context=context))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertTrue(context.cancelled.is_set())
+        asyncio.run(run())
+
+
+class RawJSONTest(unittest.TestCase):
+
+    queries = [
+        """query Q($name: String) { synset(name: $name) {
+            name definition examples offset
+            lemmas { name count antonyms { name synset { name } } }
+            hyponyms { ...F hypernyms { ...F } }
+            wupSimilarity(otherSynsetName: "cat.n.01") } }
+        fragment F on SynsetNode { __typename name lemmaNames }""",
+        """{ a: allSynsets(pos: "r") { name pos }
+            b: allSynsetsConnection(pos: "r", first: 2) {
+                edges { cursor node { name } }
+                pageInfo { hasNextPage } totalCount } }""",
+        """{ similarityMatrix(names: ["dog.n.01", "cat.n.01"],
+                              others: ["car.n.01"], metric: WUP)
+            nearestSynsets(name: "dog.n.01", k: 3) {
+                synset { name } similarity } }""",
+        """{ synset(name: "cat.n.99") { name }
+            lemma(id: "good.a.01.good") { name key } }""",
+    ]
+
+    def assertSameResult(self, expected, result):
+        self.assertIsInstance(result.data, json_executor.RawJSON)
+        # Same fields in the same order, written as json.dumps() would.
+        self.assertEqual(
+            json.dumps(expected.data, separators=(',', ':')), result.data)
+        self.assertEqual(
+            [wordnet_graphql.format_error(e) for e in expected.errors or []],
+            [wordnet_graphql.format_error(e) for e in result.errors or []])
+        self.assertEqual(
+            json.dumps(wordnet_graphql.result_dict(expected),
+                       separators=(',', ':')).encode(),
+            wordnet_graphql.result_json(result))
+
+    def test_matches_execute(self):
+        for engine in (False, True):
+            if engine:
+                wordnet_graphql.enable_graph_engine(get_graph())
+            try:
+                for query in self.queries:
+                    variables = {'name': 'dog.n.01'}
+                    expected = wordnet_graphql.execute(
+                        query, variables=variables)
+                    self.assertSameResult(expected, wordnet_graphql.execute(
+                        query, variables=variables, raw_json=True))
+                    self.assertSameResult(expected, asyncio.run(
+                        wordnet_graphql.execute_async(
+                            query, variables=variables, raw_json=True)))
+            finally:
+                wordnet_graphql.disable_graph_engine()
+        self.assertIn('errors', wordnet_graphql.result_dict(expected))
+
+    def test_invalid_and_extensions(self):
+        result = wordnet_graphql.execute('{ synset(', raw_json=True)
+        self.assertNotIn(b'"data"', wordnet_graphql.result_json(result))
+        query = '{ synset(name: "dog.n.01") { name hypernyms { name } } }'
+        limits = query_cost.CostLimits(max_cost=1000)
+        expected = wordnet_graphql.execute(query, cost_limits=limits)
+        result = wordnet_graphql.execute(
+            query, cost_limits=limits, raw_json=True)
+        self.assertSameResult(expected, result)
+        self.assertEqual(expected.extensions['cost']['actual'],
+                         result.extensions['cost']['actual'])
+
+
+class MetricsTest(unittest.TestCase):
+
+    query = '''
+        query MetricsTest { synset(name: "dog.n.01") {
+            name hypernyms { name } lemmas { name count }
+        } }
+    '''
+
+    def test_render(self):
+        registry = metrics.Metrics()
+        for seconds in (0.0002, 0.003, 20.0):
+            registry.observe('phase', 'parse', seconds)
+        lines = registry.render().splitlines()
+        self.assertIn('# TYPE wordnet_graphql_phase_seconds histogram', lines)
+        self.assertIn('wordnet_graphql_phase_seconds_bucket'
+                      '{phase="parse",le="0.00025"} 1', lines)
+        self.assertIn('wordnet_graphql_phase_seconds_bucket'
+                      '{phase="parse",le="10"} 2', lines)
+        self.assertIn('wordnet_graphql_phase_seconds_bucket'
+                      '{phase="parse",le="+Inf"} 3', lines)
+        self.assertIn('wordnet_graphql_phase_seconds_count'
+                      '{phase="parse"} 3', lines)
+
+    def test_execute(self):
+        registry = metrics.Metrics()
+        expected = wordnet_graphql.execute(self.query)
+        result = wordnet_graphql.execute(self.query, metrics=registry)
+        self.assertEqual(expected.data, result.data)
+        self.assertNotIn('tracing', result.extensions)
+        self.assertEqual(
+            1, registry.histogram('phase', 'execute').count)
+        self.assertEqual(
+            1, registry.histogram('resolver', 'Query.synset').count)
+        self.assertEqual(3, registry.histogram(
+            'resolver', 'LemmaNode.count').count)
+        self.assertEqual(3, registry.histogram(
+            'size', 'SynsetNode.lemmas').sum)
+
+    def test_trace(self):
+        query = self.query.replace('MetricsTest', 'MetricsTraceTest')
+        for run in (lambda: wordnet_graphql.execute(query, trace=True),
+                    lambda: asyncio.run(wordnet_graphql.execute_async(
+                        query, trace=True))):
+            tracing = run().extensions['tracing']
+            resolvers = {tuple(r['path']): r for r in tracing['resolvers']}
+            self.assertEqual('SynsetNode.hypernyms',
+                             resolvers[('synset', 'hypernyms')]['field'])
+            self.assertEqual(
+                2, resolvers[('synset', 'hypernyms')]['size'])
+            self.assertIn(('synset', 'lemmas', 2, 'count'), resolvers)
+            self.assertIn('execute', tracing['phases'])
+        # The document is cached after the first run.
+        self.assertNotIn('parse', tracing['phases'])
+
+    def test_server(self):
+        registry = metrics.Metrics()
+        app = server.GraphQLServer(metrics=registry)
+        body = json.dumps({'query': self.query,
+                           'extensions': {'trace': True}}).encode()
+        response = asyncio.run(app.handle('POST', '/graphql', {}, body))
+        self.assertIn('tracing', json.loads(response.body)['extensions'])
+        response = asyncio.run(app.handle('GET', '/metrics', {}, b''))
+        self.assertEqual(200, response.status)
+        text = response.body.decode()
+        self.assertIn('wordnet_graphql_phase_seconds_count'
+                      '{phase="serialize"} 1', text)
+        self.assertIn('wordnet_graphql_resolver_seconds_count'
+                      '{field="Query.synset"} 1', text)
+        response = asyncio.run(server.GraphQLServer().handle(
+            'GET', '/metrics', {}, b''))
+        self.assertEqual(404, response.status)
+
+
+class BatchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_graph())
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+    def test_batch_in_order(self):
+        operations = [
+            {'query': '''query TestQuery($name: String) {
+                synset(name: $name) {
+                    closure(relationshipName: "hypernyms") { name }
+                    wupSimilarity(otherSynsetName: "cat.n.01")
+                }
+            }''', 'variables': {'name': s.name()}}
+            for s in random.sample(all_synsets, NUM_RANDOM_TRIALS)]
+        operations += [
+            '{ synset(name: "not_a_word.n.01") { name } }',
+            '{ allSynsets(pos: "r") { name } }',
+            '{ synset(',
+        ]
+        expected = [batch.run_operation(o) for o in operations]
+        self.assertListEqual(
+            expected, batch.execute_batch(operations, processes=2))
+        self.assertIn('errors', expected[-3])
+        self.assertNotIn('data', expected[-1])
+
+    def test_persisted_query(self):
+        query = 'query TestQuery($name: String) { synset(name: $name) { name } }'
+        key = wordnet_graphql.documents.register(query)
+        operations = [{'queryHash': key, 'variables': {'name': name}}
+                      for name in ['dog.n.01', 'cat.n.01']]
+        results = batch.execute_batch(operations, processes=2)
+        self.assertListEqual(
+            ['dog.n.01', 'cat.n.01'],
+            [r['data']['synset']['name'] for r in results])
+
+
+class ServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sock, cls.stop = start_server(server.GraphQLServer())
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stop()
+
+    def setUp(self):
+        self.connection = http.client.HTTPConnection(
+            *self.sock.getsockname(), timeout=60)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def request(self, method, path, body=None, headers=None):
+        if body is not None and not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.connection.request(method, path, body, headers or {})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_post_and_batch(self):
+        query = '{ synset(name: "dog.n.01") { name definition } }'
+        response, body = self.request('POST', '/graphql', {'query': query})
+        self.assertEqual(200, response.status)
+        self.assertEqual(client.execute(query), json.loads(body))
+        # The same connection is reused for the batch.
+        operations = [
+            {'query': query},
+            {'query': 'query Q($n: String) { synset(name: $n) { name } }',
+             'variables': {'n': 'cat.n.01'}},
+            {'query': '{ synset(name: "cat.n.99") { name } }'},
+        ]
+        response, body = self.request('POST', '/graphql', operations)
+        self.assertEqual(200, response.status)
+        results = json.loads(body)
+        self.assertEqual(3, len(results))
+        self.assertEqual(client.execute(query), results[0])
+        self.assertEqual('cat.n.01', results[1]['data']['synset']['name'])
+        self.assertIn('errors', results[2])
+
+    def test_get_etag(self):
+        path = '/graphql?query=%7B%20synset(name%3A%20%22dog.n.01%22)' \
+               '%20%7B%20name%20%7D%20%7D'
+        response, body = self.request('GET', path)
+        self.assertEqual(200, response.status)
+        etag = response.getheader('ETag')
+        self.assertIsNotNone(etag)
+        self.assertIn('max-age', response.getheader('Cache-Control'))
+        response, body = self.request(
+            'GET', path, headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status)
+        self.assertEqual(b'', body)
+        for if_none_match in ['"other", W/' + etag, '*']:
+            response, body = self.request(
+                'GET', path, headers={'If-None-Match': if_none_match})
+            self.assertEqual(304, response.status)
+        for if_none_match in ['"x%sx"' % etag.strip('"'), etag[:-2] + '"']:
+            response, body = self.request(
+                'GET', path, headers={'If-None-Match': if_none_match})
+            self.assertEqual(200, response.status)
+
+    def test_get_persisted_query(self):
+        query = '{ synset(name: "dog.n.01") { name definition } }'
+        key = wordnet_graphql.documents.register(query)
+        response, body = self.request('GET', '/graphql?queryHash=' + key)
+        self.assertEqual(200, response.status)
+        self.assertEqual(client.execute(query), json.loads(body))
+        etag = response.getheader('ETag')
+        response, body = self.request(
+            'GET', '/graphql?queryHash=' + key,
+            headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status)
+        response, body = self.request('GET', '/graphql?queryHash=' + '0' * 64)
+        self.assertEqual(400, response.status)
+
+    def test_persisted_queries_flag(self):
+        query = '{ synset(name: "dog.n.01") { name definition } }'
+        get_snapshot()
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'dog.graphql'), 'w') as f:
+                f.write(query)
+            with socket.create_server(('127.0.0.1', 0)) as sock:
+                port = sock.getsockname()[1]
+            process = subprocess.Popen(
+                [sys.executable, 'server.py', '--port', str(port),
+                 '--workers', '1', '--persisted-queries', directory,
+                 '--snapshot',
+                 os.path.join(_snapshot_dir.name, 'wordnet.snapshot')],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL)
+            try:
+                deadline = time.monotonic() + 120
+                while True:
+                    try:
+                        socket.create_connection(('127.0.0.1', port)).close()
+                        break
+                    except ConnectionError:
+                        self.assertIsNone(process.poll())
+                        self.assertLess(time.monotonic(), deadline)
+                        time.sleep(0.5)
+                connection = http.client.HTTPConnection(
+                    '127.0.0.1', port, timeout=60)
+                connection.request('GET', '/graphql?queryHash=' +
+                                   document_cache.query_hash(query))
+                response = connection.getresponse()
+                self.assertEqual(200, response.status)
+                self.assertEqual(client.execute(query),
+                                 json.loads(response.read()))
+                connection.close()
+            finally:
+                process.terminate()
+                process.wait()
+
+    def test_compression(self):
+        query = '{ allSynsets(pos: "r") { name } }'
+        for encoding, decompress in (('gzip', gzip.decompress),
+                                     ('deflate', zlib.decompress)):
+            response, body = self.request(
+                'POST', '/graphql', {'query': query},
+                {'Accept-Encoding': encoding})
+            self.assertEqual(encoding, response.getheader('Content-Encoding'))
+            self.assertEqual(client.execute(query),
+                             json.loads(decompress(body)))
+        response, body = self.request('POST', '/graphql', {'query': query})
+        self.assertIsNone(response.getheader('Content-Encoding'))
+
+    def test_bad_requests(self):
+        response, _ = self.request('POST', '/graphql', b'{not json')
+        self.assertEqual(400, response.status)
+        response, _ = self.request('POST', '/graphql', {'query': '{ synset('})
+        self.assertEqual(400, response.status)
+        response, _ = self.request('GET', '/other')
+        self.assertEqual(404, response.status)
+        response, _ = self.request('PUT', '/graphql', b'')
+        self.assertEqual(405, response.status)
+        response, _ = self.request(
+            'POST', '/graphql', [{'query': '{ __typename }'}] * 101)
+        self.assertEqual(413, response.status)
+
+    def test_operation_errors(self):
+        query = 'query Q($n: String!) { synset(name: $n) { name } }'
+        response, body = self.request('POST', '/graphql', {'query': query})
+        self.assertEqual(400, response.status)
+        self.assertIn('"$n"', json.loads(body)['errors'][0]['message'])
+        response, body = self.request('POST', '/graphql', [
+            {'query': query},
+            {'query': query, 'variables': 'oops'},
+            {'query': query, 'variables': {'n': 'dog.n.01'}}])
+        self.assertEqual(200, response.status)
+        results = json.loads(body)
+        self.assertIn('errors', results[0])
+        self.assertIn('errors', results[1])
+        self.assertEqual('dog.n.01', results[2]['data']['synset']['name'])
+        response, body = self.request(
+            'POST', '/graphql', {'query': query, 'variables': 'oops'})
+        self.assertEqual(400, response.status)
+        response, body = self.request(
+            'GET', '/graphql?query=%s&variables=%%5B%%5D' % quote(query))
+        self.assertEqual(400, response.status)
+        # The connection is still usable.
+        response, body = self.request(
+            'POST', '/graphql', {'query': '{ __typename }'})
+        self.assertEqual(200, response.status)
+        # Anything else the operation raises is logged and a 500.
+        with self.assertLogs('server', 'ERROR'):
+            response = asyncio.run(server.GraphQLServer(
+                result_cache=object()).handle(
+                    'POST', '/graphql', {},
+                    json.dumps({'query': query}).encode()))
+        self.assertEqual(500, response.status)
+
+
+class GraphEngineTest(unittest.TestCase):
+
+    def test_relations_match_nltk(self, n=NUM_RANDOM_TRIALS * 10):
+        graph = get_graph()
+        for synset in permutation(all_synsets)[:n]:
+            for rel in wordnet_graph.SYNSET_RELATIONS:
+                self.assertListEqual(
+                    getattr(synset, rel)(), graph.related(synset, rel))
+            for lemma in synset.lemmas():
+                for rel in wordnet_graph.LEMMA_RELATIONS:
+                    self.assertListEqual(
+                        getattr(lemma, rel)(), graph.related(lemma, rel))
+
+
+def nltk_similarity(synset, other, metric, simulate_root):
+    try:
+        return getattr(synset, metric + '_similarity')(
+            other, simulate_root=simulate_root)
+    except WordNetError:
+        return None
+
+
+class SimilarityTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_graph())
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+    def test_depths_match_nltk(self, n=NUM_RANDOM_TRIALS * 10):
+        tree = taxonomy.Taxonomy(get_graph())
+        for synset in permutation(all_synsets)[:n]:
+            i = get_graph().synset_id(synset)
+            self.assertEqual(synset.min_depth(), tree.min_depth[i])
+            self.assertEqual(synset.max_depth(), tree.max_depth[i])
+
+    def test_similarity_matrix(self):
+        query = '''
+            query TestQuery($names: [String]!, $others: [String]!,
+                            $metric: SimilarityMetric, $root: Boolean) {
+                similarityMatrix(names: $names, others: $others,
+                                 metric: $metric, simulateRoot: $root)
+            }
+        '''
+        fixed = [wn.synset(n) for n in (
+            'dog.n.01', 'cat.n.01', 'entity.n.01', 'run.v.01',
+            'walk.v.01', 'good.a.01', 'quickly.r.01')]
+        for _ in range(NUM_RANDOM_TRIALS // 2):
+            rows = fixed[:2] + list(permutation(all_synsets)[:4])
+            others = fixed + list(permutation(all_synsets)[:5])
+            for metric in ('path', 'wup', 'lch'):
+                for simulate_root in (True, False):
+                    result = client.execute(query, variables={
+                        'names': [s.name() for s in rows],
+                        'others': [s.name() for s in others],
+                        'metric': metric.upper(),
+                        'root': simulate_root})
+                    self.assertNotIn('errors', result)
+                    expected = [
+                        nltk_similarity(s, o, metric, simulate_root)
+                        for s in rows for o in others]
+                    self.assertListEqual(
+                        expected, result['data']['similarityMatrix'])
+
+    def test_similarity_matrix_non_canonical_names(self):
+        result = client.execute('''
+            query TestQuery {
+                similarityMatrix(names: ["dog.n.01"], others: ["dog.n.1"])
+            }
+        ''')
+        self.assertListEqual([1.0], result['data']['similarityMatrix'])
+
+
+class NearestSynsetsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_graph())
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+    def test_nearest_synsets(self):
+        query = '''
+            query TestQuery($name: String!, $metric: NearestMetric,
+                            $pos: String) {
+                nearestSynsets(name: $name, metric: $metric, k: 5,
+                               pos: $pos) {
+                    synset {
+                        name
+                    }
+                    similarity
+                }
+            }
+        '''
+        engine = wordnet_graphql._similarity_engine()
+        scan = nearest.NearestSynsets(engine)
+        ic = information_content.load()
+        for name, metric, pos in [('dog.n.01', 'path', None),
+                                  ('run.v.01', 'lch', None),
+                                  ('run.v.01', 'wup', 'v'),
+                                  ('good.a.01', 'wup', 'a'),
+                                  ('breathe.v.01', 'res', None)]:
+            result = client.execute(query, variables={
+                'name': name, 'metric': metric.upper(), 'pos': pos})
+            self.assertNotIn('errors', result)
+            expected = scan.brute_force(
+                get_graph().synset_id_by_name(name), metric, 5, pos, ic=ic)
+            self.assertListEqual(
+                [(get_graph().synset_names[i], value)
+                 for i, value in expected],
+                [(n['synset']['name'], n['similarity'])
+                 for n in result['data']['nearestSynsets']])
+
+
+class ClosureTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_graph())
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+    def expected(self, names, relations, depth):
+        # The closure from a root above every start, as NLTK walks it.
+        starts = [wn.synset(name) for name in names]
+        rel = lambda s: (starts if s is None else
+                         [t for r in relations for t in getattr(s, r)()])
+        within = []
+        for d in range(1, depth + 1):
+            found = [s for s in acyclic_breadth_first(None, rel, d + 1)
+                     if s is not None and s not in starts]
+            within += [(s.name(), d) for s in found[len(within):]]
+        return within
+
+    def test_closure(self):
+        query = '''
+            query TestQuery($names: [String!]!, $relations: [String!]!,
+                            $depth: Int) {
+                closure(names: $names, relationshipNames: $relations,
+                        depth: $depth) {
+                    name
+                    distance
+                }
+            }
+        '''
+        for names, relations, depth in [
+                (['dog.n.01'], ['hypernyms'], 20),
+                (['dog.n.01', 'cat.n.01', 'dog.n.01'], ['hypernyms'], 20),
+                (['car.n.01', 'wheel.n.01'],
+                 ['part_meronyms', 'hypernyms'], 3),
+                (['entity.n.01'], ['hyponyms', 'instance_hyponyms'], 3)]:
+            result = client.execute(query, variables={
+                'names': names, 'relations': relations, 'depth': depth})
+            self.assertNotIn('errors', result)
+            self.assertListEqual(
+                self.expected(names, relations, depth),
+                [(s['name'], s['distance'])
+                 for s in result['data']['closure']])
+
+    def test_precomputed(self):
+        graph = get_graph()
+        engine = closure.ClosureEngine(graph)
+        precomputed = closure.ClosureEngine(graph)
+        precomputed.precompute()
+        for name in ['dog.n.01', 'entity.n.01', 'run.v.01', 'good.a.01']:
+            i = graph.synset_id_by_name(name)
+            for relation in closure.PRECOMPUTED_RELATIONS:
+                for depth in [-1, 0, 1, 4]:
+                    ids, distances = engine.closure([i], [relation], depth)
+                    cached = precomputed.closure([i], [relation], depth)
+                    self.assertListEqual(ids.tolist(), cached[0].tolist())
+                    self.assertListEqual(distances.tolist(),
+                                         cached[1].tolist())
+
+
+class LookaheadTest(unittest.TestCase):
+
+    index_queries = [
+        '''{ allSynsets(pos: "r") { name pos offset lemmaNames
+            pertainyms { name } lemmas { name pertainyms { name }
+            antonyms { name synset { name } } } } }''',
+        '''fragment Names on SynsetNode { name lemmaNames }
+        { synset(name: "dog.n.01") { __typename ...Names
+            hypernyms { ... on SynsetNode { ...Names } } } }''',
+        '''{ allSynsetsConnection(first: 5, after: "YXJyYXljb25uZWN0aW9uOjQwMDAw")
+            { totalCount edges { cursor node { name hyponyms { name } } } } }''',
+        '''{ closure(names: ["dog.n.01"], relationshipNames: ["hypernyms"])
+            { name distance synset { offset } } }''',
+        '''{ synsetsForWords(words: ["geese", "ran"]) { name pos } }''',
+    ]
+    mixed_queries = [
+        '{ allSynsets(pos: "r") { name definition } }',
+        '''{ synset(name: "dog.n.01") { name hypernyms { name examples
+            lemmas { name count } } } }''',
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.expected = [client.execute(q)
+                        for q in cls.index_queries + cls.mixed_queries]
+        cls.graph = get_graph()
+        cls.lexicon = getattr(cls.graph, 'lexicon', None)
+        cls.graph.lexicon = None
+        wordnet_graphql.enable_graph_engine(cls.graph)
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+        cls.graph.lexicon = cls.lexicon
+
+    def test_index_only(self):
+        def load(i):
+            raise AssertionError('synset %d loaded' % i)
+        self.graph.synset = load
+        try:
+            for query, expected in zip(self.index_queries, self.expected):
+                self.assertEqual(expected, client.execute(query))
+        finally:
+            del self.graph.synset
+
+    def test_fields_needing_nltk(self):
+        for query, expected in zip(self.mixed_queries,
+                                   self.expected[len(self.index_queries):]):
+            self.assertEqual(expected, client.execute(query))
+            # Served from the nodes interned by the first run.
+            self.assertEqual(expected, client.execute(query))
+
+
+class SynsetsQueryTest(unittest.TestCase):
+
+    words = ['dog', 'dogs', 'geese', 'ran', 'running', 'better', 'Best',
+             'New_York', 'quickly', 'xyzzy']
+
+    def test_synsets(self):
+        query = '''
+            query TestQuery($word: String!, $pos: String) {
+                synsets(word: $word, pos: $pos) {
+                    name
+                }
+            }
+        '''
+        for word in self.words:
+            for pos in [None, 'n', 'v', 'a', 's', 'r', 'nv']:
+                result = client.execute(query, variables={
+                    'word': word, 'pos': pos})
+                self.assertNotIn('errors', result)
+                self.assertListEqual(
+                    [s.name() for s in wn.synsets(word, pos)],
+                    [s['name'] for s in result['data']['synsets']])
+
+    def test_synsets_for_words(self):
+        query = '''
+            query TestQuery($words: [String!]!, $pos: String) {
+                synsetsForWords(words: $words, pos: $pos) {
+                    name
+                }
+            }
+        '''
+        words = self.words * 3
+        for pos in [None, 'v']:
+            result = client.execute(query, variables={
+                'words': words, 'pos': pos})
+            self.assertNotIn('errors', result)
+            self.assertListEqual(
+                [[s.name() for s in wn.synsets(word, pos)] for word in words],
+                [[s['name'] for s in synsets]
+                 for synsets in result['data']['synsetsForWords']])
+
+    def test_unknown_pos(self):
+        result = client.execute('{ synsets(word: "dog", pos: "x") { name } }')
+        self.assertIn('errors', result)
+
+
+class GraphEngineSynsetsQueryTest(SynsetsQueryTest):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_graph())
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+
+class LemmaSearchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_snapshot().graph)
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+    def lemmas(self, pos=None):
+        graph = get_snapshot().graph
+        synsets = set(graph.positions.select(pos).tolist())
+        return [(lemma_search.normalize(name), i)
+                for i, name in enumerate(graph.lemma_names)
+                if graph.lemma_synsets[i] in synsets]
+
+    def test_search_lemmas(self):
+        query = '''
+            query TestQuery($prefix: String!, $pos: String) {
+                searchLemmas(prefix: $prefix, pos: $pos, limit: 20) {
+                    key
+                    count
+                }
+            }
+        '''
+        counts = get_snapshot().graph.lexicon.counts
+        keys = get_snapshot().graph.lexicon.keys
+        for prefix, pos in [('dog', None), ('Run', 'v'), ('new y', None),
+                            ('a', 'a'), ('zzzz', None)]:
+            result = client.execute(query, variables={
+                'prefix': prefix, 'pos': pos})
+            self.assertNotIn('errors', result)
+            prefix = lemma_search.normalize(prefix)
+            expected = sorted(
+                (-int(counts[i]), name, i) for name, i in self.lemmas(pos)
+                if name.startswith(prefix))[:20]
+            self.assertListEqual(
+                [{'key': keys[i], 'count': -count}
+                 for count, _, i in expected],
+                result['data']['searchLemmas'])
+
+    def test_fuzzy_lemmas(self):
+        query = '''
+            query TestQuery($term: String!, $maxEdits: Int) {
+                fuzzyLemmas(term: $term, maxEdits: $maxEdits, limit: 1000) {
+                    key
+                }
+            }
+        '''
+        index = wordnet_graphql._lemma_index()
+        keys = get_snapshot().graph.lexicon.keys
+        for term, max_edits in [('dgo', 1), ('elephent', 1),
+                                ('recieve', 2), ('a', 0), ('', 1)]:
+            result = client.execute(query, variables={
+                'term': term, 'maxEdits': max_edits})
+            self.assertNotIn('errors', result)
+            expected = {
+                keys[i] for name, i in self.lemmas()
+                if abs(len(name) - len(term)) <= max_edits
+                and edit_distance(name, term) <= max_edits}
+            self.assertSetEqual(
+                expected,
+                {l['key'] for l in result['data']['fuzzyLemmas']})
+            ids = index.fuzzy(term, max_edits, 1000)
+            ranks = [(edit_distance(index.names[i], term),
+                      -int(index.counts[i])) for i in ids]
+            self.assertListEqual(sorted(ranks), ranks)
+
+    def test_limits(self):
+        for query in ['{ searchLemmas(prefix: "a", limit: 1001) { name } }',
+                      '{ fuzzyLemmas(term: "a", limit: -1) { name } }',
+                      '{ fuzzyLemmas(term: "a", maxEdits: 3) { name } }']:
+            self.assertIn('errors', client.execute(query))
+
+
+class SubsumptionTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_graph())
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+    def random_pairs(self, n):
+        pairs = []
+        for synset in permutation(all_synsets)[:n]:
+            hypernyms = list(synset.closure(
+                lambda s: s.hypernyms() + s.instance_hypernyms()))
+            pairs.append((synset, random.choice(hypernyms or [synset])))
+            pairs.append((synset, random.choice(all_synsets)))
+        return pairs
+
+    def test_is_hyponym_of(self, n=NUM_RANDOM_TRIALS):
+        query = '''
+            query TestQuery($name: String, $other: String) {
+                synset(name: $name) {
+                    isHyponymOf(otherSynsetName: $other)
+                    commonHypernyms(otherSynsetName: $other) {
+                        name
+                    }
+                    lowestCommonHypernyms(otherSynsetName: $other) {
+                        name
+                    }
+                }
+            }
+        '''
+        for synset, other in self.random_pairs(n):
+            result = client.execute(query, variables={
+                'name': synset.name(), 'other': other.name()})
+            data = result['data']['synset']
+            hypernyms = set(synset.closure(
+                lambda s: s.hypernyms() + s.instance_hypernyms()))
+            self.assertEqual(other in hypernyms, data['isHyponymOf'])
+            self.assertListEqual(
+                sorted(s.name() for s in synset.common_hypernyms(other)),
+                sorted(s['name'] for s in data['commonHypernyms']))
+            self.assertListEqual(
+                [s.name() for s in synset.lowest_common_hypernyms(other)],
+                [s['name'] for s in data['lowestCommonHypernyms']])
+
+    def test_subsumes(self, n=NUM_RANDOM_TRIALS * 10):
+        pairs = self.random_pairs(n)
+        result = client.execute('''
+            query TestQuery($pairs: [SubsumptionPair]!) {
+                subsumes(pairs: $pairs)
+            }
+        ''', variables={'pairs': [
+            {'hypernym': other.name(), 'hyponym': synset.name()}
+            for synset, other in pairs]})
+        expected = [
+            other in set(synset.closure(
+                lambda s: s.hypernyms() + s.instance_hypernyms()))
+            for synset, other in pairs]
+        self.assertListEqual(expected, result['data']['subsumes'])
+
+
+class HypernymPathsTest(unittest.TestCase):
+
+    query = '''
+        query TestQuery($name: String) {
+            synset(name: $name) {
+                hypernymPaths {
+                    name
+                }
+                hypernymPathIndex {
+                    synsets {
+                        name
+                    }
+                    paths
+                }
+                hypernymDistances(simulateRoot: true) {
+                    name
+                    distance
+                }
+            }
+        }
+    '''
+
+    def check(self, synset):
+        result = client.execute(self.query, variables={'name': synset.name()})
+        self.assertNotIn('errors', result)
+        data = result['data']['synset']
+        paths = [[s.name() for s in path] for path in synset.hypernym_paths()]
+        self.assertListEqual(
+            paths, [[s['name'] for s in path] for path in data['hypernymPaths']])
+        index = data['hypernymPathIndex']
+        names = [s['name'] for s in index['synsets']]
+        self.assertEqual(len(set(names)), len(names))
+        self.assertListEqual(
+            paths, [[names[i] for i in path] for path in index['paths']])
+        self.assertSetEqual(
+            {(s.name(), d) for s, d in synset.hypernym_distances(
+                simulate_root=True)},
+            {(d['name'], d['distance']) for d in data['hypernymDistances']})
+
+    def test_hypernym_paths(self, n=NUM_RANDOM_TRIALS):
+        synsets = [wn.synset('person.n.01'), wn.synset('run.v.01')]
+        for synset in synsets + list(permutation(all_synsets)[:n]):
+            self.check(synset)
+
+
+class GraphEngineHypernymPathsTest(HypernymPathsTest):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_graph())
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+
+class InformationContentTest(unittest.TestCase):
+
+    def test_compiled_table(self, name='ic-semcor.dat'):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = information_content.compile_ic(name, cache_dir)
+            table = information_content.InformationContent.open(path)
+            self.assertTrue(os.path.exists(path))
+            self.assertEqual(path, information_content.compile_ic(
+                name, cache_dir))
+        expected = information_content.table_from_dict(wordnet_ic.ic(name))
+        self.assertListEqual(expected.tolist(), table.table.tolist())
+
+    def test_ic_similarity(self, n=NUM_RANDOM_TRIALS):
+        query = '''
+            query TestQuery($name: String, $other: String, $ic: String) {
+                synset(name: $name) {
+                    resSimilarity(otherSynsetName: $other, ic: $ic)
+                    jcnSimilarity(otherSynsetName: $other, ic: $ic)
+                    linSimilarity(otherSynsetName: $other, ic: $ic)
+                }
+            }
+        '''
+        for ic_name in ('ic-brown.dat', 'ic-semcor.dat'):
+            ic = wordnet_ic.ic(ic_name)
+            for pos in ('n', 'v'):
+                synsets = list(wn.all_synsets(pos))
+                pairs = [(s, s) for s in random.sample(synsets, 2)]
+                pairs += zip(random.sample(synsets, n),
+                             random.sample(synsets, n))
+                for synset, other in pairs:
+                    result = client.execute(query, variables={
+                        'name': synset.name(),
+                        'other': other.name(),
+                        'ic': ic_name})
+                    self.assertNotIn('errors', result)
+                    data = result['data']['synset']
+                    self.assertEqual(
+                        synset.res_similarity(other, ic),
+                        data['resSimilarity'])
+                    self.assertEqual(
+                        synset.jcn_similarity(other, ic),
+                        data['jcnSimilarity'])
+                    self.assertEqual(
+                        synset.lin_similarity(other, ic),
+                        data['linSimilarity'])
+
+    def test_ic_unsupported_pos(self):
+        result = client.execute('''
+            query TestQuery {
+                synset(name: "good.a.01") {
+                    resSimilarity(otherSynsetName: "bad.a.01")
+                }
+            }
+        ''')
+        self.assertIn('errors', result)
+        self.assertIsNone(result['data']['synset']['resSimilarity'])
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def test_graph_matches(self):
+        graph = get_graph()
+        loaded = get_snapshot().graph
+        self.assertEqual(len(graph), len(loaded))
+        self.assertListEqual(list(graph.synset_names),
+                             list(loaded.synset_names))
+        self.assertListEqual(list(graph.lemma_names),
+                             list(loaded.lemma_names))
+        self.assertListEqual(graph.synset_offsets.tolist(),
+                             loaded.synset_offsets.tolist())
+        for rel in wordnet_graph.SYNSET_RELATIONS:
+            self.assertListEqual(
+                graph.synset_relations[rel].indices.tolist(),
+                loaded.synset_relations[rel].indices.tolist())
+        for synset in random.sample(all_synsets, NUM_RANDOM_TRIALS):
+            self.assertEqual(graph.synset_id(synset),
+                             loaded.synset_id_by_name(synset.name()))
+        with self.assertRaises(KeyError):
+            loaded.synset_id_by_name('not.n.01')
+
+    def test_reader_matches(self):
+        reader = get_snapshot().reader(getattr(wn, '_omw_reader', None))
+        words = ['dog', 'geese', 'running', 'better', 'New_York', 'unknown1']
+        words += [l.name() for s in random.sample(all_synsets, 20)
+                  for l in s.lemmas()]
+        for word in words:
+            self.assertListEqual(wn.synsets(word), reader.synsets(word))
+            for pos in 'nvar':
+                self.assertEqual(wn.morphy(word, pos),
+                                 reader.morphy(word, pos))
+        for synset in random.sample(all_synsets, NUM_RANDOM_TRIALS):
+            self.assertEqual(synset, reader.synset(synset.name()))
+        self.assertListEqual(list(wn.all_lemma_names('a')),
+                             list(reader.all_lemma_names('a')))
+
+    def test_lexicon_matches(self, n=NUM_RANDOM_TRIALS * 10):
+        graph = get_snapshot().graph
+        synset_fields = ('name', 'pos', 'offset', 'definition', 'examples',
+                         'lexname', 'frame_ids', 'lemma_names')
+        lemma_fields = ('name', 'key', 'count', 'syntactic_marker', 'lang',
+                        'frame_ids', 'frame_strings')
+        synsets = random.sample(all_synsets, n)
+        synsets += [wn.synset('run.v.01'), wn.synset('galore.s.01')]
+        for synset in synsets:
+            handle = graph.lexicon.synset(graph.synset_id(synset))
+            for field in synset_fields:
+                self.assertEqual(getattr(synset, field)(),
+                                 getattr(handle, field)())
+            self.assertEqual(synset, handle.load())
+            for lemma, lemma_handle in zip(synset.lemmas(), handle.lemmas()):
+                for field in lemma_fields:
+                    self.assertEqual(getattr(lemma, field)(),
+                                     getattr(lemma_handle, field)())
+                self.assertEqual(lemma, lemma_handle.load())
+
+    def test_rejects_other_files(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(b'not a snapshot' * 10)
+            f.flush()
+            with self.assertRaises(snapshot.SnapshotError):
+                snapshot.Snapshot.open(f.name)
+
+
+class ExportTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = wordnet_graphql.enable_graph_engine(get_snapshot().graph)
+        cls.lexicon = cls.graph.lexicon
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+    def records(self, chunks):
+        return [json.loads(line)
+                for chunk in chunks for line in chunk.splitlines()]
+
+    def test_records_match_nltk(self):
+        synsets = self.records(export.export(self.lexicon, ['synsets']))
+        lemmas = self.records(export.export(self.lexicon, ['lemmas']))
+        self.assertEqual(len(all_synsets), len(synsets))
+        self.assertEqual(len(self.graph.lemma_names), len(lemmas))
+        for synset in random.sample(all_synsets, NUM_RANDOM_TRIALS * 10):
+            record = synsets[self.graph.synset_id(synset)]
+            self.assertEqual('synset', record['type'])
+            self.assertEqual(synset.name(), record['name'])
+            self.assertEqual(synset.offset(), record['offset'])
+            self.assertEqual(synset.lexname(), record['lexname'])
+            self.assertEqual(synset.definition(), record['definition'])
+            self.assertListEqual(synset.examples(), record['examples'])
+            for lemma in synset.lemmas():
+                record = lemmas[self.graph.lemma_id(lemma)]
+                self.assertEqual(lemma.name(), record['name'])
+                self.assertEqual(synset.name(),
+                                 synsets[record['synset']]['name'])
+                self.assertEqual(lemma.key(), record['key'])
+                self.assertEqual(lemma.count(), record['count'])
+                self.assertEqual(lemma.syntactic_marker(),
+                                 record['syntacticMarker'])
+                self.assertListEqual(lemma.frame_ids(), record['frameIds'])
+
+    def test_edges_match_nltk(self):
+        synset_edges, lemma_edges = {}, {}
+        for record in self.records(
+                export.export(self.lexicon, ['edges'], chunk_records=500)):
+            edges = (synset_edges if record['type'] == 'synset_edge'
+                     else lemma_edges)
+            edges.setdefault((record['source'], record['relation']),
+                             []).append(record['target'])
+        self.assertEqual(
+            sum(len(a.indices) for a in self.graph.synset_relations.values()),
+            sum(map(len, synset_edges.values())))
+        self.assertSetEqual(set(wordnet_graph.LEMMA_RELATIONS),
+                            set(self.graph.lemma_relations))
+        for synset in random.sample(all_synsets, NUM_RANDOM_TRIALS * 10):
+            i = self.graph.synset_id(synset)
+            for rel in wordnet_graph.SYNSET_RELATIONS:
+                self.assertListEqual(
+                    getattr(synset, rel)(),
+                    self.graph.synsets(synset_edges.get((i, rel), [])))
+            for lemma in synset.lemmas():
+                j = self.graph.lemma_id(lemma)
+                for rel in wordnet_graph.LEMMA_RELATIONS:
+                    self.assertListEqual(
+                        getattr(lemma, rel)(),
+                        self.graph.lemmas(lemma_edges.get((j, rel), [])))
+
+    def test_unknown_records(self):
+        with self.assertRaises(ValueError):
+            export.export(self.lexicon, ['synsets', 'glosses'])
+
+    def test_string_table_slices(self):
+        strings = ['dog', 'caf\xe9', '', 'na\xefve', 'cat']
+        table = lexicon.StringTable(
+            **lexicon.StringTable.arrays(strings))
+        self.assertListEqual(strings, table[:])
+        self.assertListEqual(strings[1:4], table[1:4])
+        self.assertListEqual(strings[::2], table[::2])
+        self.assertListEqual(['cat', 'dog'], table.take([4, 0]))
+        table = lexicon.StringTable(**lexicon.StringTable.arrays(
+            ['a', 'bc', 'def']))
+        self.assertListEqual(['bc', 'def'], table[1:])
+
+    def test_server(self):
+        sock, stop = start_server(server.GraphQLServer(export_path='/export'))
+        connection = http.client.HTTPConnection(
+            *sock.getsockname(), timeout=60)
+        try:
+            connection.request('GET', '/export?records=lemmas,synsets',
+                               headers={'Accept-Encoding': 'gzip'})
+            response = connection.getresponse()
+            self.assertEqual(200, response.status)
+            self.assertEqual('chunked',
+                             response.getheader('Transfer-Encoding'))
+            self.assertEqual('gzip', response.getheader('Content-Encoding'))
+            lines = gzip.decompress(response.read()).splitlines()
+            self.assertEqual(
+                len(all_synsets) + len(self.graph.lemma_names), len(lines))
+            self.assertEqual('synset', json.loads(lines[0])['type'])
+            self.assertEqual('lemma', json.loads(lines[-1])['type'])
+            # The connection is kept alive after a chunked response.
+            connection.request('GET', '/export?records=nouns')
+            response = connection.getresponse()
+            self.assertEqual(400, response.status)
+            response.read()
+        finally:
+            connection.close()
+            stop()
+        response = asyncio.run(server.GraphQLServer().handle(
+            'GET', '/export', {}, b''))
+        self.assertEqual(404, response.status)
+
+
+class SnapshotSynsetTest(SynsetTest):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_snapshot().graph)
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+
+class SnapshotLemmaTest(LemmaTest):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_snapshot().graph)
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+
+class GraphEngineSynsetTest(SynsetTest):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_graph())
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+
+class GraphEngineLemmaTest(LemmaTest):
+
+    @classmethod
+    def setUpClass(cls):
+        wordnet_graphql.enable_graph_engine(get_graph())
+
+    @classmethod
+    def tearDownClass(cls):
+        wordnet_graphql.disable_graph_engine()
+
+
 print('Running Tests...')
 unittest.main()
@@ -0,0 +1,313 @@
+from nltk.corpus import wordnet as wn
+from nltk.corpus.reader.wordnet import Synset, Lemma
+from typing import Dict, List, Mapping, Sequence
+
+import numpy as np
+
+
+SYNSET_RELATIONS = (
+    "hypernyms",
+    "instance_hypernyms",
+    "hyponyms",
+    "instance_hyponyms",
+    "member_holonyms",
+    "substance_holonyms",
+    "part_holonyms",
+    "member_meronyms",
+    "substance_meronyms",
+    "part_meronyms",
+    "topic_domains",
+    "in_topic_domains",
+    "region_domains",
+    "in_region_domains",
+    "usage_domains",
+    "in_usage_domains",
+    "attributes",
+    "entailments",
+    "causes",
+    "also_sees",
+    "verb_groups",
+    "similar_tos",
+)
+
+LEMMA_RELATIONS = SYNSET_RELATIONS + (
+    "antonyms",
+    "derivationally_related_forms",
+    "pertainyms",
+)
+
+# Data files in the order wn.all_synsets() reads them.
+DATA_FILES = (("a", "data.adj"), ("r", "data.adv"),
+              ("n", "data.noun"), ("v", "data.verb"))
+
+
+class SynsetPositions:
+    """
+    The (pos, offset) of every synset in wn.all_synsets() order. Positions
+    for a part of speech are a contiguous numbering, so the synset at any
+    position can be loaded directly, without walking the ones before it.
+    """
+
+    def __init__(self, pos: np.ndarray, offsets: np.ndarray):
+        self.pos = pos
+        self.offsets = offsets
+        self._selections = {}
+
+    @classmethod
+    def scan(cls, wordnet=wn) -> "SynsetPositions":
+        """
+        Reads only the offset and synset type columns of the data files,
+        which is much cheaper than parsing every synset.
+        """
+        pos, offsets = [], []
+        for _, fileid in DATA_FILES:
+            with open(wordnet.abspath(fileid), "rb") as data_file:
+                for line in data_file:
+                    if line[:1].isspace():
+                        continue
+                    fields = line.split(b" ", 3)
+                    offsets.append(int(fields[0]))
+                    pos.append(fields[2])
+        return cls(np.array(pos, dtype="S1"),
+                   np.array(offsets, dtype=np.uint32))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def select(self, pos: str = None) -> np.ndarray:
+        """
+        Ids of the synsets wn.all_synsets(pos) yields, in the same order.
+        As in NLTK, "a" includes adjective satellites.
+        """
+        if pos not in self._selections:
+            if pos is None:
+                ids = np.arange(len(self.offsets), dtype=np.int32)
+            elif pos == "a":
+                ids = np.flatnonzero(
+                    (self.pos == b"a") | (self.pos == b"s"))
+            else:
+                ids = np.flatnonzero(self.pos == pos.encode())
+            self._selections[pos] = ids.astype(np.int32)
+        return self._selections[pos]
+
+    def synset(self, i: int) -> Synset:
+        return wn.synset_from_pos_and_offset(
+            self.pos[i].decode(), int(self.offsets[i]))
+
+
+class Adjacency:
+    """
+    Compressed sparse row adjacency for a single relation: the targets of
+    node i are indices[indptr[i]:indptr[i + 1]].
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+
+    def __getattr__(self, name: str):
+        # Per-edge lookups happen once per resolved field, where slicing
+        # plain lists is several times cheaper than slicing numpy arrays.
+        # The lists are made on first use, so that mapped arrays are not
+        # copied for relations nothing asks for.
+        if name in ("_indptr", "_indices"):
+            value = getattr(self, name[1:]).tolist()
+            setattr(self, name, value)
+            return value
+        raise AttributeError(name)
+
+    @classmethod
+    def from_lists(cls, lists: Sequence[Sequence[int]]) -> "Adjacency":
+        indptr = np.zeros(len(lists) + 1, dtype=np.int32)
+        np.cumsum([len(l) for l in lists], out=indptr[1:])
+        indices = np.fromiter(
+            (j for l in lists for j in l),
+            dtype=np.int32,
+            count=int(indptr[-1]))
+        return cls(indptr, indices)
+
+    def neighbors(self, i: int) -> List[int]:
+        return self._indices[self._indptr[i]:self._indptr[i + 1]]
+
+    def degree(self, i: int) -> int:
+        return self._indptr[i + 1] - self._indptr[i]
+
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def transpose(self) -> "Adjacency":
+        """
+        The reversed relation, with the sources of each target in order.
+        """
+        n = len(self.indptr) - 1
+        sources = np.repeat(np.arange(n, dtype=np.int32), self.degrees())
+        order = np.argsort(self.indices, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(self.indices, minlength=n), out=indptr[1:])
+        return Adjacency(indptr, sources[order])
+
+    @classmethod
+    def union(cls, adjacencies: Sequence["Adjacency"]) -> "Adjacency":
+        """
+        Per node, the targets of each adjacency in turn, as NLTK's
+        s.hypernyms() + s.instance_hypernyms().
+        """
+        n = len(adjacencies[0].indptr) - 1
+        return cls.from_lists([
+            [j for a in adjacencies for j in a.neighbors(i)]
+            for i in range(n)])
+
+
+class WordNetGraph:
+    """
+    Integer indexed, array backed copy of every WordNet pointer relation.
+
+    Synsets are numbered in wn.all_synsets() order and lemmas in synset
+    order, so the lemmas of synset i are the contiguous range
+    synset_lemmas.neighbors(i). Each relation is stored as an Adjacency
+    built from the NLTK relation methods themselves, which keeps the
+    ordering of related objects identical to NLTK.
+    """
+
+    def __init__(self,
+                 synset_names: Sequence[str],
+                 synset_pos: np.ndarray,
+                 synset_offsets: np.ndarray,
+                 synset_relations: Dict[str, Adjacency],
+                 lemma_names: Sequence[str],
+                 lemma_synsets: np.ndarray,
+                 lemma_relations: Dict[str, Adjacency],
+                 synsets: List[Synset] = None,
+                 synset_ids: Mapping[str, int] = None):
+        self.synset_names = synset_names
+        self.synset_pos = synset_pos
+        self.synset_offsets = synset_offsets
+        self.synset_relations = synset_relations
+        self.lemma_names = lemma_names
+        self.lemma_synsets = lemma_synsets
+        self.lemma_relations = lemma_relations
+        self.synset_lemmas = Adjacency(
+            np.searchsorted(
+                lemma_synsets,
+                np.arange(len(synset_names) + 1)).astype(np.int32),
+            np.arange(len(lemma_names), dtype=np.int32))
+        self.positions = SynsetPositions(synset_pos, synset_offsets)
+        if synset_ids is None:
+            synset_ids = {n: i for i, n in enumerate(synset_names)}
+        self._synset_ids = synset_ids
+        self._synsets = synsets or [None] * len(synset_names)
+        self._lemma_ids = {}
+        self._offsets = {}
+
+    @classmethod
+    def build(cls, wordnet=wn) -> "WordNetGraph":
+        synsets = list(wordnet.all_synsets())
+        synset_ids = {s._name: i for i, s in enumerate(synsets)}
+        lemmas = [l for s in synsets for l in s._lemmas]
+        lemma_ids = {}
+        for i, l in enumerate(lemmas):
+            lemma_ids[(synset_ids[l._synset._name], l._name)] = i
+
+        synset_relations = {}
+        for rel in SYNSET_RELATIONS:
+            synset_relations[rel] = Adjacency.from_lists([
+                [synset_ids[t._name] for t in getattr(s, rel)()]
+                for s in synsets])
+
+        lemma_relations = {}
+        for rel in LEMMA_RELATIONS:
+            lemma_relations[rel] = Adjacency.from_lists([
+                [lemma_ids[(synset_ids[t._synset._name], t._name)]
+                 for t in getattr(l, rel)()]
+                for l in lemmas])
+
+        return cls(
+            synset_names=[s._name for s in synsets],
+            synset_pos=np.array([s._pos for s in synsets], dtype="S1"),
+            synset_offsets=np.array(
+                [s._offset for s in synsets], dtype=np.uint32),
+            synset_relations=synset_relations,
+            lemma_names=[l._name for l in lemmas],
+            lemma_synsets=np.array(
+                [synset_ids[l._synset._name] for l in lemmas],
+                dtype=np.int32),
+            lemma_relations=lemma_relations,
+            synsets=synsets)
+
+    def __len__(self):
+        return len(self.synset_names)
+
+    def synset_id(self, synset: Synset) -> int:
+        return self._synset_ids[synset._name]
+
+    def synset_id_by_name(self, name: str) -> int:
+        return self._synset_ids[name]
+
+    def synset_id_by_offset(self, pos: str, offset: int) -> int:
+        """
+        The synset at offset in the data file of pos, as in
+        wn.synset_from_pos_and_offset(): "a" also finds satellites.
+        """
+        ids = self.positions.select(pos)
+        offsets = self._offsets.get(pos)
+        if offsets is None:
+            # Each data file is in offset order.
+            offsets = self._offsets[pos] = self.synset_offsets[ids]
+        k = int(np.searchsorted(offsets, offset))
+        if k == len(offsets) or offsets[k] != offset:
+            raise KeyError((pos, offset))
+        return int(ids[k])
+
+    def lemma_id(self, lemma: Lemma) -> int:
+        key = (lemma._synset._name, lemma._name)
+        try:
+            return self._lemma_ids[key]
+        except KeyError:
+            pass
+        for j in self.synset_lemmas.neighbors(self._synset_ids[key[0]]):
+            if self.lemma_names[j] == lemma._name:
+                self._lemma_ids[key] = j
+                return j
+        raise KeyError(lemma)
+
+    def synset(self, i: int) -> Synset:
+        synset = self._synsets[i]
+        if synset is None:
+            synset = self.positions.synset(i)
+            self._synsets[i] = synset
+        return synset
+
+    def lemma(self, i: int) -> Lemma:
+        synset_id = int(self.lemma_synsets[i])
+        k = i - int(self.synset_lemmas.indptr[synset_id])
+        return self.synset(synset_id)._lemmas[k]
+
+    def synsets(self, ids: List[int]) -> List[Synset]:
+        synsets = self._synsets
+        result = [synsets[i] for i in ids]
+        if None in result:
+            result = [self.synset(i) for i in ids]
+        return result
+
+    def lemmas(self, ids: List[int]) -> List[Lemma]:
+        return [self.lemma(i) for i in ids]
+
+    def related(self, wordnet_obj, relation: str) -> list:
+        """
+        Equivalent of getattr(wordnet_obj, relation)() for a Synset or
+        Lemma, served from the adjacency arrays.
+        """
+        if isinstance(wordnet_obj, Synset):
+            adjacency = self.synset_relations[relation]
+            i = self._synset_ids[wordnet_obj._name]
+        else:
+            adjacency = self.lemma_relations[relation]
+            i = self.lemma_id(wordnet_obj)
+        start = adjacency._indptr[i]
+        end = adjacency._indptr[i + 1]
+        if start == end:
+            return []
+        ids = adjacency._indices[start:end]
+        if isinstance(wordnet_obj, Synset):
+            return self.synsets(ids)
+        return self.lemmas(ids)
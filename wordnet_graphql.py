@@ -2,18 +2,557 @@
 
 from nltk.corpus import wordnet as wn
 from nltk.corpus.reader.wordnet import Synset, Lemma, _WordNetObject
-from typing import List, Optional
+from typing import List, Optional, Sequence
 from enum import Enum
+from collections import OrderedDict
 
 import graphene
 from graphene.test import Client
+from graphql import GraphQLError
+from graphql.error import format_error
+from graphql.execution import ExecutionResult, execute as execute_document
+from graphql_relay.connection.arrayconnection import (
+    get_offset_with_default, offset_to_cursor)
+from graphql.execution.executors.asyncio import AsyncioExecutor
+from graphql.execution.middleware import MiddlewareManager
+from graphql.language import ast
+from graphene.utils.str_converters import to_snake_case
 from pprint import pprint
+from promise import Promise
+import asyncio
+import concurrent.futures
+import json
+import os
+import threading
+import time
+import types
+import warnings
+
+import information_content
+import snapshot
+from closure import (
+    PRECOMPUTED_RELATIONS, ClosureEngine, breadth_first, check_relations)
+from document_cache import DocumentCache
+from json_executor import RawJSON, execute_json
+from lemma_search import MAX_EDITS, LemmaSearch
+from lexicon import (
+    GraphColumns, IndexLemmaHandle, IndexSynsetHandle, LemmaHandle, Lexicon,
+    SynsetHandle)
+from loaders import Loaders
+from metrics import Metrics, RequestTimer, timed
+from morphology import Morphology
+from nearest import NearestSynsets
+from node_cache import NodeCache
+from result_cache import ResultCache, partial_document
+from similarity import SimilarityEngine
+from taxonomy import HypernymPaths, IntervalIndex, Taxonomy
+from query_cost import (
+    CostCounter, CostEstimator, CostLimits, CostThrottle, FanoutWeights,
+    QueryCostError, WORDNET_WEIGHTS)
+from wordnet_graph import LEMMA_RELATIONS, SynsetPositions, WordNetGraph
+
+# When set, relation fields are served from this precomputed graph instead
+# of NLTK's per-synset pointer lookups. See enable_graph_engine().
+_graph = None  # type: Optional[WordNetGraph]
+
+# Scanned on first use when there is no graph to take positions from.
+_positions = None  # type: Optional[SynsetPositions]
+
+# Built from the graph on first use, see _taxonomy().
+_similarity = None  # type: Optional[SimilarityEngine]
+_intervals = None  # type: Optional[IntervalIndex]
+_paths = None  # type: Optional[HypernymPaths]
+_lemma_search = None  # type: Optional[LemmaSearch]
+_morphology = None  # type: Optional[Morphology]
+_closures = None  # type: Optional[ClosureEngine]
+
+# Guards the lazily built graph structures shared by all requests.
+_build_lock = threading.RLock()
+
+# Runs the resolvers that hand work off in execute_async(); see
+# set_thread_pool().
+_thread_pool = None  # type: Optional[concurrent.futures.ThreadPoolExecutor]
+THREAD_POOL_SIZE = min(4, os.cpu_count() or 1)
+
+# NLTK's reader seeks and reads shared file objects, so reads are
+# serialized once resolvers run on several threads.
+_reader_lock = threading.RLock()
+
+# Nodes of the synsets and lemmas resolved recently, shared by every
+# field and request that reaches them. See _node().
+_node_cache = NodeCache()
+INTERN_NODES = True
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Fields of synsets, lemmas and the types around them that the graph
+# engine's arrays serve without reading the data files; see _index_only().
+INDEX_FIELDS = frozenset(
+    ("__typename", "name", "pos", "offset", "lemma_names", "lemmas",
+     "synset", "distance", "similarity", "edges", "node", "cursor",
+     "page_info", "has_next_page", "has_previous_page", "start_cursor",
+     "end_cursor", "total_count") + LEMMA_RELATIONS)
+# field AST -> whether everything selected below it is in INDEX_FIELDS.
+_index_selections = {}
+_MAX_INDEX_SELECTIONS = 4096
+
+_HANDLES = (SynsetHandle, LemmaHandle, IndexSynsetHandle, IndexLemmaHandle)
 
 
 def get_lemma_str(lemma: Lemma) -> str:
     return "%s.%s" % (lemma._synset._name, lemma._name)
 
 
+def enable_graph_engine(graph: Optional[WordNetGraph] = None) -> WordNetGraph:
+    global _graph
+    _graph = graph if graph is not None else WordNetGraph.build()
+    _node_cache.clear()
+    return _graph
+
+
+def disable_graph_engine():
+    global _graph
+    _graph = None
+    _node_cache.clear()
+
+
+def enable_lexicon() -> Lexicon:
+    """
+    Serves scalar fields (definitions, examples, lemma names and so on)
+    from a Lexicon of the graph engine's graph, enabling the engine if
+    needed. Snapshots come with a lexicon already.
+    """
+    graph = _graph if _graph is not None else enable_graph_engine()
+    if getattr(graph, "lexicon", None) is None:
+        graph.lexicon = Lexicon.build(graph)
+        _node_cache.clear()
+    return graph.lexicon
+
+
+def load_snapshot(path: str) -> snapshot.Snapshot:
+    """
+    Serves WordNet from a file written by snapshot.build(): NLTK's reader
+    is set up from it if WordNet was not loaded yet, and the graph engine
+    is enabled with its arrays.
+    """
+    corpus_snapshot = snapshot.Snapshot.open(path)
+    corpus_snapshot.install(wn)
+    enable_graph_engine(corpus_snapshot.graph)
+    return corpus_snapshot
+
+
+if os.environ.get("WORDNET_SNAPSHOT"):
+    try:
+        load_snapshot(os.environ["WORDNET_SNAPSHOT"])
+    except (OSError, snapshot.SnapshotError) as e:
+        warnings.warn("not using WordNet snapshot: %s" % e)
+
+
+def _synset_positions() -> SynsetPositions:
+    global _positions
+    if _graph is not None:
+        return _graph.positions
+    if _positions is None:
+        _positions = SynsetPositions.scan()
+    return _positions
+
+
+def _synset_at(i: int) -> Synset:
+    if _graph is not None:
+        return _graph.synset(i)
+    return _synset_positions().synset(i)
+
+
+def _node_key(wordnet_obj):
+    cls = type(wordnet_obj)
+    if cls is SynsetHandle or cls is IndexSynsetHandle:
+        return wordnet_obj.id
+    if cls is LemmaHandle or cls is IndexLemmaHandle:
+        return -1 - wordnet_obj.id
+    if cls is Lemma:
+        # Lemmas compare equal by name alone, across synsets.
+        return (wordnet_obj._synset._name, wordnet_obj._name)
+    return wordnet_obj._name
+
+
+def _node(node_type, wordnet_obj):
+    """
+    The node for wordnet_obj. Every field that returns the same synset or
+    lemma gets the same node while it stays in _node_cache, and with it
+    the scalar fields already resolved on it.
+    """
+    node_type = node_type.flyweight
+    if not INTERN_NODES:
+        return node_type(wordnet_obj)
+    return _node_cache.get(_node_key(wordnet_obj),
+                           lambda: node_type(wordnet_obj, memoize=True))
+
+
+def _nodes(node_type, wordnet_objs) -> list:
+    return [_node(node_type, x) for x in wordnet_objs]
+
+
+def _selected_fields(info) -> set:
+    # Every field selected below info's, at any depth and through
+    # fragments, in snake case.
+    names = set()
+    stack = [field.selection_set for field in info.field_asts]
+    while stack:
+        selection_set = stack.pop()
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                name = selection.name.value
+                names.add(name if name.startswith("__")
+                          else to_snake_case(name))
+                stack.append(selection.selection_set)
+            elif isinstance(selection, ast.FragmentSpread):
+                stack.append(info.fragments[selection.name.value]
+                             .selection_set)
+            else:
+                stack.append(selection.selection_set)
+    return names
+
+
+def _index_only(info) -> bool:
+    """
+    Whether the graph engine is on without a lexicon and every field
+    selected below info's is in INDEX_FIELDS, so that the synsets and
+    lemmas info's field returns can be served from the graph's arrays
+    instead of being loaded as NLTK objects.
+    """
+    if info is None or _graph is None \
+            or getattr(_graph, "lexicon", None) is not None:
+        return False
+    field = info.field_asts[0]
+    result = _index_selections.get(field)
+    if result is None:
+        if len(_index_selections) >= _MAX_INDEX_SELECTIONS:
+            _index_selections.clear()
+        result = _index_selections[field] = \
+            _selected_fields(info) <= INDEX_FIELDS
+    return result
+
+
+def _graph_columns(graph: WordNetGraph) -> GraphColumns:
+    if getattr(graph, "columns", None) is None:
+        graph.columns = GraphColumns(graph)
+    return graph.columns
+
+
+def _synset_node(graph: WordNetGraph, i: int, info=None) -> "SynsetNode":
+    """
+    The node of synset i, served from the lexicon if the graph has one,
+    from the graph's arrays if info's selection only needs those, and
+    from NLTK otherwise.
+    """
+    lexicon = getattr(graph, "lexicon", None)
+    if lexicon is not None:
+        return _node(SynsetNode, lexicon.synset(i))
+    if _index_only(info):
+        return _node(SynsetNode, _graph_columns(graph).synset(i))
+    return _node(SynsetNode, graph.synset(i))
+
+
+def _taxonomy() -> Taxonomy:
+    """
+    The hypernym DAG of the current graph. Similarity matrices, nearest
+    synsets and subsumption checks need the graph, so this enables the
+    graph engine if it is not already on.
+    """
+    with _build_lock:
+        graph = _graph if _graph is not None else enable_graph_engine()
+        if getattr(graph, "taxonomy", None) is None:
+            graph.taxonomy = Taxonomy(graph)
+        return graph.taxonomy
+
+
+def _similarity_engine() -> SimilarityEngine:
+    global _similarity
+    with _build_lock:
+        taxonomy = _taxonomy()
+        if _similarity is None or _similarity.taxonomy is not taxonomy:
+            _similarity = SimilarityEngine(taxonomy)
+        return _similarity
+
+
+def _interval_index() -> IntervalIndex:
+    global _intervals
+    with _build_lock:
+        taxonomy = _taxonomy()
+        if _intervals is None or _intervals.taxonomy is not taxonomy:
+            _intervals = IntervalIndex(taxonomy)
+        return _intervals
+
+
+def _synset_ids(graph: WordNetGraph, names: List[str]) -> List[int]:
+    ids = []
+    for name in names:
+        try:
+            ids.append(graph.synset_id_by_name(name))
+        except KeyError:
+            ids.append(graph.synset_id(wn.synset(name)))
+    return ids
+
+
+def _hypernym_paths() -> HypernymPaths:
+    global _paths
+    with _build_lock:
+        taxonomy = _taxonomy()
+        if _paths is None or _paths.taxonomy is not taxonomy:
+            _paths = HypernymPaths(taxonomy)
+        return _paths
+
+
+def _lemma_index() -> LemmaSearch:
+    """
+    The search index over lemma names, ranked by the counts of the
+    graph's lexicon. This enables the graph engine and lexicon if needed.
+    """
+    global _lemma_search
+    with _build_lock:
+        lexicon = enable_lexicon()
+        if _lemma_search is None or _lemma_search.graph is not lexicon.graph:
+            _lemma_search = LemmaSearch(lexicon.graph, lexicon.counts)
+        return _lemma_search
+
+
+def _closure_engine() -> ClosureEngine:
+    global _closures
+    with _build_lock:
+        graph = _graph if _graph is not None else enable_graph_engine()
+        if _closures is None or _closures.graph is not graph:
+            _closures = ClosureEngine(graph)
+        return _closures
+
+
+def precompute_closures(relations: Sequence[str] = PRECOMPUTED_RELATIONS):
+    """
+    Stores the closure of every synset under each of relations, enabling
+    the graph engine if needed, so that closure fields from one synset
+    along one of them are answered by a lookup.
+    """
+    _closure_engine().precompute(relations)
+
+
+def _closure_relations(relationshipName: Optional[str] = None,
+                       relationshipNames: Optional[List[str]] = None):
+    names = [relationshipName] if relationshipName else []
+    try:
+        return check_relations(names + list(relationshipNames or []))
+    except ValueError as e:
+        raise GraphQLError(str(e))
+
+
+def _closure(info, names: List[str], relations, depth: int, node):
+    """
+    node(synset_node, distance) for every synset in the closure of the
+    synsets names along relations, off the event loop in execute_async().
+    """
+    def expand():
+        if _graph is not None:
+            ids, distances = _closure_engine().closure(
+                _synset_ids(_graph, names), relations, depth)
+            return [node(_synset_node(_graph, i, info), d)
+                    for i, d in _checked(
+                        info, zip(ids.tolist(), distances.tolist()))]
+        return [node(_node(SynsetNode, s), d) for s, d in _checked(
+            info, breadth_first(
+                [wn.synset(name) for name in names],
+                lambda s: [t for r in relations for t in getattr(s, r)()],
+                depth))]
+    return _offload(info, expand)
+
+
+def _synset_distance(node: "SynsetNode", distance: int) -> "SynsetDistance":
+    return SynsetDistance(name=node._scalars().name(), synset=node,
+                          distance=distance)
+
+
+def _word_synsets(info, word: str,
+                  pos: Optional[str]) -> List["SynsetNode"]:
+    """
+    The synsets of word as wn.synsets(word, pos) finds them, with morphy
+    results cached across requests.
+    """
+    global _morphology
+    if _morphology is None:
+        with _build_lock:
+            if _morphology is None:
+                _morphology = Morphology(wn)
+    try:
+        positions = _morphology.positions(word, pos)
+    except ValueError as e:
+        raise GraphQLError(str(e))
+    graph = _graph
+    if graph is not None:
+        return [_synset_node(graph, graph.synset_id_by_offset(p, offset),
+                             info)
+                for p, offset in positions]
+    return [_node(SynsetNode, wn.synset_from_pos_and_offset(p, offset))
+            for p, offset in positions]
+
+
+def _page_bounds(total, first=None, after=None, last=None, before=None):
+    start = max(get_offset_with_default(after, -1) + 1, 0)
+    end = min(get_offset_with_default(before, total), total)
+    if first is None and last is None:
+        first = DEFAULT_PAGE_SIZE
+    for size in (first, last):
+        if size is not None and not 0 <= size <= MAX_PAGE_SIZE:
+            raise GraphQLError(
+                "Page size must be between 0 and %d" % MAX_PAGE_SIZE)
+    if first is not None:
+        end = min(end, start + first)
+    if last is not None:
+        start = max(start, end - last)
+    return start, max(start, end)
+
+
+class QueryCancelledError(GraphQLError):
+    pass
+
+
+class RequestContext:
+    """
+    Per-request state handed to resolvers as info.context.
+    """
+
+    def __init__(self):
+        self.loaders = Loaders(_graph)
+        # Set when the request times out or is cancelled, so that long
+        # running resolvers stop early.
+        self.cancelled = threading.Event()
+
+    def offload(self, fn, *args):
+        """
+        Runs fn(*args) for a resolver with heavy work. Synchronous requests
+        run it right away.
+        """
+        return fn(*args)
+
+
+class AsyncRequestContext(RequestContext):
+    """
+    The context of execute_async(). Heavy work is handed to a thread pool
+    and the resolver returns a future, so the event loop keeps serving
+    other requests' cheap fields meanwhile.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop,
+                 pool: Optional[concurrent.futures.Executor] = None):
+        RequestContext.__init__(self)
+        self.loop = loop
+        self.pool = pool if pool is not None else _default_thread_pool()
+
+    def _run(self, fn, args):
+        if self.cancelled.is_set():
+            raise QueryCancelledError("Query was cancelled")
+        return fn(*args)
+
+    def offload(self, fn, *args):
+        return self.loop.run_in_executor(self.pool, self._run, fn, args)
+
+
+def set_thread_pool(pool: Optional[concurrent.futures.Executor]):
+    """
+    Replaces the pool execute_async() hands heavy resolvers to. The
+    default has THREAD_POOL_SIZE threads.
+    """
+    global _thread_pool
+    _thread_pool = pool
+
+
+def _default_thread_pool() -> concurrent.futures.Executor:
+    global _thread_pool
+    with _build_lock:
+        if _thread_pool is None:
+            _thread_pool = concurrent.futures.ThreadPoolExecutor(
+                THREAD_POOL_SIZE, thread_name_prefix="wordnet")
+        _lock_reader()
+        return _thread_pool
+
+
+# Reader methods that seek and read the data files.
+_READER_METHODS = ("synset_from_pos_and_offset", "_synset_from_pos_and_offset",
+                   "lemma_count")
+_reader_wrappers = set()
+
+
+def _wrap_reader(tag: str, wrap):
+    # Replaces each of _READER_METHODS with wrap(name, method), once per
+    # tag; wrappers with different tags stack.
+    with _build_lock:
+        if tag in _reader_wrappers:
+            return
+        wn.ensure_loaded()
+        for name in _READER_METHODS:
+            if hasattr(type(wn), name):
+                setattr(wn, name, wrap(name, getattr(wn, name)))
+        _reader_wrappers.add(tag)
+
+
+def _lock_reader():
+    # Serializes the reader methods that seek shared files.
+    def wrap(name, method):
+        def locked(*args, **kwargs):
+            with _reader_lock:
+                return method(*args, **kwargs)
+        return locked
+    _wrap_reader("lock", wrap)
+
+
+def time_reader(metrics: Metrics):
+    """
+    Times every call to the NLTK reader methods that read the data files
+    into metrics, under the "reader" kind. Applies to the whole process
+    and cannot be undone; the first Metrics given is the one used.
+    """
+    def wrap(name, method):
+        def timed_method(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                metrics.observe("reader", name,
+                                time.perf_counter() - start)
+        return timed_method
+    _wrap_reader("time", wrap)
+
+
+def _offload(info, fn, *args):
+    offload = getattr(info.context, "offload", None)
+    if offload is None:
+        return fn(*args)
+    return offload(fn, *args)
+
+
+def _checked(info, items):
+    # Yields items until the request is cancelled.
+    cancelled = getattr(info.context, "cancelled", None)
+    for item in items:
+        if cancelled is not None and cancelled.is_set():
+            raise QueryCancelledError("Query was cancelled")
+        yield item
+
+
+def _get_loaders(info) -> Optional[Loaders]:
+    return getattr(info.context, "loaders", None)
+
+
+def _with_synset(info, name, fn):
+    """
+    Calls fn with the synset called name, batching and deduplicating the
+    lookup through the request's SynsetLoader when there is one.
+    """
+    loaders = _get_loaders(info)
+    if loaders is None:
+        return fn(wn.synset(name))
+    return loaders.synsets.load(name).then(fn)
+
+
 class WordNetObjectNode(graphene.ObjectType):
 
     hypernyms = graphene.List(lambda: WordNetObjectNode)
@@ -40,125 +579,150 @@ class WordNetObjectNode(graphene.ObjectType):
     similar_tos = graphene.List(lambda: WordNetObjectNode)
 
     def resolve_type(self):
-        if isinstance(self.wordnet_obj, Synset):
+        wordnet_obj = self.handle or self.wordnet_obj
+        if isinstance(wordnet_obj, (Synset, SynsetHandle)):
             return SynsetNode
-        elif isinstance(self.wordnet_obj, Lemma):
+        elif isinstance(wordnet_obj, (Lemma, LemmaHandle)):
             return LemmaNode
         else:
             return NotImplementedError
 
+    def _related(self, info, relation):
+        node_type = type(self)
+        if self.handle is not None:
+            return _nodes(node_type, self.handle.related(relation))
+        if _index_only(info):
+            columns = _graph_columns(_graph)
+            if node_type is SynsetNode.flyweight:
+                return _nodes(node_type, columns.synset(
+                    _graph.synset_id(self.wordnet_obj)).related(relation))
+            return _nodes(node_type, columns.lemma(
+                _graph.lemma_id(self.wordnet_obj)).related(relation))
+        loaders = _get_loaders(info)
+        if loaders is not None:
+            return loaders.relations.load((self.wordnet_obj, relation)).then(
+                lambda related: _nodes(node_type, related))
+        if _graph is not None:
+            related = _graph.related(self.wordnet_obj, relation)
+        else:
+            related = getattr(self.wordnet_obj, relation)()
+        return _nodes(node_type, related)
+
     def resolve_hypernyms(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.hypernyms()))
+        return self._related(info, "hypernyms")
 
     def resolve_instance_hypernyms(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.instance_hypernyms()))
+        return self._related(info, "instance_hypernyms")
 
     def resolve_hyponyms(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.hyponyms()))
+        return self._related(info, "hyponyms")
 
     def resolve_instance_hyponyms(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.instance_hyponyms()))
+        return self._related(info, "instance_hyponyms")
 
     def resolve_member_holonyms(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.member_holonyms()))
+        return self._related(info, "member_holonyms")
 
     def resolve_substance_holonyms(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.substance_holonyms()))
+        return self._related(info, "substance_holonyms")
 
     def resolve_part_holonyms(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.part_holonyms()))
+        return self._related(info, "part_holonyms")
 
     def resolve_part_meronyms(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.part_meronyms()))
+        return self._related(info, "part_meronyms")
 
     def resolve_member_meronyms(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.member_meronyms()))
+        return self._related(info, "member_meronyms")
 
     def resolve_substance_meronyms(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.substance_meronyms()))
+        return self._related(info, "substance_meronyms")
 
     def resolve_topic_domains(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.topic_domains()))
+        return self._related(info, "topic_domains")
 
     def resolve_in_topic_domains(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.in_topic_domains()))
+        return self._related(info, "in_topic_domains")
 
     def resolve_region_domains(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.region_domains()))
+        return self._related(info, "region_domains")
 
     def resolve_in_region_domains(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.in_region_domains()))
+        return self._related(info, "in_region_domains")
 
     def resolve_usage_domains(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.usage_domains()))
+        return self._related(info, "usage_domains")
 
     def resolve_in_usage_domains(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.in_usage_domains()))
+        return self._related(info, "in_usage_domains")
 
     def resolve_attributes(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.attributes()))
+        return self._related(info, "attributes")
 
     def resolve_entailments(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.entailments()))
+        return self._related(info, "entailments")
 
     def resolve_causes(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.causes()))
+        return self._related(info, "causes")
 
     def resolve_also_sees(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.also_sees()))
+        return self._related(info, "also_sees")
 
     def resolve_verb_groups(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.verb_groups()))
+        return self._related(info, "verb_groups")
 
     def resolve_similar_tos(self, info):
-        return list(map(
-            self.resolve_type(),
-            self.wordnet_obj.similar_tos()))
+        return self._related(info, "similar_tos")
+
+    def __init__(self, wordnet_obj, memoize: bool = False):
+        # A lexicon handle is only turned into an NLTK object when a field
+        # needs one, see __getattr__.
+        self._values = {} if memoize else None
+        if type(wordnet_obj) in _HANDLES:
+            self.handle = wordnet_obj
+        else:
+            self.handle = None
+            self.wordnet_obj = wordnet_obj
+
+    def __getattr__(self, name):
+        if name != "wordnet_obj" or self.handle is None:
+            raise AttributeError(name)
+        self.wordnet_obj = self.handle.load()
+        return self.wordnet_obj
+
+    def _scalars(self):
+        # Whatever serves the scalar fields: the handle if there is one.
+        return self.handle or self.wordnet_obj
+
+    def _scalar(self, field: str):
+        # Interned nodes compute each scalar field once, see _node().
+        values = self._values
+        if values is None:
+            return getattr(self._scalars(), field)()
+        try:
+            return values[field]
+        except KeyError:
+            value = values[field] = getattr(self._scalars(), field)()
+            return value
+
+
+class SynsetDistance(graphene.ObjectType):
+
+    name = graphene.String()
+    synset = graphene.Field(
+        lambda: SynsetNode,
+        description="Null for the simulated root.")
+    distance = graphene.Int()
+
+
+class HypernymPathIndex(graphene.ObjectType):
+    """
+    Hypernym paths as lists of indexes into synsets, which lists each
+    synset once.
+    """
 
-    def __init__(self, wordnet_obj):
-        self.wordnet_obj = wordnet_obj
+    synsets = graphene.List(lambda: SynsetNode)
+    paths = graphene.List(graphene.List(graphene.Int))
 
 
 class SynsetNode(WordNetObjectNode):
@@ -200,16 +764,33 @@ class SynsetNode(WordNetObjectNode):
     min_depth = graphene.Int()
     closure = graphene.List(
         lambda: SynsetNode,
-        relationshipName=graphene.String(required=True),
-        depth=graphene.Int(required=False))
-    # Missing: hypernym paths
+        relationshipName=graphene.String(required=False),
+        relationshipNames=graphene.List(graphene.NonNull(graphene.String)),
+        depth=graphene.Int(required=False),
+        description="Synsets reachable along relationshipName and "
+                    "relationshipNames, breadth first, as "
+                    "Synset.closure().")
+    closure_distances = graphene.List(
+        lambda: SynsetDistance,
+        relationshipName=graphene.String(required=False),
+        relationshipNames=graphene.List(graphene.NonNull(graphene.String)),
+        depth=graphene.Int(required=False),
+        description="closure, with the distance of each synset.")
+    hypernym_paths = graphene.List(graphene.List(lambda: SynsetNode))
+    hypernym_path_index = graphene.Field(lambda: HypernymPathIndex)
     common_hypernyms = graphene.List(
         lambda: SynsetNode,
         otherSynsetName=graphene.String())
     lowest_common_hypernyms = graphene.List(
         lambda: SynsetNode,
         otherSynsetName=graphene.String())
-    # Missing: hypernym_distances
+    is_hyponym_of = graphene.Boolean(
+        otherSynsetName=graphene.String(),
+        description="Whether otherSynsetName is a hypernym or instance "
+                    "hypernym of this synset, transitively.")
+    hypernym_distances = graphene.List(
+        lambda: SynsetDistance,
+        simulateRoot=graphene.Boolean(required=False))
     shortest_path_distance = graphene.Float(
         otherSynsetName=graphene.String(),
         simulateRoot=graphene.Boolean(required=False))
@@ -225,41 +806,45 @@ class SynsetNode(WordNetObjectNode):
         otherSynsetName=graphene.String(),
         simulateRoot=graphene.Boolean(required=False),
         default_value=None)
-    # Missing: res_similarity
-    # Missing: jcn_similarity
-    # Missing: lin_similarity
+    res_similarity = graphene.Float(
+        otherSynsetName=graphene.String(),
+        ic=graphene.String(required=False))
+    jcn_similarity = graphene.Float(
+        otherSynsetName=graphene.String(),
+        ic=graphene.String(required=False))
+    lin_similarity = graphene.Float(
+        otherSynsetName=graphene.String(),
+        ic=graphene.String(required=False))
 
     def resolve_pos(self, info):
-        return self.wordnet_obj.pos()
+        return self._scalar("pos")
 
     def resolve_offset(self, info):
-        return self.wordnet_obj.offset()
+        return self._scalar("offset")
 
     def resolve_name(self, info):
-        return self.wordnet_obj.name()
+        return self._scalar("name")
 
     def resolve_frame_ids(self, info):
-        return self.wordnet_obj.frame_ids()
+        return self._scalar("frame_ids")
 
     def resolve_definition(self, info):
-        return self.wordnet_obj.definition()
+        return self._scalar("definition")
 
     def resolve_examples(self, info):
-        return self.wordnet_obj.examples()
+        return self._scalar("examples")
 
     def resolve_lexname(self, info):
-        return self.wordnet_obj.lexname()
+        return self._scalar("lexname")
 
     def resolve_lemma_names(self, info):
-        return self.wordnet_obj.lemma_names()
+        return self._scalar("lemma_names")
 
     def resolve_lemmas(self, info):
-        return list(map(lambda x: LemmaNode(x), self.wordnet_obj.lemmas()))
+        return _nodes(LemmaNode, self._scalars().lemmas())
 
     def resolve_root_hypernyms(self, info):
-        return list(map(
-            lambda x: SynsetNode(x),
-            self.wordnet_obj.root_hypernyms()))
+        return _nodes(SynsetNode, self.wordnet_obj.root_hypernyms())
 
     def resolve_max_depth(self, info):
         return self.wordnet_obj.max_depth()
@@ -267,101 +852,161 @@ class SynsetNode(WordNetObjectNode):
     def resolve_min_depth(self, info):
         return self.wordnet_obj.min_depth()
 
-    def resolve_closure(self, info, relationshipName, depth=-1):
-        if relationshipName == "hypernyms":
-            rel = lambda s:s.hypernyms()
-        elif relationshipName == "instance_hypernyms":
-            rel = lambda s:s.instance_hypernyms()
-        elif relationshipName == "hyponyms":
-            rel = lambda s:s.hyponyms()
-        elif relationshipName == "instance_hyponyms":
-            rel = lambda s:s.instance_hyponyms()
-        elif relationshipName == "member_holonyms":
-            rel = lambda s:s.member_holonyms()
-        elif relationshipName == "substance_holonyms":
-            rel = lambda s:s.substance_holonyms()
-        elif relationshipName == "part_holonyms":
-            rel = lambda s:s.part_holonyms()
-        elif relationshipName == "member_meronyms":
-            rel = lambda s:s.member_meronyms()
-        elif relationshipName == "substance_meronyms":
-            rel = lambda s:s.substance_meronyms()
-        elif relationshipName == "part_meronyms":
-            rel = lambda s:s.part_meronyms()
-        elif relationshipName == "topic_domains":
-            rel = lambda s:s.topic_domains()
-        elif relationshipName == "in_topic_domains":
-            rel = lambda s:s.in_topic_domains()
-        elif relationshipName == "region_domains":
-            rel = lambda s:s.region_domains()
-        elif relationshipName == "in_region_domains":
-            rel = lambda s:s.in_region_domains()
-        elif relationshipName == "usage_domains":
-            rel = lambda s:s.usage_domains()
-        elif relationshipName == "in_usage_domains":
-            rel = lambda s:s.in_usage_domains()
-        elif relationshipName == "attributes":
-            rel = lambda s:s.attributes()
-        elif relationshipName == "entailments":
-            rel = lambda s:s.entailments()
-        elif relationshipName == "causes":
-            rel = lambda s:s.causes()
-        elif relationshipName == "also_sees":
-            rel = lambda s:s.also_sees()
-        elif relationshipName == "verb_groups":
-            rel = lambda s:s.verb_groups()
-        elif relationshipName == "similar_tos":
-            rel = lambda s:s.similar_tos()
-
-        return list(map(
-            lambda x: SynsetNode(x),
-            self.wordnet_obj.closure(rel, depth)))
+    def resolve_closure(self, info, relationshipName=None,
+                        relationshipNames=None, depth=-1):
+        return _closure(
+            info, [self._scalars().name()],
+            _closure_relations(relationshipName, relationshipNames),
+            depth, lambda node, distance: node)
+
+    def resolve_closure_distances(self, info, relationshipName=None,
+                                  relationshipNames=None, depth=-1):
+        return _closure(
+            info, [self._scalars().name()],
+            _closure_relations(relationshipName, relationshipNames),
+            depth, _synset_distance)
+
+    def _hypernym_paths(self) -> List[List[Synset]]:
+        if _graph is not None:
+            i = _graph.synset_id(self.wordnet_obj)
+            return [_graph.synsets(path)
+                    for path in _hypernym_paths().paths(i)]
+        return self.wordnet_obj.hypernym_paths()
+
+    def resolve_hypernym_paths(self, info):
+        return [_nodes(SynsetNode, path)
+                for path in self._hypernym_paths()]
+
+    def resolve_hypernym_path_index(self, info):
+        synsets, positions, paths = [], {}, []
+        for path in self._hypernym_paths():
+            indexes = []
+            for s in path:
+                if s._name not in positions:
+                    positions[s._name] = len(synsets)
+                    synsets.append(_node(SynsetNode, s))
+                indexes.append(positions[s._name])
+            paths.append(indexes)
+        return HypernymPathIndex(synsets=synsets, paths=paths)
+
+    def resolve_hypernym_distances(self, info, simulateRoot=False):
+        if _graph is not None:
+            i = _graph.synset_id(self.wordnet_obj)
+            distances = [(_graph.synset(j), d)
+                         for j, d in _hypernym_paths().distances(i)]
+        else:
+            distances = sorted(
+                self.wordnet_obj.hypernym_distances(),
+                key=lambda x: (x[1], x[0]._name))
+        result = [SynsetDistance(name=s._name, synset=_node(SynsetNode, s),
+                                 distance=d)
+                  for s, d in distances]
+        if simulateRoot:
+            result.append(SynsetDistance(
+                name="*ROOT*", synset=None,
+                distance=max(d for _, d in distances) + 1))
+        return result
 
     def resolve_common_hypernyms(self, info, otherSynsetName):
-        otherSynset = wn.synset(otherSynsetName)
-        return list(map(
-            lambda x: SynsetNode(x),
-            self.wordnet_obj.common_hypernyms(otherSynset)))
+        if _graph is not None:
+            index = _interval_index()
+            a, b = _synset_ids(_graph, [self.wordnet_obj._name,
+                                        otherSynsetName])
+            return _nodes(SynsetNode, _graph.synsets(
+                index.common_hypernyms(a, b).tolist()))
+        return _with_synset(info, otherSynsetName, lambda otherSynset: _nodes(
+            SynsetNode, self.wordnet_obj.common_hypernyms(otherSynset)))
 
     def resolve_lowest_common_hypernyms(self, info, otherSynsetName):
-        otherSynset = wn.synset(otherSynsetName)
-        return list(map(
-            lambda x: SynsetNode(x),
+        if _graph is not None:
+            index = _interval_index()
+            a, b = _synset_ids(_graph, [self.wordnet_obj._name,
+                                        otherSynsetName])
+            return _nodes(SynsetNode, _graph.synsets(
+                index.lowest_common_hypernyms(a, b)))
+        return _with_synset(info, otherSynsetName, lambda otherSynset: _nodes(
+            SynsetNode,
             self.wordnet_obj.lowest_common_hypernyms(otherSynset)))
 
+    def resolve_is_hyponym_of(self, info, otherSynsetName):
+        index = _interval_index()
+        graph = index.taxonomy.graph
+        a, b = _synset_ids(graph, [self.wordnet_obj._name, otherSynsetName])
+        return index.subsumes(b, a)
+
     def resolve_shortest_path_distance(self, info,
                                        otherSynsetName, simulateRoot=False):
-        otherSynset = wn.synset(otherSynsetName)
-        return self.wordnet_obj.shortest_path_distance(
-            otherSynset,
-            simulateRoot)
+        return _with_synset(
+            info, otherSynsetName,
+            lambda otherSynset: self.wordnet_obj.shortest_path_distance(
+                otherSynset,
+                simulateRoot))
 
     def resolve_path_similarity(
             self,
             info,
             otherSynsetName='entity.n.01',
             simulateRoot=True):
-        otherSynset = wn.synset(otherSynsetName)
-        return self.wordnet_obj.path_similarity(otherSynset, simulateRoot)
+        return _with_synset(
+            info, otherSynsetName,
+            lambda otherSynset: self.wordnet_obj.path_similarity(
+                otherSynset, simulateRoot))
 
     def resolve_lch_similarity(
             self,
             info,
             otherSynsetName,
             simulateRoot=True):
-        otherSynset = wn.synset(otherSynsetName)
-        return self.wordnet_obj.lch_similarity(otherSynset, simulateRoot)
+        return _with_synset(
+            info, otherSynsetName,
+            lambda otherSynset: self.wordnet_obj.lch_similarity(
+                otherSynset, simulateRoot))
 
     def resolve_wup_similarity(
             self,
             info,
             otherSynsetName='entity.n.01',
             simulateRoot=True):
-        otherSynset = wn.synset(otherSynsetName)
-        return self.wordnet_obj.wup_similarity(otherSynset, simulateRoot)
+        return _with_synset(
+            info, otherSynsetName,
+            lambda otherSynset: self.wordnet_obj.wup_similarity(
+                otherSynset, simulateRoot))
 
-    def __init__(self, wordnet_obj):
-        WordNetObjectNode.__init__(self, wordnet_obj)
+    def resolve_res_similarity(
+            self,
+            info,
+            otherSynsetName,
+            ic=information_content.DEFAULT_IC):
+        table = information_content.load(ic)
+        return _with_synset(
+            info, otherSynsetName,
+            lambda otherSynset: table.res_similarity(
+                self.wordnet_obj, otherSynset))
+
+    def resolve_jcn_similarity(
+            self,
+            info,
+            otherSynsetName,
+            ic=information_content.DEFAULT_IC):
+        table = information_content.load(ic)
+        return _with_synset(
+            info, otherSynsetName,
+            lambda otherSynset: table.jcn_similarity(
+                self.wordnet_obj, otherSynset))
+
+    def resolve_lin_similarity(
+            self,
+            info,
+            otherSynsetName,
+            ic=information_content.DEFAULT_IC):
+        table = information_content.load(ic)
+        return _with_synset(
+            info, otherSynsetName,
+            lambda otherSynset: table.lin_similarity(
+                self.wordnet_obj, otherSynset))
+
+    def __init__(self, wordnet_obj, memoize: bool = False):
+        WordNetObjectNode.__init__(self, wordnet_obj, memoize)
 
 
 class LemmaNode(WordNetObjectNode):
@@ -402,46 +1047,97 @@ class LemmaNode(WordNetObjectNode):
     pertainyms = graphene.List(lambda: LemmaNode)
 
     def resolve_name(self, info):
-        return self.wordnet_obj.name()
+        return self._scalar("name")
 
     def resolve_syntactic_marker(self, info):
-        return self.wordnet_obj.syntactic_marker()
+        return self._scalar("syntactic_marker")
 
     def resolve_synset(self, info):
-        return SynsetNode(self.wordnet_obj.synset())
+        return _node(SynsetNode, self._scalars().synset())
 
     def resolve_frame_strings(self, info):
-        return self.wordnet_obj.frame_strings()
+        return self._scalar("frame_strings")
 
     def resolve_frame_ids(self, info):
-        return self.wordnet_obj.frame_ids()
+        return self._scalar("frame_ids")
 
     def resolve_lang(self, info):
-        return self.wordnet_obj.lang()
+        return self._scalar("lang")
 
     def resolve_key(self, info):
-        return self.wordnet_obj.key()
+        return self._scalar("key")
 
     def resolve_count(self, info):
-        return self.wordnet_obj.count()
+        return self._scalar("count")
 
     def resolve_antonyms(self, info):
-        return list(map(
-            lambda x: LemmaNode(x),
-            self.wordnet_obj.antonyms()))
+        return self._related(info, "antonyms")
 
     def resolve_derivationally_related_forms(self, info):
-        return list(map(
-            lambda x: LemmaNode(x),
-            self.wordnet_obj.derivationally_related_forms()))
+        return self._related(info, "derivationally_related_forms")
 
     def resolve_pertainyms(self, info):
-        return list(map(
-            lambda x: LemmaNode(x),
-            self.wordnet_obj.pertainyms()))
+        return self._related(info, "pertainyms")
+
+    def __init__(self, wordnet_obj: _WordNetObject, memoize: bool = False):
+        WordNetObjectNode.__init__(self, wordnet_obj, memoize)
+
+
+def _flyweight(node_type):
+    """
+    A class with the methods of node_type, whose instances are what the
+    resolvers of node_type get as self. graphene.ObjectType gives its
+    instances a __dict__, but graphene calls resolvers with any root,
+    so nodes are made with these slots instead.
+    """
+    namespace = {"__slots__": ("handle", "wordnet_obj", "_values"),
+                 "__module__": __name__, "__doc__": node_type.__doc__}
+    for cls in reversed(node_type.__mro__):
+        if issubclass(cls, WordNetObjectNode):
+            namespace.update(
+                (name, value) for name, value in vars(cls).items()
+                if isinstance(value, (types.FunctionType, staticmethod,
+                                      classmethod, property)))
+    flyweight = type(node_type.__name__, (), namespace)
+    flyweight.flyweight = node_type.flyweight = flyweight
+    return flyweight
+
+
+_flyweight(SynsetNode)
+_flyweight(LemmaNode)
+
+
+class SynsetConnection(graphene.relay.Connection):
+
+    total_count = graphene.Int()
+
+    class Meta:
+        node = SynsetNode
+
+
+class SimilarityMetric(graphene.Enum):
+    PATH = "path"
+    WUP = "wup"
+    LCH = "lch"
+
+
+class NearestMetric(graphene.Enum):
+    PATH = "path"
+    WUP = "wup"
+    LCH = "lch"
+    RES = "res"
+
+
+class SubsumptionPair(graphene.InputObjectType):
 
-    def __init__(self, wordnet_obj: _WordNetObject):
-        WordNetObjectNode.__init__(self, wordnet_obj)
+    hypernym = graphene.String(required=True)
+    hyponym = graphene.String(required=True)
+
+
+class SynsetSimilarity(graphene.ObjectType):
+
+    synset = graphene.Field(SynsetNode)
+    similarity = graphene.Float()
 
 
 class Query(graphene.ObjectType):
@@ -450,6 +1146,10 @@ class Query(graphene.ObjectType):
         SynsetNode,
         pos=graphene.String(required=False))
 
+    all_synsets_connection = graphene.relay.ConnectionField(
+        SynsetConnection,
+        pos=graphene.String(required=False))
+
     synset = graphene.Field(
         SynsetNode,
         name=graphene.String())
@@ -458,22 +1158,459 @@ class Query(graphene.ObjectType):
         LemmaNode,
         id=graphene.String())
 
+    closure = graphene.List(
+        SynsetDistance,
+        names=graphene.List(graphene.NonNull(graphene.String),
+                            required=True),
+        relationshipNames=graphene.List(graphene.NonNull(graphene.String),
+                                        required=True),
+        depth=graphene.Int(default_value=-1),
+        description="Synsets reachable from any of names along any of "
+                    "relationshipNames, breadth first, each with its "
+                    "distance from the nearest of names.")
+
+    synsets = graphene.List(
+        SynsetNode,
+        word=graphene.String(required=True),
+        pos=graphene.String(required=False),
+        description="The synsets of word or of its base forms, as "
+                    "wn.synsets() finds them.")
+
+    synsets_for_words = graphene.List(
+        graphene.List(SynsetNode),
+        words=graphene.List(graphene.NonNull(graphene.String),
+                            required=True),
+        pos=graphene.String(required=False),
+        description="The synsets of each word, as synsets() would return "
+                    "them, in input order.")
+
+    similarity_matrix = graphene.List(
+        graphene.Float,
+        names=graphene.List(graphene.String, required=True),
+        others=graphene.List(graphene.String, required=True),
+        metric=SimilarityMetric(default_value=SimilarityMetric.PATH.value),
+        simulate_root=graphene.Boolean(default_value=True),
+        description="Similarity of every synset in names to every synset "
+                    "in others, row by row.")
+
+    nearest_synsets = graphene.List(
+        SynsetSimilarity,
+        name=graphene.String(required=True),
+        metric=NearestMetric(default_value=NearestMetric.PATH.value),
+        k=graphene.Int(default_value=10),
+        pos=graphene.String(required=False),
+        simulate_root=graphene.Boolean(default_value=True),
+        ic=graphene.String(required=False),
+        description="The k synsets most similar to name, best first.")
+
+    search_lemmas = graphene.List(
+        LemmaNode,
+        prefix=graphene.String(required=True),
+        pos=graphene.String(required=False),
+        limit=graphene.Int(default_value=10),
+        description="The most frequent lemmas whose names start with "
+                    "prefix, ignoring case.")
+
+    fuzzy_lemmas = graphene.List(
+        LemmaNode,
+        term=graphene.String(required=True),
+        max_edits=graphene.Int(default_value=1),
+        limit=graphene.Int(default_value=10),
+        description="Lemmas whose names are within max_edits edits of "
+                    "term, closest and then most frequent first.")
+
+    subsumes = graphene.List(
+        graphene.Boolean,
+        pairs=graphene.List(SubsumptionPair, required=True),
+        description="For each pair, whether hypernym is a hypernym or "
+                    "instance hypernym of hyponym, transitively.")
+
     def resolve_all_synsets(self, info, pos=None):
-        return list(map(lambda x: SynsetNode(x), wn.all_synsets(pos=pos)))
+        if _index_only(info):
+            columns = _graph_columns(_graph)
+            return _offload(info, lambda: [
+                _node(SynsetNode, columns.synset(i)) for i in _checked(
+                    info, _graph.positions.select(pos).tolist())])
+        return _offload(info, lambda: [
+            _node(SynsetNode, x)
+            for x in _checked(info, wn.all_synsets(pos=pos))])
+
+    def resolve_all_synsets_connection(self, info, pos=None, **kwargs):
+        ids = _synset_positions().select(pos)
+        start, end = _page_bounds(len(ids), **kwargs)
+        edges = [
+            SynsetConnection.Edge(
+                node=(_synset_node(_graph, i, info) if _graph is not None
+                      else _node(SynsetNode, _synset_at(i))),
+                cursor=offset_to_cursor(start + k))
+            for k, i in enumerate(ids[start:end].tolist())]
+        return SynsetConnection(
+            edges=edges,
+            page_info=graphene.relay.PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=start > 0,
+                has_next_page=end < len(ids)),
+            total_count=len(ids))
 
     def resolve_synset(self, info, name="entity.n.01"):
-        return SynsetNode(wn.synset(name))
+        if getattr(_graph, "lexicon", None) is not None or _index_only(info):
+            try:
+                return _synset_node(
+                    _graph, _graph.synset_id_by_name(name), info)
+            except KeyError:
+                pass
+        return _with_synset(
+            info, name, lambda synset: _node(SynsetNode, synset))
 
     def resolve_lemma(self, info, id="entity.n.01.entity"):
-        return LemmaNode(wn.lemma(id))
+        loaders = _get_loaders(info)
+        if loaders is None:
+            return _node(LemmaNode, wn.lemma(id))
+        return loaders.lemmas.load(id).then(
+            lambda lemma: _node(LemmaNode, lemma))
+
+    def resolve_closure(self, info, names, relationshipNames, depth=-1):
+        return _closure(info, names, _closure_relations(
+            relationshipNames=relationshipNames), depth, _synset_distance)
+
+    def resolve_synsets(self, info, word, pos=None):
+        return _word_synsets(info, word, pos)
+
+    def resolve_synsets_for_words(self, info, words, pos=None):
+        def lookup():
+            found = {}
+            for word in _checked(info, words):
+                if word not in found:
+                    found[word] = _word_synsets(info, word, pos)
+            return [found[word] for word in words]
+        return _offload(info, lookup)
+
+    def resolve_search_lemmas(self, info, prefix, pos=None, limit=10):
+        if not 0 <= limit <= MAX_PAGE_SIZE:
+            raise GraphQLError(
+                "limit must be between 0 and %d" % MAX_PAGE_SIZE)
+        index = _lemma_index()
+        lexicon = index.graph.lexicon
+        return _nodes(LemmaNode, [
+            lexicon.lemma(i) for i in index.prefix(prefix, pos, limit)])
+
+    def resolve_fuzzy_lemmas(self, info, term, max_edits=1, limit=10):
+        if not 0 <= limit <= MAX_PAGE_SIZE:
+            raise GraphQLError(
+                "limit must be between 0 and %d" % MAX_PAGE_SIZE)
+        if not 0 <= max_edits <= MAX_EDITS:
+            raise GraphQLError(
+                "maxEdits must be between 0 and %d" % MAX_EDITS)
+        index = _lemma_index()
+        lexicon = index.graph.lexicon
+        return _nodes(LemmaNode, [
+            lexicon.lemma(i) for i in index.fuzzy(term, max_edits, limit)])
+
+    def resolve_similarity_matrix(self, info, names, others,
+                                  metric="path", simulate_root=True):
+        def compute():
+            engine = _similarity_engine()
+            graph = engine.taxonomy.graph
+            columns = _synset_ids(graph, others)
+            return [
+                value
+                for a in _checked(info, _synset_ids(graph, names))
+                for value in engine.matrix(
+                    [a], columns, metric, simulate_root)[0]]
+        return _offload(info, compute)
+
+    def resolve_subsumes(self, info, pairs):
+        index = _interval_index()
+        graph = index.taxonomy.graph
+        return index.subsumes_many(
+            _synset_ids(graph, [p.hypernym for p in pairs]),
+            _synset_ids(graph, [p.hyponym for p in pairs])).tolist()
+
+    def resolve_nearest_synsets(self, info, name, metric="path", k=10,
+                                pos=None, simulate_root=True, ic=None):
+        if not 0 <= k <= MAX_PAGE_SIZE:
+            raise GraphQLError("k must be between 0 and %d" % MAX_PAGE_SIZE)
+
+        def search():
+            engine = _similarity_engine()
+            graph = engine.taxonomy.graph
+            table = None
+            if metric == "res":
+                table = information_content.load(
+                    ic or information_content.DEFAULT_IC)
+            neighbours = NearestSynsets(engine).nearest(
+                _synset_ids(graph, [name])[0], metric, k, pos,
+                simulate_root, table)
+            return [
+                SynsetSimilarity(
+                    synset=_synset_node(graph, i, info), similarity=value)
+                for i, value in neighbours]
+        return _offload(info, search)
 
 
 schema = graphene.Schema(query=Query, types=[SynsetNode])
-# r = schema.execute('''
-#     query TestQuery {
-#         lemma(id: "dog.n.01.dog") {
-#             frameStrings
-#         }
-#     }
-# ''')
-# print(r.data, r.errors)
\ No newline at end of file
+
+# Parsed and validated documents, and the persisted query registry.
+documents = DocumentCache(schema)
+
+
+def _cost_estimator() -> CostEstimator:
+    weights = WORDNET_WEIGHTS
+    if _graph is not None:
+        if getattr(_graph, "fanout_weights", None) is None:
+            _graph.fanout_weights = FanoutWeights.from_graph(_graph)
+        weights = _graph.fanout_weights
+    return CostEstimator(schema, weights, DEFAULT_PAGE_SIZE)
+
+
+def _execute_cached(result_cache: ResultCache, document_ast, operation_name,
+                    variables, run):
+    """
+    Runs only the root fields of the operation that are not already in
+    result_cache, and caches the subtrees it computes. Like _operation(),
+    yields what run() returns and expects its result back.
+    """
+    fields = result_cache.root_field_keys(
+        document_ast, operation_name, variables)
+    if fields is None:
+        return (yield run(document_ast))
+    cached = {key: result_cache.get(key) for _, _, key in fields}
+    missing = [selection for _, selection, key in fields
+               if cached[key] is None]
+    if missing:
+        result = yield run(
+            partial_document(document_ast, operation_name, missing))
+        if result.invalid:
+            return result
+    else:
+        result = ExecutionResult(data={})
+    data = OrderedDict()
+    for response_key, _, key in fields:
+        if cached[key] is not None:
+            data[response_key] = cached[key]
+        else:
+            data[response_key] = result.data[response_key]
+            if not result.errors:
+                result_cache.put(key, data[response_key])
+    result.data = data
+    return result
+
+
+def _operation(request_string, variables, context, operation_name,
+               query_hash, cost_limits, throttle, result_cache, timer,
+               raw_json, **kwargs):
+    """
+    The steps of execute() and execute_async(). Yields what graphql-core's
+    execute returns for each document it runs, an ExecutionResult or a
+    promise of one, and takes the ExecutionResult back.
+    """
+    if request_string is None:
+        try:
+            request_string = documents.persisted_query(query_hash)
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e], invalid=True)
+    document_ast, validation_errors = documents.get(request_string, timer)
+    if validation_errors:
+        return ExecutionResult(errors=validation_errors, invalid=True)
+    if result_cache is not None:
+        cache_key = result_cache.operation_key(
+            document_ast, operation_name, variables)
+        data = result_cache.get(cache_key)
+        if data is not None:
+            return ExecutionResult(data=data)
+
+    middleware = list(kwargs.pop("middleware", None) or [])
+    cost = None
+    if cost_limits is not None or throttle is not None:
+        estimate = _cost_estimator().estimate(
+            document_ast, operation_name, variables)
+        cost = {"estimated": estimate.cost, "depth": estimate.depth}
+        try:
+            if cost_limits is not None:
+                cost_limits.check(estimate)
+            if throttle is not None and not throttle.admit(estimate.cost):
+                raise QueryCostError(
+                    "Query cost budget exhausted, retry later")
+        except QueryCostError as e:
+            return ExecutionResult(
+                errors=[e], invalid=True, extensions={"cost": cost})
+        counter = CostCounter()
+        middleware.insert(0, counter)
+    if timer is not None:
+        # Innermost, so that only resolvers are timed.
+        middleware.append(timer)
+    if middleware:
+        # By default graphql-core turns every resolved value into a
+        # promise once any middleware is installed, which more than
+        # doubles the time of nested queries. The executor takes plain
+        # values as well.
+        middleware = MiddlewareManager(*middleware, wrap_in_promise=False)
+
+    # Results from the cache are merged per root field, as dicts.
+    execute_fn = execute_json if raw_json and result_cache is None \
+        else execute_document
+
+    def run(document_ast):
+        try:
+            return execute_fn(
+                schema,
+                document_ast,
+                context=context,
+                variables=variables,
+                operation_name=operation_name,
+                middleware=middleware,
+                **kwargs)
+        except GraphQLError as e:
+            # graphql-core raises errors in the variables or operation name
+            # before running the operation, which schema.execute() returned.
+            result = ExecutionResult(errors=[e], invalid=True)
+            if kwargs.get("return_promise"):
+                return Promise.resolve(result)
+            return result
+
+    with timed(timer, "execute"):
+        if result_cache is not None:
+            result = yield from _execute_cached(
+                result_cache, document_ast, operation_name, variables, run)
+        else:
+            result = yield run(document_ast)
+    if result_cache is not None and not result.errors:
+        result_cache.put(cache_key, result.data)
+    if cost is not None:
+        cost["actual"] = counter.count
+        result.extensions["cost"] = cost
+    return result
+
+
+def result_dict(result: ExecutionResult) -> dict:
+    """
+    An ExecutionResult as the JSON-ready dict of a GraphQL response.
+    Unlike ExecutionResult.to_dict(), this keeps extensions.
+    """
+    response = {}
+    if result.errors:
+        response["errors"] = [format_error(e) for e in result.errors]
+    if not result.invalid:
+        response["data"] = result.data
+    if result.extensions:
+        response["extensions"] = result.extensions
+    return response
+
+
+def _dumps(value) -> str:
+    if isinstance(value, RawJSON):
+        return value
+    return json.dumps(value, separators=(",", ":"))
+
+
+def result_json(result: ExecutionResult) -> bytes:
+    """
+    The JSON of result_dict(result), with data from execute(raw_json=True)
+    written out as is.
+    """
+    response = result_dict(result)
+    return ("{%s}" % ",".join(
+        "%s:%s" % (json.dumps(key), _dumps(value))
+        for key, value in response.items())).encode()
+
+
+def execute(request_string=None, variables=None, context=None,
+            operation_name=None, query_hash=None,
+            cost_limits: Optional[CostLimits] = None,
+            throttle: Optional[CostThrottle] = None,
+            result_cache: Optional[ResultCache] = None,
+            metrics: Optional[Metrics] = None, trace: bool = False,
+            raw_json: bool = False, **kwargs):
+    """
+    Executes a query against the schema with a fresh RequestContext, so that
+    synset lookups and relation expansions are batched per request.
+
+    Documents are parsed and validated once and then served from
+    `documents`. A query registered there as a persisted query can be run
+    by passing only its query_hash.
+
+    With cost_limits or a throttle, the query's cost is estimated before it
+    runs and it is rejected if over budget; the estimated and actual number
+    of resolved fields are reported in result.extensions["cost"].
+
+    With a result_cache, results are served from and stored in the cache,
+    both for the whole operation and for each of its root fields.
+
+    With metrics, the time spent parsing, validating and executing the
+    query and in each resolver is added to metrics. With trace, the same
+    timings for this request are reported in result.extensions["tracing"].
+
+    With raw_json, result.data is the response's data already written as
+    JSON, a RawJSON string, which result_json() includes as is. Results
+    served with a result_cache are dicts either way.
+    """
+    if context is None:
+        context = RequestContext()
+    timer = None
+    if metrics is not None or trace:
+        timer = RequestTimer(metrics, trace)
+    steps = _operation(request_string, variables, context, operation_name,
+                       query_hash, cost_limits, throttle, result_cache,
+                       timer, raw_json, **kwargs)
+    result = None
+    try:
+        while True:
+            result = steps.send(result)
+    except StopIteration as e:
+        result = e.value
+    if timer is not None:
+        timer.finish(result)
+    return result
+
+
+async def execute_async(request_string=None, variables=None, context=None,
+                        operation_name=None, query_hash=None,
+                        cost_limits: Optional[CostLimits] = None,
+                        throttle: Optional[CostThrottle] = None,
+                        result_cache: Optional[ResultCache] = None,
+                        timeout: Optional[float] = None,
+                        metrics: Optional[Metrics] = None,
+                        trace: bool = False, raw_json: bool = False,
+                        **kwargs):
+    """
+    execute() on the running event loop with graphql-core's
+    AsyncioExecutor. Closures, allSynsets, similarity matrices and nearest
+    synsets run on a thread pool (see set_thread_pool()), while other
+    fields resolve inline, so light queries are not held up by heavy ones.
+
+    After timeout seconds the query fails with a QueryCancelledError.
+    Cancelling the calling task works too. Either way, work already
+    handed to the pool stops at its next check.
+    """
+    loop = asyncio.get_running_loop()
+    if context is None:
+        context = AsyncRequestContext(loop)
+    timer = None
+    if metrics is not None or trace:
+        timer = RequestTimer(metrics, trace)
+    steps = _operation(request_string, variables, context, operation_name,
+                       query_hash, cost_limits, throttle, result_cache,
+                       timer, raw_json, executor=AsyncioExecutor(loop),
+                       return_promise=True, **kwargs)
+
+    async def run():
+        result = None
+        try:
+            while True:
+                result = await steps.send(result)
+        except StopIteration as e:
+            return e.value
+
+    try:
+        result = await asyncio.wait_for(run(), timeout)
+    except asyncio.TimeoutError:
+        result = ExecutionResult(errors=[QueryCancelledError(
+            "Query timed out after %g seconds" % timeout)])
+    finally:
+        cancelled = getattr(context, "cancelled", None)
+        if cancelled is not None:
+            cancelled.set()
+    if timer is not None:
+        timer.finish(result)
+    return result